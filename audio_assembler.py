@@ -0,0 +1,211 @@
+import os
+import wave
+import struct
+import subprocess
+
+CHUNK_FRAMES = 64 * 1024
+HEADER_BYTES = 44
+DEFAULT_PARAMS = (1, 2, 24000)  # channels, sample width (bytes), sample rate
+PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+
+def _wav_params(path):
+    try:
+        with wave.open(path, "rb") as w:
+            return (w.getnchannels(), w.getsampwidth(), w.getframerate())
+    except (wave.Error, EOFError):
+        return None
+
+
+def _silence(frames, channels, sampwidth):
+    # PCM 8-bit เป็น unsigned ค่ากลางคือ 0x80
+    fill = b"\x80" if sampwidth == 1 else b"\x00"
+    return fill * (frames * channels * sampwidth)
+
+
+def _write_header(f, channels, sampwidth, rate, data_bytes):
+    block_align = channels * sampwidth
+    f.write(struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, rate, rate * block_align, block_align, sampwidth * 8,
+        b"data", data_bytes,
+    ))
+
+
+def iter_clip_pcm(path, params, chunk_frames=CHUNK_FRAMES):
+    """อ่าน PCM ของ clip ทีละก้อน แปลง format ด้วย ffmpeg เฉพาะเมื่อไม่ตรงกับ params"""
+    if _wav_params(path) == params:
+        with wave.open(path, "rb") as w:
+            while True:
+                data = w.readframes(chunk_frames)
+                if not data:
+                    return
+                yield data
+    channels, sampwidth, rate = params
+    proc = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", path,
+         "-f", PCM_FORMATS[sampwidth], "-ar", str(rate), "-ac", str(channels), "pipe:1"],
+        stdout=subprocess.PIPE,
+    )
+    try:
+        while True:
+            data = proc.stdout.read(chunk_frames * channels * sampwidth)
+            if not data:
+                break
+            yield data
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {path}")
+
+
+def _clip_frames(path, params):
+    # จำนวน frame จาก header (None ถ้าต้อง decode ก่อนถึงจะรู้)
+    if _wav_params(path) != params:
+        return None
+    with wave.open(path, "rb") as w:
+        return w.getnframes()
+
+
+def _write_clips(out_f, clip_paths, keys, indices, params, gaps, offset, chunk_frames):
+    channels, sampwidth, _ = params
+    frame_bytes = channels * sampwidth
+    segments = []
+    for index in indices:
+        written = 0
+        for data in iter_clip_pcm(clip_paths[index], params, chunk_frames):
+            out_f.write(data)
+            written += len(data)
+        frames = written // frame_bytes
+        segments.append({
+            "index": index, "key": keys[index], "offset": offset, "frames": frames, "gap_frames": gaps[index],
+        })
+        out_f.write(_silence(gaps[index], channels, sampwidth))
+        offset += frames + gaps[index]
+    return segments, offset
+
+
+def _layout(output_path, params, frames, segments, patched_from=None):
+    channels, sampwidth, rate = params
+    return {
+        "path": output_path,
+        "channels": channels,
+        "sample_width": sampwidth,
+        "sample_rate": rate,
+        "frames": frames,
+        "segments": segments,
+        "patched_from": patched_from,
+    }
+
+
+def _can_patch(previous, output_path, params):
+    if not previous or previous.get("path") != output_path or not os.path.exists(output_path):
+        return False
+    if (previous["channels"], previous["sample_width"], previous["sample_rate"]) != params:
+        return False
+    # layout แบบเก่าไม่มี gap ต่อ segment
+    if any(seg.get("key") is None or seg.get("gap_frames") is None for seg in previous["segments"]):
+        return False
+    frame_bytes = params[0] * params[1]
+    return os.path.getsize(output_path) == HEADER_BYTES + previous["frames"] * frame_bytes
+
+
+class _Tee:
+    def __init__(self, out_f, sink):
+        self.out_f = out_f
+        self.sink = sink
+
+    def write(self, data):
+        self.out_f.write(data)
+        self.sink.write(data)
+
+
+def assemble_episode(clip_paths, output_path, gap_ms=300, keys=None, previous=None, chunk_frames=CHUNK_FRAMES,
+                     gaps_ms=None, sink=None, sink_params=None):
+    """
+    ต่อ clip ตามลำดับลงไฟล์ WAV เดียวแบบ streaming (memory คงที่ เวลาเป็น linear)
+    คืนค่า layout ของแต่ละ segment เป็นตำแหน่ง frame ในไฟล์ผลลัพธ์
+
+    gaps_ms: ความยาวช่วงเงียบหลังแต่ละ clip (ไม่ส่ง = gap_ms ทุก clip)
+    keys: id ของเนื้อหาแต่ละ clip ถ้าส่ง previous (layout ที่ได้จากครั้งก่อน) มาด้วย
+    จะแก้เฉพาะช่วงที่ key หรือ gap เปลี่ยนในไฟล์เดิม แทนการเขียนใหม่ทั้งไฟล์
+    sink: ถ้ามี จะได้ PCM ของทั้งตอนตามลำดับผ่าน sink.write() ระหว่างที่เขียนไฟล์ (sink_params คือ
+    format ที่ sink คาดไว้ ต้องตรงกับของไฟล์ผลลัพธ์) กรณี patch จะอ่านไฟล์ที่แก้แล้วส่งให้ทั้งตอน
+    """
+    params = next((p for p in map(_wav_params, clip_paths) if p), DEFAULT_PARAMS)
+    if sink is not None and sink_params is not None and tuple(sink_params) != params:
+        raise ValueError(f"sink expects {tuple(sink_params)} but clips are {params}")
+    channels, sampwidth, rate = params
+    gaps_ms = list(gaps_ms) if gaps_ms is not None else [gap_ms] * len(clip_paths)
+    gaps = [int(rate * ms / 1000) for ms in gaps_ms]
+    keys = list(keys) if keys is not None else [None] * len(clip_paths)
+
+    if None not in keys and _can_patch(previous, output_path, params):
+        layout = _patch_episode(clip_paths, keys, output_path, previous, params, gaps, chunk_frames)
+        if sink is not None:
+            for data in iter_clip_pcm(output_path, params, chunk_frames):
+                sink.write(data)
+        return layout
+
+    tmp_path = f"{output_path}.part"
+    try:
+        with open(tmp_path, "wb") as out_f:
+            _write_header(out_f, channels, sampwidth, rate, 0)
+            segments, frames = _write_clips(
+                _Tee(out_f, sink) if sink is not None else out_f,
+                clip_paths, keys, range(len(clip_paths)), params, gaps, 0, chunk_frames
+            )
+            # แก้ขนาดใน header หลังเขียนครบ
+            out_f.seek(0)
+            _write_header(out_f, channels, sampwidth, rate, frames * channels * sampwidth)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return _layout(output_path, params, frames, segments)
+
+
+def _patch_episode(clip_paths, keys, output_path, previous, params, gaps, chunk_frames):
+    channels, sampwidth, rate = params
+    frame_bytes = channels * sampwidth
+    old = previous["segments"]
+
+    # ส่วนหัวและส่วนท้ายที่ key ตรงกับครั้งก่อนไม่ต้องเขียนใหม่
+    def same(seg, i):
+        return seg["key"] == keys[i] and seg["gap_frames"] == gaps[i]
+
+    start = 0
+    while start < min(len(old), len(keys)) and same(old[start], start):
+        start += 1
+    end_old, end_new = len(old), len(keys)
+    while end_old > start and end_new > start and same(old[end_old - 1], end_new - 1):
+        end_old -= 1
+        end_new -= 1
+
+    region_offset = old[start]["offset"] if start < len(old) else previous["frames"]
+    old_frames = sum(seg["frames"] + seg["gap_frames"] for seg in old[start:end_old])
+    new_frames = [_clip_frames(path, params) for path in clip_paths[start:end_new]]
+    # ช่วงใหม่ยาวเท่าเดิม: เขียนทับเฉพาะช่วงนั้น / ไม่เท่า: ตัดไฟล์ที่จุดแรกที่เปลี่ยนแล้วต่อท้ายใหม่
+    in_place = None not in new_frames and sum(
+        f + g for f, g in zip(new_frames, gaps[start:end_new])
+    ) == old_frames
+    rewrite_to = end_new if in_place else len(keys)
+
+    segments = [dict(seg, index=i) for i, seg in enumerate(old[:start])]
+    with open(output_path, "r+b") as out_f:
+        out_f.seek(HEADER_BYTES + region_offset * frame_bytes)
+        if not in_place:
+            out_f.truncate()
+        written, frames = _write_clips(
+            out_f, clip_paths, keys, range(start, rewrite_to), params, gaps, region_offset, chunk_frames
+        )
+        segments.extend(written)
+        if in_place:
+            segments.extend(dict(seg, index=end_new + i) for i, seg in enumerate(old[end_old:]))
+            frames = previous["frames"]
+        out_f.seek(0)
+        _write_header(out_f, channels, sampwidth, rate, frames * frame_bytes)
+
+    return _layout(output_path, params, frames, segments, patched_from=start)
@@ -0,0 +1,127 @@
+import os
+import math
+import wave
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from audio_assembler import iter_clip_pcm, _wav_params, DEFAULT_PARAMS
+
+DEFAULT_SETTINGS = {
+    "window_ms": 10,            # ความยาวหน้าต่างที่ใช้วัดพลังงาน
+    "trim_threshold_db": -45.0, # หน้าต่างที่ RMS ต่ำกว่านี้ (dBFS) ถือว่าเงียบ
+    "trim_pad_ms": 40,          # เหลือช่วงเงียบไว้หน้า/หลังเสียงพูดเล็กน้อย ไม่ให้ตัดพยัญชนะ
+    "max_gain_db": 12.0,        # ไม่ขยาย clip ที่เบามาก ๆ เกินนี้ (กัน noise ดังขึ้นตาม)
+    "peak_dbfs": -1.0,          # เพดาน peak หลังปรับ gain
+    "fade_ms": 15,              # fade เข้า/ออกที่ขอบ clip ให้รอยต่อกับช่วงเงียบไม่มีเสียงคลิก
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _db_to_amplitude(db):
+    return 10 ** (db / 20)
+
+
+def output_params(clip_paths):
+    # ใช้จำนวน channel และ sample rate ของ clip แรกที่อ่านได้ (ไม่ต้อง resample) แต่เป็น 16-bit เสมอ
+    for path in clip_paths:
+        params = _wav_params(path)
+        if params:
+            return (params[0], 2, params[2])
+    return DEFAULT_PARAMS
+
+
+def process_clip(src_path, dst_path, params, target_dbfs, settings=DEFAULT_SETTINGS):
+    """
+    อ่าน clip ครั้งเดียวเป็น NumPy array แล้วทำทุกขั้นแบบ vectorized:
+    ตัดช่วงเงียบหัว/ท้ายตามพลังงาน, ปรับ gain ให้ RMS ของช่วงที่มีเสียงเท่ากับ target_dbfs,
+    fade ที่ขอบ แล้วเขียนเป็น PCM 16-bit ตาม params
+    """
+    import numpy as np
+
+    channels, sampwidth, rate = params
+    if sampwidth != 2:
+        raise ValueError("processed clips are 16-bit PCM")
+    pcm = b"".join(iter_clip_pcm(src_path, params))
+    samples = np.frombuffer(pcm, dtype="<i2").reshape(-1, channels).astype(np.float32) / 32768
+    source_frames = len(samples)
+
+    window = max(1, rate * settings["window_ms"] // 1000)
+    windows = source_frames // window
+    mono = samples.mean(axis=1)
+    rms = np.sqrt(np.mean(np.square(mono[:windows * window].reshape(windows, window)), axis=1))
+    voiced = rms > _db_to_amplitude(settings["trim_threshold_db"])
+
+    gain = 1.0
+    if voiced.any():
+        first = int(np.argmax(voiced))
+        last = windows - 1 - int(np.argmax(voiced[::-1]))
+        pad = rate * settings["trim_pad_ms"] // 1000
+        samples = samples[max(0, first * window - pad):min(source_frames, (last + 1) * window + pad)]
+        level = float(np.sqrt(np.mean(np.square(rms[voiced]))))
+        gain = min(_db_to_amplitude(target_dbfs) / level, _db_to_amplitude(settings["max_gain_db"]))
+        peak = float(np.abs(samples).max())
+        if peak * gain > _db_to_amplitude(settings["peak_dbfs"]):
+            gain = _db_to_amplitude(settings["peak_dbfs"]) / peak
+        samples = samples * gain
+    else:
+        # ทั้ง clip เงียบ (หรือสั้นกว่าหนึ่งหน้าต่าง) ไม่เหลือเสียงให้ต่อ
+        samples = samples[:0]
+
+    fade = min(rate * settings["fade_ms"] // 1000, len(samples) // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, endpoint=False, dtype=np.float32)[:, None]
+        samples[:fade] *= ramp
+        samples[-fade:] *= ramp[::-1]
+
+    out = np.clip(np.round(samples * 32767), -32768, 32767).astype("<i2")
+    tmp_path = f"{dst_path}.part"
+    with wave.open(tmp_path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(out.tobytes())
+    os.replace(tmp_path, dst_path)
+    return {
+        "frames": len(out),
+        "trimmed_frames": source_frames - len(out),
+        "gain_db": 20 * math.log10(gain) if gain > 0 else None,
+    }
+
+
+def _process(job):
+    src_path, dst_path, params, target_dbfs, settings = job
+    return process_clip(src_path, dst_path, params, target_dbfs, settings)
+
+
+def _get_pool(workers):
+    # process pool ใช้ร่วมกันทั้ง process สร้างครั้งแรกที่ใช้ (spawn: ไม่ fork thread ของ API ไปด้วย)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def process_clips(jobs, params, settings=DEFAULT_SETTINGS, workers=None):
+    """
+    jobs: list ของ (src_path, dst_path, target_dbfs) ประมวลผลพร้อมกันหลาย core
+    คืน stats ของแต่ละ clip เรียงตามลำดับที่ส่งเข้ามา
+    """
+    global _pool
+    workers = workers or os.cpu_count() or 1
+    tasks = [(src, dst, params, target, settings) for src, dst, target in jobs]
+    if workers <= 1 or len(tasks) <= 1:
+        return [_process(task) for task in tasks]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    pool = _get_pool(workers)
+    try:
+        return list(pool.map(_process, tasks, chunksize=chunksize))
+    except BrokenProcessPool:
+        # worker ตาย (เช่นโดน OOM kill) pool ใช้ต่อไม่ได้ ครั้งถัดไปสร้างใหม่
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
@@ -0,0 +1,132 @@
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from jobs import Job, run_job
+
+
+class StageLimits:
+    """
+    จำกัดจำนวนงานที่อยู่ในแต่ละ stage พร้อมกัน (download, ffmpeg, transcribe, llm)
+    แยกกันคนละ semaphore ทำให้หลาย item ไหลผ่านคนละ stage ได้พร้อมกันแบบ pipeline
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._semaphores = {name: threading.BoundedSemaphore(n) for name, n in self.limits.items()}
+        self._lock = threading.Lock()
+        self._stats = {name: {"runs": 0, "active": 0, "busy_seconds": 0.0, "wait_seconds": 0.0} for name in self.limits}
+
+    @contextmanager
+    def stage(self, name):
+        waited = time.perf_counter()
+        with self._semaphores[name]:
+            started = time.perf_counter()
+            with self._lock:
+                stats = self._stats[name]
+                stats["wait_seconds"] += started - waited
+                stats["active"] += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    stats["active"] -= 1
+                    stats["runs"] += 1
+                    stats["busy_seconds"] += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(s, limit=self.limits[name]) for name, s in self._stats.items()}
+
+
+class Batch:
+    def __init__(self, sources, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.sources = list(sources)
+        self.items = [Job("step1") for _ in self.sources]
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cleanup = cleanup
+        self._remaining = len(self.items)
+        self._lock = threading.Lock()
+
+    def _item_done(self, index):
+        if self._cleanup:
+            self._cleanup(self.sources[index])
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self.finished_at = time.time()
+
+    def cancel(self):
+        for item in self.items:
+            if not item.done:
+                item._cancel.set()
+
+    def to_dict(self):
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        succeeded = counts.get("succeeded", 0)
+        # เวลารวมถ้ารันทีละ item เทียบกับเวลาจริง บอกว่าได้ประโยชน์จากการทำพร้อมกันแค่ไหน
+        item_seconds = sum(
+            (item.finished_at or time.time()) - item.started_at for item in self.items if item.started_at
+        )
+        return {
+            "batch_id": self.id,
+            "done": self.finished_at is not None,
+            "counts": counts,
+            "elapsed_seconds": elapsed,
+            "items_per_minute": succeeded / elapsed * 60 if elapsed else 0.0,
+            "sum_item_seconds": item_seconds,
+            "speedup": item_seconds / elapsed if elapsed else 0.0,
+            "items": [
+                dict(item.to_dict(), source=source, result=item.result)
+                for source, item in zip(self.sources, self.items)
+            ],
+        }
+
+
+class BatchRunner:
+    """
+    รัน fn(source, progress=..., stages=...) ให้ทุก source ใน batch
+    item ที่รันพร้อมกันจำกัดด้วย max_in_flight ส่วนแต่ละ stage จำกัดด้วย StageLimits
+    """
+
+    def __init__(self, fn, limits, max_in_flight=16, retention=3600):
+        self.fn = fn
+        self.stages = StageLimits(limits)
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="batch")
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def submit(self, sources, cleanup=None):
+        batch = Batch(sources, cleanup)
+        with self._lock:
+            self._prune_locked()
+            self._batches[batch.id] = batch
+        for index, (source, item) in enumerate(zip(batch.sources, batch.items)):
+            self._executor.submit(self._run_item, batch, index, source, item)
+        return batch
+
+    def _run_item(self, batch, index, source, item):
+        try:
+            run_job(item, self.fn, (source,), {"stages": self.stages})
+        finally:
+            batch._item_done(index)
+
+    def get(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.retention
+        expired = [b.id for b in self._batches.values() if b.finished_at and b.finished_at < cutoff]
+        for batch_id in expired:
+            del self._batches[batch_id]
+
+    def stats(self):
+        return {"stages": self.stages.stats()}
@@ -0,0 +1,242 @@
+"""
+server ปลอมสำหรับ benchmark: transcription, Botnoi TTS และ OpenAI chat completions
+(session store ปลอมคือ FakeStoreBackend ที่ห่อ SQLite ใน process ของ pipeline)
+ทุกตัวตั้ง latency, jitter และ error rate ได้ ไม่ต้องต่อ network จริง
+
+    python -m bench.fakes --port 8790 --latency 0.05 --jitter 0.02 --error-rate 0.01
+"""
+import io
+import json
+import math
+import time
+import wave
+import random
+import struct
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSCRIBE_PATH = "/audio/transcibe_audio"
+TTS_PATH = "/script/botnoi-voice"
+CHAT_PATH = "/v1/chat/completions"
+SUGGESTIONS_MARKER = "### Suggested Follow-up Questions:"
+
+
+class FakeProfile:
+    """เวลาตอบ = latency ± jitter (สุ่มแบบ uniform) และตอบ 500 ด้วยความน่าจะเป็น error_rate"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def delay(self, scale=1.0):
+        seconds = self.latency * scale + random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("latency", 0.0), data.get("jitter", 0.0), data.get("error_rate", 0.0))
+
+
+def _tone_wav(seconds, sample_rate=22050):
+    frames = max(1, int(seconds * sample_rate))
+    samples = (int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)) for i in range(frames))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buf.getvalue()
+
+
+def _dialogue(lines):
+    turns = [f"{'AB'[i % 2]}: ประเด็นที่ {i + 1} ของบทสนทนาจำลองสำหรับวัดประสิทธิภาพ" for i in range(lines)]
+    questions = "\n".join(f"{i + 1}. คำถามต่อเนื่องข้อ {i + 1}?" for i in range(3))
+    return "\n".join(turns) + f"\n\n{SUGGESTIONS_MARKER}\n{questions}\n"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # ถูกแทนด้วย config จริงใน make_server
+    profiles = {}
+    options = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _form(self, body):
+        # aiohttp ส่ง field ล้วนเป็น urlencoded ส่วนที่มีไฟล์ (requests) เป็น multipart/form-data
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return {k: v[0].encode() for k, v in parse_qs(body.decode()).items()}
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = part.get_payload(decode=True)
+        return fields
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data, status=200):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode())
+
+    def do_GET(self):
+        # health check ของ fake เอง (และให้ /readyz ของ API ต่อถึง)
+        self._json({"ok": True})
+
+    def do_POST(self):
+        body = self._body()
+        routes = {TRANSCRIBE_PATH: self._transcribe, TTS_PATH: self._tts, CHAT_PATH: self._chat}
+        handler = routes.get(self.path)
+        if handler is None:
+            return self._json({"error": "not found"}, 404)
+        profile = self.profiles[handler.__name__.strip("_")]
+        if profile.should_fail():
+            profile.delay()
+            return self._json({"error": "injected failure"}, 500)
+        handler(body, profile)
+
+    def _transcribe(self, body, profile):
+        fields = self._form(body)
+        with wave.open(io.BytesIO(fields.get("audios") or b""), "rb") as w:
+            seconds = w.getnframes() / w.getframerate()
+        # ถอดเสียงช้าตามความยาว chunk: latency คือเวลาต่อเสียง 1 นาที
+        profile.delay(scale=seconds / 60)
+        words = max(1, int(seconds * self.options["words_per_second"]))
+        self._json({"transcribe_text": " ".join(f"คำ{i}" for i in range(words))})
+
+    def _tts(self, body, profile):
+        fields = self._form(body)
+        text = (fields.get("script") or b"").decode()
+        profile.delay()
+        self._send(200, _tone_wav(len(text) * self.options["tts_seconds_per_char"]), "audio/wav")
+
+    def _chat(self, body, profile):
+        request = json.loads(body)
+        content = _dialogue(self.options["reply_lines"])
+        usage = {
+            "prompt_tokens": sum(len(m.get("content") or "") for m in request["messages"]) // 4,
+            "completion_tokens": len(content) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": request["model"]}
+        profile.delay()
+        if not request.get("stream"):
+            return self._json(dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }]))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk = dict(base, object="chat.completion.chunk")
+        for line in content.splitlines(keepends=True):
+            time.sleep(self.options["stream_seconds_per_line"])
+            delta = {"index": 0, "delta": {"content": line}, "finish_reason": None}
+            self.wfile.write(f"data: {json.dumps(dict(chunk, choices=[delta]))}\n\n".encode())
+            self.wfile.flush()
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(f"data: {json.dumps(dict(chunk, choices=[], usage=usage))}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class FakeStoreBackend:
+    """ห่อ session store backend จริง (SQLite) ให้ทุก call มี latency/jitter/error ตาม profile"""
+
+    def __init__(self, backend, profile):
+        self.backend = backend
+        self.profile = profile
+
+    def __getattr__(self, name):
+        method = getattr(self.backend, name)
+
+        def call(*args, **kwargs):
+            self.profile.delay()
+            if self.profile.should_fail():
+                raise RuntimeError("injected session store failure")
+            return method(*args, **kwargs)
+        return call
+
+
+DEFAULT_OPTIONS = {
+    "words_per_second": 2.5,
+    "tts_seconds_per_char": 0.06,
+    "reply_lines": 12,
+    "stream_seconds_per_line": 0.01,
+}
+
+
+def make_server(host="127.0.0.1", port=0, profiles=None, options=None):
+    """profiles: {"transcribe"|"tts"|"chat": FakeProfile} ตัวที่ไม่ระบุจะตอบทันที"""
+    handler = type("Handler", (FakeHandler,), {
+        "profiles": {name: (profiles or {}).get(name) or FakeProfile() for name in ("transcribe", "tts", "chat")},
+        "options": dict(DEFAULT_OPTIONS, **(options or {})),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(**kwargs):
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="bench-fakes", daemon=True).start()
+    return server
+
+
+def endpoints(base_url):
+    return {
+        "TRANSCRIBE_AUDIO_ENDPOINT": base_url + TRANSCRIBE_PATH,
+        "BOTNOI_VOICE_ENDPOINT": base_url + TTS_PATH,
+        "OPENAI_BASE_URL": base_url + "/v1",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--config", help="JSON: {profiles: {transcribe|tts|chat: {latency, jitter, error_rate}}, options: {...}}")
+    parser.add_argument("--latency", type=float, default=0.0, help="ใช้กับทุก server ที่ไม่ได้ระบุใน --config")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = json.loads(args.config) if args.config else {}
+    default = FakeProfile(args.latency, args.jitter, args.error_rate)
+    profiles = {name: FakeProfile.from_dict(data) for name, data in config.get("profiles", {}).items()}
+    for name in ("transcribe", "tts", "chat"):
+        profiles.setdefault(name, default)
+    server = make_server(args.host, args.port, profiles, config.get("options"))
+    # บรรทัดแรกบอก URL ให้ bench.run อ่าน (port=0 คือให้ OS เลือก)
+    print(json.dumps({"url": f"http://{args.host}:{server.server_address[1]}"}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
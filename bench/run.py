@@ -0,0 +1,200 @@
+"""
+benchmark ของ pipeline แบบ offline: ทุก dependency ภายนอกเป็นของปลอมจาก bench.fakes
+แต่ละ scenario (mode × ความยาวเสียง × จำนวนรอบ step2 × concurrency) รันใน process ใหม่
+ที่มี DOWNLOAD_DIR และ SQLite ของตัวเอง cache จึงเริ่มว่างทุกครั้ง
+
+    python -m bench.run --mode pipeline,api --source-seconds 60,600 --rounds 1,4 --concurrency 1,4 \\
+        --latency 0.05 --jitter 0.02 --out bench_report.json
+
+python -m ต้องรันจาก root ของ repo จาก directory อื่นให้รันเป็น script: python path/to/bench/run.py ...
+
+รายงาน (JSON) มี percentile ของแต่ละ step และแต่ละ stage (จาก trace ของ step), throughput,
+จำนวน error และ peak RSS ของ process ที่รัน pipeline พร้อม git commit สำหรับเทียบข้าม commit
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import itertools
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    # รันเป็น script จาก directory อื่น: ให้ import bench.* และ module ของ pipeline ได้
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_fakes(config):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.fakes", "--port", "0", "--config", json.dumps(config)],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line:
+        proc.wait()
+        raise RuntimeError("fake servers failed to start")
+    return proc, json.loads(line)["url"]
+
+
+def run_scenario(scenario, fakes_url, keep=False):
+    from bench.fakes import endpoints
+
+    workdir = tempfile.mkdtemp(prefix="podcast-bench-")
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        DOWNLOAD_DIR=os.path.join(workdir, "downloads"),
+        SESSION_STORE="sqlite",
+        SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+        # step ที่ cache ได้จะวัดตอนที่ต้องเรียกจริงทุกครั้ง
+        LLM_CACHE_ENABLED="0",
+        GPT_TOKEN="bench",
+        **endpoints(fakes_url),
+    )
+    output = os.path.join(workdir, "result.json")
+    config = dict(scenario, output=output)
+    try:
+        # cwd เป็น workdir เพราะ main.py สร้าง ./downloads
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.scenario", json.dumps(config)], cwd=workdir, env=env
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"scenario exited with {proc.returncode}")
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report_scenario(scenario, result):
+    sessions = result["sessions"]
+    ok = [s for s in sessions if s["error"] is None]
+    steps, stages = {}, {}
+    for session in sessions:
+        for step in session["steps"]:
+            steps.setdefault(step["step"], []).append(step["seconds"])
+        for trace in session["traces"]:
+            for span in trace["spans"]:
+                stages.setdefault(span["stage"], []).append(span["seconds"])
+    wall = result["wall_seconds"]
+    return dict(
+        scenario,
+        wall_seconds=wall,
+        sessions_ok=len(ok),
+        errors=len(sessions) - len(ok),
+        error_samples=sorted({s["error"] for s in sessions if s["error"]})[:5],
+        sessions_per_minute=len(ok) / wall * 60 if wall else 0.0,
+        steps_per_minute=sum(len(s["steps"]) for s in sessions) / wall * 60 if wall else 0.0,
+        peak_rss_mb=result["peak_rss_bytes"] / (1024 * 1024),
+        steps={name: summarize(values) for name, values in sorted(steps.items())},
+        stages={name: summarize(values) for name, values in sorted(stages.items())},
+    )
+
+
+def csv_list(kind):
+    return lambda text: [kind(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", type=csv_list(str), default=["pipeline"], help="pipeline,api")
+    parser.add_argument("--source-seconds", type=csv_list(float), default=[120.0])
+    parser.add_argument("--rounds", type=csv_list(int), default=[2], help="จำนวนครั้งของ step2 ต่อ session")
+    parser.add_argument("--concurrency", type=csv_list(int), default=[1, 4])
+    parser.add_argument("--sessions", type=int, default=None, help="session ต่อ scenario (ค่าเริ่มต้น 2 × concurrency)")
+    parser.add_argument("--latency", type=float, default=0.05, help="latency ของ fake ทุกตัว (transcribe: ต่อเสียง 1 นาที)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fakes-config", help="JSON ของ bench.fakes แทนค่าด้านบน (รวม options)")
+    parser.add_argument("--store-latency", type=float, default=0.005)
+    parser.add_argument("--store-jitter", type=float, default=0.002)
+    parser.add_argument("--store-error-rate", type=float, default=0.0)
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบ DOWNLOAD_DIR ของแต่ละ scenario")
+    args = parser.parse_args()
+
+    profile = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate}
+    fakes_config = json.loads(args.fakes_config) if args.fakes_config else {
+        "profiles": {name: profile for name in ("transcribe", "tts", "chat")},
+    }
+    store = {"latency": args.store_latency, "jitter": args.store_jitter, "error_rate": args.store_error_rate}
+
+    fakes, fakes_url = start_fakes(fakes_config)
+    scenarios = []
+    try:
+        grid = itertools.product(args.mode, args.source_seconds, args.rounds, args.concurrency)
+        for mode, source_seconds, rounds, concurrency in grid:
+            scenario = {
+                "mode": mode,
+                "source_seconds": source_seconds,
+                "rounds": rounds,
+                "concurrency": concurrency,
+                "sessions": args.sessions or 2 * concurrency,
+                "store": store,
+            }
+            result = report_scenario(scenario, run_scenario(scenario, fakes_url, args.keep))
+            scenarios.append(result)
+            step_p50 = ", ".join(f"{name} p50 {s['p50']:.2f}s" for name, s in result["steps"].items())
+            print(
+                f"{mode:8} src {source_seconds:>6.0f}s rounds {rounds} conc {concurrency:>2}: "
+                f"{result['sessions_per_minute']:.1f} sessions/min, {result['errors']} errors, "
+                f"peak RSS {result['peak_rss_mb']:.0f} MB — {step_p50}",
+                file=sys.stderr,
+            )
+    finally:
+        fakes.terminate()
+        fakes.wait()
+
+    report = {
+        "created_at": time.time(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "fakes": fakes_config,
+        "scenarios": scenarios,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"report written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+รัน scenario เดียวใน process ใหม่ (env ของ pipeline ถูกตั้งโดย bench.run ก่อน import)
+อ่าน config เป็น JSON จาก argv[1] แล้วเขียนผลเป็น JSON ลงไฟล์ config["output"]
+"""
+import os
+import sys
+import json
+import time
+import wave
+import math
+import struct
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUESTIONS = [
+    "เรื่องนี้ส่งผลกับคนทั่วไปอย่างไร?",
+    "มีตัวอย่างจริงที่เห็นได้ชัดไหม?",
+    "ถ้าจะเริ่มต้นควรทำอะไรก่อน?",
+]
+
+
+class RSSSampler:
+    """อ่าน VmRSS เป็นระยะ เก็บค่าสูงสุดระหว่าง scenario (ru_maxrss เป็น fallback ถ้าไม่มี /proc)"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _read(self):
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._read()
+            if rss:
+                self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak:
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def write_source_wav(path, seconds, seed, sample_rate=16000):
+    """
+    เสียงจำลอง: tone 2 วินาทีสลับเงียบ 0.5 วินาที (ให้ตัว split ตามช่วงเงียบมีจุดตัด)
+    sample แรกต่างกันตาม seed ทำให้ hash ของแต่ละ session ไม่ชนกับ cache ของ session อื่น
+    """
+    period = int(2.5 * sample_rate)
+    voiced = 2 * sample_rate
+    one_period = struct.pack(
+        f"<{period}h",
+        *(int(6000 * math.sin(2 * math.pi * 180 * i / sample_rate)) if i < voiced else 0 for i in range(period)),
+    )
+    frames = int(seconds * sample_rate)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(struct.pack("<h", seed % 32768))
+        written = 1
+        while written < frames:
+            data = one_period[:(frames - written) * 2]
+            w.writeframes(data)
+            written += len(data) // 2
+
+
+class PipelineClient:
+    """เรียก podcast_pipeline ตรง ๆ ใน process นี้"""
+
+    def __init__(self, pipeline, metrics):
+        self.pipeline = pipeline
+        self.metrics = metrics
+
+    def step1(self, source):
+        return self.pipeline.step1_initialize_and_generate_opening(source)
+
+    def step2(self, session_id, question):
+        self.pipeline.step2_continue_conversation(session_id, question)
+        return {"trace": self.metrics.last_trace(session_id, "step2")}
+
+    def step3(self, session_id):
+        self.pipeline.step3_finalize_and_generate_audio(session_id)
+        return {"trace": self.metrics.last_trace(session_id, "step3")}
+
+
+class ApiClient:
+    """ยิง HTTP ไปที่ main.app ที่รันด้วย uvicorn ใน thread ของ process นี้"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.http = requests.Session()
+
+    def _post(self, path, payload):
+        response = self.http.post(self.base_url + path, json=payload, timeout=3600)
+        response.raise_for_status()
+        return response.json()
+
+    def step1(self, source):
+        return self._post("/step1", {"youtube_url": source})
+
+    def step2(self, session_id, question):
+        return self._post("/step2", {"session_id": session_id, "question": question})
+
+    def step3(self, session_id):
+        return self._post("/step3", {"session_id": session_id})
+
+
+def start_api():
+    import socket
+    import uvicorn
+    import main
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="bench-api", daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("API did not start")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def run_session(client, source, rounds):
+    """คืน (เวลาของแต่ละ step, trace ของแต่ละ step, error ถ้ามี)"""
+    steps, traces = [], []
+
+    def step(name, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        steps.append({"step": name, "seconds": time.perf_counter() - started})
+        if result.get("trace"):
+            traces.append(result["trace"])
+        return result
+
+    try:
+        session_id = step("step1", client.step1, source)["session_id"]
+        for i in range(rounds):
+            step("step2", client.step2, session_id, QUESTIONS[i % len(QUESTIONS)])
+        step("step3", client.step3, session_id)
+        return steps, traces, None
+    except Exception as e:
+        return steps, traces, f"{type(e).__name__}: {e}"
+
+
+def run(config):
+    import metrics
+    import podcast_pipeline
+    from bench.fakes import FakeProfile, FakeStoreBackend
+
+    store = config.get("store") or {}
+    if store:
+        podcast_pipeline.session_store.backend = FakeStoreBackend(
+            podcast_pipeline.session_store.backend, FakeProfile.from_dict(store)
+        )
+    podcast_pipeline.ensure_dirs()
+
+    sources = []
+    for i in range(config["sessions"]):
+        path = os.path.join(podcast_pipeline.DOWNLOAD_DIR, f"bench_source_{i}.wav")
+        write_source_wav(path, config["source_seconds"], seed=i + 1)
+        sources.append(path)
+
+    server = None
+    if config["mode"] == "api":
+        server, base_url = start_api()
+        client = ApiClient(base_url)
+    else:
+        client = PipelineClient(podcast_pipeline, metrics)
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config["concurrency"]) as pool:
+            results = list(pool.map(lambda source: run_session(client, source, config["rounds"]), sources))
+        wall = time.perf_counter() - started
+
+    if server:
+        server.should_exit = True
+    return {
+        "wall_seconds": wall,
+        "peak_rss_bytes": rss.peak,
+        "sessions": [{"steps": steps, "traces": traces, "error": error} for steps, traces, error in results],
+    }
+
+
+if __name__ == "__main__":
+    config = json.loads(sys.argv[1])
+    result = run(config)
+    with open(config["output"], "w") as f:
+        json.dump(result, f, ensure_ascii=False)
@@ -0,0 +1,41 @@
+from llm_tokens import count_tokens, split_into_windows
+
+
+def format_dialogue(lines):
+    return "".join(f"{line['speaker']}: {line['text']}\n" for line in lines)
+
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o-mini"):
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    return split_into_windows(text, max_tokens, 0, model)[0]
+
+
+def split_recent_lines(lines, max_tokens, model="gpt-4o-mini", min_lines=2):
+    """
+    แบ่งเป็น (older, recent) โดย recent คือบรรทัดท้ายสุดที่รวมกันไม่เกิน max_tokens
+    (อย่างน้อย min_lines บรรทัดแม้จะเกิน budget)
+    """
+    used = 0
+    start = len(lines)
+    while start > 0:
+        cost = count_tokens(f"{lines[start - 1]['speaker']}: {lines[start - 1]['text']}\n", model)
+        if used + cost > max_tokens and len(lines) - start >= min_lines:
+            break
+        used += cost
+        start -= 1
+    return lines[:start], lines[start:]
+
+
+def batch_lines(lines, max_tokens, model="gpt-4o-mini"):
+    """แบ่งบรรทัดเป็นกลุ่มที่แต่ละกลุ่มไม่เกิน max_tokens (สำหรับย่อ dialogue ยาว ๆ ทีละก้อน)"""
+    batch, used = [], 0
+    for line in lines:
+        cost = count_tokens(f"{line['speaker']}: {line['text']}\n", model)
+        if batch and used + cost > max_tokens:
+            yield batch
+            batch, used = [], 0
+        batch.append(line)
+        used += cost
+    if batch:
+        yield batch
@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class DiskLRUCache:
+    """
+    ฐานของ cache บน disk หนึ่งไฟล์ต่อหนึ่ง key (แยก subdirectory ตาม 2 ตัวแรกของ key)
+    จำกัดขนาดรวมด้วย LRU eviction ลำดับการใช้งานเก็บใน mtime ของไฟล์ จึงคงอยู่ข้าม process
+    subclass กำหนด suffix และอ่าน/เขียนไฟล์เอง แล้วแจ้งผลด้วย _record_hit/_record_miss/_record_write
+    """
+
+    suffix = ""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._indexed = False
+
+    def _ensure_index(self):
+        # สแกน cache dir ตอนใช้ครั้งแรก ไม่ใช่ตอนสร้าง object (cache ใหญ่ ๆ ทำให้ import ช้า)
+        if self._indexed:
+            return
+        with self._lock:
+            if not self._indexed:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._load_index()
+                self._indexed = True
+
+    def _load_index(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                st = os.stat(os.path.join(root, name))
+                found.append((st.st_mtime, name[:-len(self.suffix)] if self.suffix else name, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}{self.suffix}")
+
+    def _record_hit(self, key):
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            size = None
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            elif size is not None:
+                # ไฟล์ที่ process อื่นเขียนไว้
+                self._entries[key] = size
+                self._total_bytes += size
+
+    def _record_miss(self, key, remove=False):
+        # remove: ไฟล์ยังอยู่แต่ใช้ไม่ได้ (เสียหรือหมดอายุ)
+        if remove:
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self.misses += 1
+
+    def _record_write(self, key):
+        size = os.path.getsize(self.path_for(key))
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self.path_for(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        self._ensure_index()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,145 @@
+import os
+import wave
+import hashlib
+import tempfile
+import subprocess
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHUNK_BYTES = 256 * 1024
+YTDLP_MATCH_FILTER_REJECTED = 101
+
+
+class SourceTooLong(ValueError):
+    pass
+
+
+def _stop(proc):
+    if proc.poll() is None:
+        proc.kill()
+    proc.wait()
+
+
+def stream_youtube_pcm(youtube_url, max_seconds=None, chunk_bytes=CHUNK_BYTES):
+    """
+    ดาวน์โหลดด้วย yt-dlp แล้ว pipe เข้า ffmpeg ตรง ๆ ได้ PCM 16 kHz mono s16le ทีละก้อน
+    ไม่มีไฟล์ m4a กลางทาง และ decode ไปพร้อมกับการดาวน์โหลด
+    """
+    ytdlp_cmd = ["yt-dlp", "-f", "bestaudio", "--quiet", "--no-playlist", "-o", "-"]
+    if max_seconds:
+        # ปฏิเสธตั้งแต่ metadata ถ้ารู้ความยาวล่วงหน้า
+        ytdlp_cmd += ["--break-match-filters", f"!duration | duration <= {int(max_seconds)}"]
+    ytdlp = subprocess.Popen(ytdlp_cmd + [youtube_url], stdout=subprocess.PIPE)
+    ffmpeg = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", "pipe:0", "-vn",
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "pipe:1"],
+        stdin=ytdlp.stdout,
+        stdout=subprocess.PIPE,
+    )
+    # ให้ yt-dlp ได้ SIGPIPE ถ้า ffmpeg จบก่อน
+    ytdlp.stdout.close()
+    max_bytes = int(max_seconds * SAMPLE_RATE) * SAMPLE_WIDTH if max_seconds else None
+    total = 0
+    try:
+        while True:
+            data = ffmpeg.stdout.read(chunk_bytes)
+            if not data:
+                break
+            total += len(data)
+            if max_bytes and total > max_bytes:
+                raise SourceTooLong(f"source is longer than {max_seconds} seconds")
+            yield data
+        ffmpeg_code = ffmpeg.wait()
+        ytdlp_code = ytdlp.wait()
+        if ytdlp_code == YTDLP_MATCH_FILTER_REJECTED:
+            raise SourceTooLong(f"source is longer than {max_seconds} seconds")
+        if ytdlp_code != 0 or ffmpeg_code != 0:
+            raise RuntimeError(f"ingestion failed (yt-dlp exit {ytdlp_code}, ffmpeg exit {ffmpeg_code})")
+        if total == 0:
+            raise RuntimeError("no audio decoded from source")
+    finally:
+        _stop(ytdlp)
+        _stop(ffmpeg)
+        ffmpeg.stdout.close()
+
+
+def tee_pcm_to_wav(pcm_chunks, wav_path):
+    """
+    เขียน PCM ที่ผ่านมาลงไฟล์ WAV พร้อมกับส่งต่อให้ขั้นถัดไป
+    ไฟล์จะถูก rename เข้าที่จริงเมื่อ stream จบครบเท่านั้น
+    """
+    # ไฟล์ชั่วคราวชื่อไม่ซ้ำ: step1 ของ URL เดียวกันที่รันพร้อมกันจะไม่เขียนทับไฟล์ของกันและกัน
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=os.path.dirname(wav_path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(SAMPLE_WIDTH)
+            w.setframerate(SAMPLE_RATE)
+            for data in pcm_chunks:
+                w.writeframesraw(data)
+                yield data
+        os.replace(tmp_path, wav_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_pcm_to_wav(pcm_chunks, wav_path):
+    for _ in tee_pcm_to_wav(pcm_chunks, wav_path):
+        pass
+    return wav_path
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def _wav_transcode_command(input_spec, output_path, options=()):
+    return ["ffmpeg", "-v", "error", "-y", *options, "-i", input_spec, "-vn",
+            "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-f", "wav", output_path]
+
+
+def transcode_file_to_wav(source_path, wav_path, pass_fds=()):
+    subprocess.run(_wav_transcode_command(source_path, wav_path), check=True, pass_fds=pass_fds)
+    return wav_path
+
+
+def transcode_stream_to_wav(chunks, wav_path, max_bytes=None):
+    """
+    ส่งไฟล์ที่อัปโหลดเข้า ffmpeg ทาง stdin ทีละก้อน เก็บไว้เฉพาะ WAV 16 kHz
+    คืนค่า sha256 ของไฟล์ต้นฉบับ (ใช้ dedupe)
+    """
+    tmp_path = f"{wav_path}.part"
+    # -xerror: ไม่งั้น container ที่ต้อง seek (moov ท้ายไฟล์) จะจบด้วย exit 0 และได้ WAV เปล่า
+    proc = subprocess.Popen(_wav_transcode_command("pipe:0", tmp_path, ["-xerror"]), stdin=subprocess.PIPE)
+    digest = hashlib.sha256()
+    total = 0
+    writable = True
+    try:
+        for data in chunks:
+            total += len(data)
+            if max_bytes and total > max_bytes:
+                raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+            digest.update(data)
+            if writable:
+                try:
+                    proc.stdin.write(data)
+                except BrokenPipeError:
+                    # ffmpeg เลิกอ่านแล้ว อ่านต่อเพื่อ hash และเช็คขนาดให้ครบ
+                    writable = False
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if proc.wait() != 0:
+            raise RuntimeError("ffmpeg could not decode the upload from a stream")
+        os.replace(tmp_path, wav_path)
+    finally:
+        _stop(proc)
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return digest.hexdigest()
@@ -0,0 +1,135 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.info = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def report(self, stage, progress=None, **info):
+        """ให้ pipeline เรียกระหว่างทำงาน ใช้เป็นจุดเช็คการยกเลิกด้วย"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.stage = stage
+        if progress is not None:
+            self.progress = progress
+        self.info.update(info)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "info": self.info,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def run_job(job, fn, args=(), kwargs=None):
+    """รัน fn ใน thread ปัจจุบันพร้อมอัปเดตสถานะของ job (fn ได้รับ progress=job.report)"""
+    if job._cancel.is_set():
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        return
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        job.result = fn(*args, progress=job.report, **(kwargs or {}))
+        job.status = "succeeded"
+        job.progress = 1.0
+    except JobCancelled:
+        job.status = "cancelled"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e) or type(e).__name__
+    finally:
+        job.finished_at = time.time()
+
+
+class JobManager:
+    """
+    รันงานยาว ๆ (step1/step3) บน worker pool แยกจาก request ของ API
+    จำนวนงานที่รันพร้อมกันและจำนวนที่รอในคิวถูกจำกัดแยกกัน
+    """
+
+    def __init__(self, max_workers=2, max_queued=32, retention=3600):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """fn จะถูกเรียกพร้อม keyword progress=job.report"""
+        job = Job(kind)
+        with self._lock:
+            self._prune_locked()
+            queued = sum(1 for j in self._jobs.values() if j.status == "queued")
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs already queued")
+            self._jobs[job.id] = job
+            job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        run_job(job, fn, args, kwargs)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job._cancel.set()
+        # งานที่ยังไม่เริ่มยกเลิกได้ทันที ส่วนงานที่รันอยู่จะหยุดที่ progress ครั้งถัดไป
+        if job._future.cancel():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.retention
+        expired = [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_workers": self.max_workers, "max_queued": self.max_queued, "jobs": counts}
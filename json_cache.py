@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from disk_cache import DiskLRUCache
+
+
+def make_key(*parts):
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JsonCache(DiskLRUCache):
+    """
+    cache ค่า JSON บน disk หนึ่งไฟล์ต่อหนึ่ง key
+    หมดอายุตาม ttl (วินาที) และจำกัดขนาดรวมด้วย LRU eviction
+    """
+
+    suffix = ".json"
+
+    def __init__(self, cache_dir, max_bytes, ttl=None):
+        super().__init__(cache_dir, max_bytes)
+        self.ttl = ttl
+        self.expirations = 0
+
+    def get(self, key):
+        self._ensure_index()
+        try:
+            with open(self.path_for(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._record_miss(key, remove=True)
+            return None
+        if self.ttl is not None and time.time() - entry["created_at"] > self.ttl:
+            self._record_miss(key, remove=True)
+            with self._lock:
+                self.expirations += 1
+            return None
+        self._record_hit(key)
+        return entry["value"]
+
+    def set(self, key, value):
+        self._ensure_index()
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._record_write(key)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats["expirations"] = self.expirations
+        return stats
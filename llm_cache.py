@@ -0,0 +1,78 @@
+import metrics
+from json_cache import make_key
+
+
+class ChatCompletionCache:
+    """
+    cache คำตอบของ chat completion บน JsonCache โดย key จาก (model, messages, params)
+    ใช้กับ prompt ที่ผลลัพธ์ขึ้นกับ input อย่างเดียว (summary, opening, closing)
+    bypass=True ในแต่ละครั้งที่เรียก = ไม่อ่านและไม่เขียน cache
+    """
+
+    def __init__(self, client_factory, cache, enabled=True):
+        self._client_factory = client_factory
+        self.cache = cache
+        self.enabled = enabled
+        self.bypassed = 0
+
+    def _key(self, model, messages, params):
+        return make_key("chat", model, messages, params)
+
+    def complete(self, model, messages, bypass=False, **params):
+        if bypass or not self.enabled:
+            self.bypassed += 1
+            return self._create(model, messages, params)
+        key = self._key(model, messages, params)
+        content = self.cache.get(key)
+        if content is None:
+            content = self._create(model, messages, params)
+            self.cache.set(key, content)
+        else:
+            metrics.LLM_CALLS.inc(model=model, cache="hit")
+        return content
+
+    def _create(self, model, messages, params):
+        metrics.LLM_CALLS.inc(model=model, cache="miss")
+        with metrics.timed("openai", model=model) as span:
+            response = self._client_factory().chat.completions.create(model=model, messages=messages, **params)
+            usage = getattr(response, "usage", None)
+            metrics.record_llm_usage(model, usage)
+            if usage is not None:
+                span["tokens"] = usage.total_tokens
+        return response.choices[0].message.content
+
+    def stream(self, model, messages, bypass=False, **params):
+        """
+        yield ข้อความทีละ delta ถ้า hit จะได้ทั้งคำตอบใน delta เดียว
+        เก็บลง cache เฉพาะเมื่อ stream จบครบ (ผู้เรียกหยุดกลางทางจะไม่ถูกเก็บ)
+        """
+        use_cache = self.enabled and not bypass
+        if not use_cache:
+            self.bypassed += 1
+        else:
+            key = self._key(model, messages, params)
+            content = self.cache.get(key)
+            if content is not None:
+                metrics.LLM_CALLS.inc(model=model, cache="hit")
+                yield content
+                return
+        metrics.LLM_CALLS.inc(model=model, cache="miss")
+        parts = []
+        with metrics.timed("openai", model=model, stream=True) as span:
+            # include_usage: chunk สุดท้าย (ไม่มี choices) บอกจำนวน token ของทั้ง stream
+            stream = self._client_factory().chat.completions.create(
+                model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+            )
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    metrics.record_llm_usage(model, usage)
+                    span["tokens"] = usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        if use_cache:
+            self.cache.set(key, "".join(parts))
+
+    def stats(self):
+        return dict(self.cache.stats(), enabled=self.enabled, bypassed=self.bypassed)
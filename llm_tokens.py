@@ -0,0 +1,69 @@
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# ถ้าไม่มี tiktoken ใช้การประมาณแบบเผื่อไว้ (ภาษาไทยมักได้ token มากกว่าภาษาอังกฤษต่อหนึ่งตัวอักษร)
+CHARS_PER_TOKEN_ESTIMATE = 1.5
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return int(len(text) / CHARS_PER_TOKEN_ESTIMATE) + 1
+
+
+def split_into_windows(text, max_tokens, overlap_tokens=0, model="gpt-4o-mini"):
+    """
+    แบ่งข้อความเป็นช่วงที่ไม่เกิน max_tokens โดยแต่ละช่วงซ้อนกัน overlap_tokens
+    ตัดที่ช่องว่างหรือขึ้นบรรทัดใหม่ที่ใกล้ที่สุดเพื่อไม่ให้คำขาดกลาง
+    """
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return [text]
+    chars_per_token = len(text) / total
+    window_chars = max(1, int(max_tokens * chars_per_token))
+    overlap_chars = int(overlap_tokens * chars_per_token)
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + window_chars)
+        if end < len(text):
+            boundary = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            if boundary > start + window_chars // 2:
+                end = boundary
+        windows.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        # เริ่มช่วงถัดไปที่ต้นคำ
+        match = re.search(r"\s", text[next_start:end])
+        start = next_start + match.end() if match else next_start
+    return [w for w in windows if w]
+
+
+def batch_texts(texts, max_tokens, model="gpt-4o-mini"):
+    """รวมข้อความที่ติดกันเป็นกลุ่มที่แต่ละกลุ่มไม่เกิน max_tokens (ข้อความที่ยาวเกินเองอยู่กลุ่มเดียว)"""
+    batch, used = [], 0
+    for text in texts:
+        cost = count_tokens(f"{text}\n\n", model)
+        if batch and used + cost > max_tokens:
+            yield batch
+            batch, used = [], 0
+        batch.append(text)
+        used += cost
+    if batch:
+        yield batch
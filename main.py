@@ -1,19 +1,107 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse, Response
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional
 from fastapi.staticfiles import StaticFiles
 from podcast_pipeline import (
     step1_initialize_and_generate_opening,
     step2_continue_conversation,
-    step3_finalize_and_generate_audio
+    step2_stream_conversation,
+    step3_finalize_and_generate_audio,
+    render_session_video,
+    update_script_line,
+    insert_script_line,
+    delete_script_line,
+    list_sessions,
+    load_session,
+    cache_stats,
+    episode_renditions,
+    episode_video_path,
+    check_dependencies,
+    ensure_dirs,
+    storage,
+    DOWNLOAD_DIR,
 )
+from jobs import JobManager, QueueFull
+import metrics
+from batch import BatchRunner
+from ingest import UploadTooLarge, transcode_stream_to_wav, transcode_file_to_wav
+from uploads import PartSink, receive_multipart
+from starlette.concurrency import run_in_threadpool
 
 import os
+import json
+from email.utils import parsedate_to_datetime
+
+MEDIA_DIR = os.path.join(os.getcwd(), "downloads")
+READY_CACHE_SECONDS = float(os.getenv("READY_CACHE_SECONDS", "5"))
+startup = {"started_at": None, "startup_seconds": None}
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    ensure_dirs()
+    startup["started_at"] = time.time()
+    # เวลาตั้งแต่เริ่ม import main จนพร้อมรับ request (ไม่นับเวลา start interpreter/uvicorn)
+    startup["startup_seconds"] = time.perf_counter() - _import_started
+    storage.start()
+    yield
+    storage.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mount media directory (ให้ Streamlit หรือ browser โหลดไฟล์ media ได้)
-MEDIA_DIR = os.path.join(os.getcwd(), "downloads")
-app.mount("/downloads", StaticFiles(directory=MEDIA_DIR), name="downloads")
+app.mount("/downloads", StaticFiles(directory=MEDIA_DIR, check_dir=False), name="downloads")
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "1000")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# worker pool สำหรับงานยาว (step1/step3) แยกจาก concurrency ของ API
+job_manager = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("JOB_MAX_QUEUED", "32")),
+)
+
+# batch: แต่ละ stage มีขีดจำกัดของตัวเอง ffmpeg ใช้ CPU จึงตั้งตามจำนวน core
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "100"))
+batch_runner = BatchRunner(
+    step1_initialize_and_generate_opening,
+    {
+        "download": int(os.getenv("BATCH_DOWNLOAD_CONCURRENCY", "4")),
+        "ffmpeg": int(os.getenv("BATCH_FFMPEG_CONCURRENCY", str(os.cpu_count() or 2))),
+        "transcribe": int(os.getenv("BATCH_TRANSCRIBE_CONCURRENCY", "2")),
+        "llm": int(os.getenv("BATCH_LLM_CONCURRENCY", "4")),
+    },
+    max_in_flight=int(os.getenv("BATCH_MAX_IN_FLIGHT", "16")),
+)
+
+def collect_job_metrics():
+    counts = job_manager.stats()["jobs"]
+    for status in ("queued", "running", "succeeded", "failed", "cancelled"):
+        metrics.JOBS.set(counts.get(status, 0), status=status)
+
+metrics.registry.add_collector(collect_job_metrics)
+
+# ไฟล์อัปโหลดอยู่ที่ MEDIA_DIR (WAV ที่แปลงแล้ว และไฟล์ดิบของ batch ที่รอ stage ffmpeg)
+storage.add_location("upload", MEDIA_DIR, r"(?P<key>upload_[0-9a-f]+)\.wav")
+storage.add_location("upload", MEDIA_DIR, r"(?P<key>batch_src_[0-9a-f]{32})\.\w+")
+
+# upload ของ job ที่ยังไม่จบ: job ที่ถูกยกเลิกก่อนเริ่มไม่ได้รันโค้ดของเรา จึงดูจากสถานะ job แทนการ unpin เอง
+upload_jobs = {}
+
+def pinned_uploads():
+    for job_id, path in list(upload_jobs.items()):
+        job = job_manager.get(job_id)
+        if job is None or job.done:
+            upload_jobs.pop(job_id, None)
+        else:
+            yield path
+
+storage.add_pins(pinned_uploads)
 
 
 class Step1Request(BaseModel):
@@ -23,8 +111,55 @@ class Step2Request(BaseModel):
     session_id: str
     question: str
 
+class BatchRequest(BaseModel):
+    youtube_urls: List[str]
+
+class SessionRequest(BaseModel):
+    # /step3 (รอผล) และ /jobs/video ไม่มีแบบ progressive: field ที่ไม่รู้จักตอบ 422 แทนการเพิกเฉย
+    model_config = ConfigDict(extra="forbid")
+
+    session_id: str
+
 class Step3Request(BaseModel):
     session_id: str
+    progressive: bool = False
+
+class LineUpdateRequest(BaseModel):
+    speaker: Optional[Literal["A", "B"]] = None
+    text: Optional[str] = None
+
+class LineInsertRequest(BaseModel):
+    speaker: Literal["A", "B"]
+    text: str
+    after_line_id: Optional[str] = None
+
+
+@app.get("/healthz")
+def api_healthz():
+    # liveness: process ยังตอบได้ ไม่ตรวจ dependency
+    return {
+        "status": "ok",
+        "uptime_seconds": time.time() - startup["started_at"] if startup["started_at"] else None,
+        "startup_seconds": startup["startup_seconds"],
+    }
+
+_readiness = {"checked_at": 0.0, "checks": None}
+
+@app.get("/readyz")
+def api_readyz():
+    # ผลตรวจถูก cache ไว้สั้น ๆ ไม่ให้ probe ถี่ ๆ ไปกด dependency
+    if _readiness["checks"] is None or time.time() - _readiness["checked_at"] > READY_CACHE_SECONDS:
+        _readiness["checks"] = check_dependencies()
+        _readiness["checked_at"] = time.time()
+    checks = _readiness["checks"]
+    ready = all(c["ok"] for c in checks.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "checks": checks})
+
+
+@app.get("/metrics")
+def api_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/step1")
@@ -32,18 +167,91 @@ def api_step1(req: Step1Request):
     result = step1_initialize_and_generate_opening(req.youtube_url)
     return result
 
-from fastapi import UploadFile, File
-import shutil
 import uuid
+import hashlib
+import tempfile
+import subprocess
+
+@app.middleware("http")
+async def reject_oversize_upload(request: Request, call_next):
+    # ปฏิเสธตั้งแต่ header ก่อนรับ body (ไม่มี Content-Length จะถูกเช็คระหว่างรับใน receive_upload_form)
+    if request.url.path.endswith("/upload"):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": "Upload too large"})
+    return await call_next(request)
+
+async def receive_upload_form(request, open_part):
+    try:
+        return await receive_multipart(request, open_part, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def ingest_upload_chunks(chunks):
+    """
+    แปลงไฟล์ที่อัปโหลดเป็น WAV 16 kHz ระหว่างที่ยังรับ body อยู่ โดยไม่เก็บไฟล์ต้นฉบับ
+    ชื่อไฟล์ผลลัพธ์มาจาก hash ของไฟล์ต้นฉบับ อัปโหลดซ้ำจึงได้ไฟล์เดิม
+    """
+    tmp_path = os.path.join(MEDIA_DIR, f"upload_{uuid.uuid4().hex}.wav")
+    # สำเนาใน spool (memory ก่อน เกิน UPLOAD_CHUNK_BYTES ลง disk) เผื่อต้องแปลงใหม่จากไฟล์ที่ seek ได้
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_BYTES, dir=MEDIA_DIR) as spool:
+        def tee():
+            for data in chunks:
+                spool.write(data)
+                yield data
+
+        try:
+            try:
+                digest = transcode_stream_to_wav(tee(), tmp_path, MAX_UPLOAD_BYTES)
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except RuntimeError:
+                # container บางแบบ (เช่น mp4 ที่ moov อยู่ท้ายไฟล์) อ่านจาก pipe ไม่ได้ ต้องใช้ไฟล์ที่ seek ได้
+                try:
+                    digest = transcode_spooled_upload(spool, tmp_path)
+                except subprocess.CalledProcessError:
+                    raise HTTPException(status_code=400, detail="Unsupported or corrupt media file")
+            wav_path = os.path.join(MEDIA_DIR, f"upload_{digest}.wav")
+            os.replace(tmp_path, wav_path)
+        finally:
+            # WAV ครึ่ง ๆ ที่ ffmpeg เขียนไว้ก่อนพัง
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    storage.notify("upload", os.path.getsize(wav_path))
+    return wav_path
+
+def transcode_spooled_upload(spool, wav_path):
+    # ให้ ffmpeg อ่าน spool ตรง ๆ ทาง /dev/fd ไม่ต้อง copy อีกรอบ (fileno() ย้าย spool ที่ยังอยู่ใน memory ลง disk)
+    fd = spool.fileno()
+    spool.seek(0)
+    digest = hashlib.sha256()
+    for data in iter(lambda: spool.read(UPLOAD_CHUNK_BYTES), b""):
+        digest.update(data)
+    transcode_file_to_wav(f"/dev/fd/{fd}", wav_path, pass_fds=(fd,))
+    return digest.hexdigest()
+
+async def receive_single_upload(request):
+    """WAV ของไฟล์ใน field "file" ของ form"""
+    sinks = []
+
+    def open_part(name, filename):
+        if name != "file" or sinks:
+            return None
+        sinks.append(PartSink(ingest_upload_chunks))
+        return sinks[0]
+
+    await receive_upload_form(request, open_part)
+    if not sinks:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    return sinks[0].result
 
 @app.post("/step1/upload")
-def api_step1_upload(file: UploadFile = File(...)):
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    save_path = os.path.join(MEDIA_DIR, filename)
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def api_step1_upload(request: Request):
+    wav_path = await receive_single_upload(request)
 
-    result = step1_initialize_and_generate_opening(save_path)
+    result = await run_in_threadpool(step1_initialize_and_generate_opening, wav_path)
     return result
 
 
@@ -55,32 +263,339 @@ def api_step2(req: Step2Request):
         return {
             "session_id": req.session_id,
             "script": script,
-            "suggested_questions": questions
+            "suggested_questions": questions,
+            "trace": metrics.last_trace(req.session_id, "step2"),
         }
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/step2/stream")
+def api_step2_stream(req: Step2Request):
+    """Server-Sent Events: ส่งบรรทัด A:/B: ทันทีที่ LLM สร้างเสร็จแต่ละบรรทัด"""
+    events = step2_stream_conversation(req.session_id, req.question)
+    try:
+        # ดึง event แรกก่อน เพื่อให้ session ที่ไม่มีอยู่ตอบ 404 ได้
+        first = next(events)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    def body():
+        yield sse_event(*first)
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def step3_response(session_id, audio_path):
+    # audio_path คือ rendition แรกที่มี (บีบอัดแล้ว) ทุก format อยู่ใน renditions
+    renditions = {
+        fmt: {"url": media_url(path), "bytes": os.path.getsize(path), "mime_type": media_type(path)}
+        for fmt, path in episode_renditions(audio_path).items()
+    }
+
+    return {
+        "session_id": session_id,
+        "audio_path": next(iter(renditions.values()))["url"] if renditions else None,
+        "video_path": media_url(episode_video_path(audio_path)),
+        "renditions": renditions,
+        "trace": metrics.last_trace(session_id, "step3"),
+    }
+
 @app.post("/step3")
-def api_step3(req: Step3Request):
+def api_step3(req: SessionRequest):
     try:
         audio_path = step3_finalize_and_generate_audio(req.session_id)
+        return step3_response(req.session_id, audio_path)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-        # 👉 สร้าง URL path ที่ Streamlit จะใช้ได้
-        filename = os.path.basename(audio_path)
-        audio_url = f"/media/{filename}"
 
-        # optional: ตรวจสอบว่ามี video ไหม
-        video_path = audio_path.replace(".wav", ".mp4")
-        video_url = None
-        if os.path.exists(video_path):
-            video_url = f"/media/{os.path.basename(video_path)}"
+# --- Media: ไฟล์ใน DOWNLOAD_DIR พร้อม Range, ETag/Last-Modified และ cache ---
+MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".opus": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", str(365 * 24 * 3600)))
 
-        return {
-            "session_id": req.session_id,
-            "audio_path": audio_url,
-            "video_path": video_url
-        }
+def media_type(path):
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower())
+
+def media_version(stat):
+    return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+
+def media_url(path):
+    """
+    URL ของไฟล์ที่ /media พร้อม ?v= ตาม mtime/ขนาด ไฟล์ที่ถูกแก้ (เช่น patch ตอน) จึงได้ URL ใหม่
+    และ URL เดิมถูก cache ได้นานแบบ immutable
+    """
+    if not path:
+        return None
+    try:
+        version = media_version(os.stat(path))
+    except OSError:
+        return None
+    return f"/media/{os.path.relpath(path, DOWNLOAD_DIR)}?v={version}"
+
+def modified_since(header, stat):
+    # None ถ้าไม่มี header หรืออ่านวันที่ไม่ได้
+    if not header:
+        return None
+    try:
+        return int(stat.st_mtime) > parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+@app.get("/media/{path:path}")
+def api_media(path: str, request: Request, v: Optional[str] = None):
+    root = os.path.realpath(DOWNLOAD_DIR)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep) or media_type(full_path) is None or not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="Not found")
+    stat = os.stat(full_path)
+    storage.touch(full_path)
+    # v ตรงกับไฟล์ปัจจุบัน = เนื้อหาไม่เปลี่ยนอีกแล้ว / ไม่มี v (หรือเก่า) = ต้องถามใหม่ทุกครั้งด้วย ETag
+    if v == media_version(stat):
+        cache_control = f"public, max-age={MEDIA_MAX_AGE}, immutable"
+    else:
+        cache_control = "no-cache"
+    response = FileResponse(
+        full_path, stat_result=stat, media_type=media_type(full_path),
+        headers={"Cache-Control": cache_control},
+    )
+    etag = response.headers["etag"]
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    else:
+        not_modified = modified_since(request.headers.get("if-modified-since"), stat) is False
+    if not_modified:
+        return Response(status_code=304, headers={
+            "ETag": etag, "Last-Modified": response.headers["last-modified"], "Cache-Control": cache_control,
+        })
+    return response
+
+
+# --- Sessions: list แบบแบ่งหน้าและโหลด script แยกทีละ session ---
+
+def preferred_rendition(audio_path):
+    if not audio_path:
+        return None
+    return next(iter(episode_renditions(audio_path).values()), None)
+
+@app.get("/sessions")
+def api_list_sessions(limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    try:
+        rows, next_cursor = list_sessions(limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    sessions = [{
+        "session_id": row["session_id"],
+        "timestamp": row["timestamp"],
+        "line_count": row["line_count"],
+        "duration": row["duration"],
+        "audio_url": media_url(preferred_rendition(row["audio_path"])),
+        # มีเฉพาะ session ที่ render video แล้ว (VIDEO_ENABLED หรือ /jobs/video)
+        "video_url": media_url(episode_video_path(row["audio_path"])) if row["audio_path"] else None,
+    } for row in rows]
+    return {"sessions": sessions, "next_cursor": next_cursor}
+
+@app.get("/sessions/{session_id}/script")
+def api_session_script(session_id: str):
+    try:
+        session = load_session(session_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    return {
+        "session_id": session_id,
+        "script_lines": session.script_lines,
+        "suggested_questions": session.suggested_questions,
+    }
+
+
+@app.get("/cache/stats")
+def api_cache_stats():
+    return cache_stats()
+
+
+@app.get("/storage")
+def api_storage():
+    return storage.stats()
+
+@app.post("/storage/gc")
+def api_storage_gc():
+    # รัน GC ทันทีแทนการรอรอบถัดไป
+    return {"removed": storage.collect(), "stats": storage.stats()}
+
+
+# --- แก้ script ทีละบรรทัด: step3 ครั้งถัดไป synthesize และ patch เฉพาะบรรทัดที่เปลี่ยน ---
+def edit_script(session_id, fn, *args, **kwargs):
+    try:
+        script_lines = fn(session_id, *args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"session_id": session_id, "script_lines": script_lines}
+
+@app.patch("/sessions/{session_id}/lines/{line_id}")
+def api_update_line(session_id: str, line_id: str, req: LineUpdateRequest):
+    return edit_script(session_id, update_script_line, line_id, speaker=req.speaker, text=req.text)
+
+@app.post("/sessions/{session_id}/lines")
+def api_insert_line(session_id: str, req: LineInsertRequest):
+    return edit_script(session_id, insert_script_line, req.speaker, req.text, after_line_id=req.after_line_id)
+
+@app.delete("/sessions/{session_id}/lines/{line_id}")
+def api_delete_line(session_id: str, line_id: str):
+    return edit_script(session_id, delete_script_line, line_id)
+
+
+# --- Jobs: ส่งงานเข้าคิวแล้วได้ job_id กลับทันที ---
+def submit_job(kind, fn, *args):
+    try:
+        job = job_manager.submit(kind, fn, *args)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.to_dict()
+
+def run_step3_job(session_id, progressive=False, progress=None):
+    audio_path = step3_finalize_and_generate_audio(session_id, progress=progress, progressive=progressive)
+    return step3_response(session_id, audio_path)
+
+@app.post("/jobs/step1", status_code=202)
+def api_job_step1(req: Step1Request):
+    return submit_job("step1", step1_initialize_and_generate_opening, req.youtube_url)
+
+@app.post("/jobs/step1/upload", status_code=202)
+async def api_job_step1_upload(request: Request):
+    wav_path = await receive_single_upload(request)
+    job = submit_job("step1", step1_initialize_and_generate_opening, wav_path)
+    upload_jobs[job["job_id"]] = wav_path
+    return job
+
+def run_video_job(session_id, progress=None):
+    audio_path = render_session_video(session_id, progress=progress)
+    return step3_response(session_id, audio_path)
+
+@app.post("/jobs/step3", status_code=202)
+def api_job_step3(req: Step3Request):
+    return submit_job("step3", run_step3_job, req.session_id, req.progressive)
+
+@app.post("/jobs/video", status_code=202)
+def api_job_video(req: SessionRequest):
+    # render MP4 ของตอนที่ทำ step3 แล้ว แยกเป็น job ของตัวเองเพราะใช้เวลานานกว่าเสียงหลายเท่า
+    return submit_job("video", run_video_job, req.session_id)
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+def api_job_status(job_id: str):
+    status = get_job_or_404(job_id).to_dict()
+    # step3 แบบ progressive: ฟังได้จาก playlist นี้ระหว่างที่งานยังไม่เสร็จ
+    playlist = status["info"].get("playlist")
+    if playlist:
+        status["playlist_url"] = f"/media/{playlist}"
+    return status
+
+@app.get("/jobs/{job_id}/result")
+def api_job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+@app.delete("/jobs/{job_id}")
+def api_job_cancel(job_id: str):
+    get_job_or_404(job_id)
+    return job_manager.cancel(job_id).to_dict()
+
+
+# --- Batch: step1 หลาย source พร้อมกันแบบ pipeline ---
+def save_upload_source(chunks, filename):
+    # เก็บไฟล์ดิบไว้ก่อน ให้ stage ffmpeg ของ batch แปลงตามคิว แล้วลบทิ้งเมื่อ item เสร็จ
+    suffix = os.path.splitext(filename or "")[-1].lower() or ".bin"
+    path = os.path.join(MEDIA_DIR, f"batch_src_{uuid.uuid4().hex}{suffix}")
+    # cleanup ของ batch ถูกเรียกทุก item (รวมที่ถูกยกเลิก) จึง unpin ที่นั่นได้เสมอ
+    storage.pin(path)
+    try:
+        with open(path, "wb") as out_f:
+            for data in chunks:
+                out_f.write(data)
+    except BaseException:
+        remove_upload_source(path)
+        raise
+    storage.notify("upload", os.path.getsize(path))
+    return path
+
+def remove_upload_source(source):
+    if not os.path.basename(source).startswith("batch_src_"):
+        return
+    storage.unpin(source)
+    if os.path.exists(source):
+        os.remove(source)
+
+def submit_batch(sources):
+    if not sources:
+        raise HTTPException(status_code=400, detail="No sources given")
+    if len(sources) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+    return batch_runner.submit(sources, cleanup=remove_upload_source).to_dict()
+
+@app.post("/batches", status_code=202)
+def api_batch(req: BatchRequest):
+    return submit_batch(req.youtube_urls)
+
+@app.post("/batches/upload", status_code=202)
+async def api_batch_upload(request: Request):
+    sinks = []
+
+    def open_part(name, filename):
+        if name != "files":
+            return None
+        if len(sinks) >= MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+        sinks.append(PartSink(lambda chunks: save_upload_source(chunks, filename)))
+        return sinks[-1]
+
+    try:
+        fields = await receive_upload_form(request, open_part)
+        return submit_batch([sink.result for sink in sinks] + fields.get("youtube_urls", []))
+    except BaseException:
+        # ไฟล์ที่รับครบแล้วแต่ batch ไม่ได้เริ่ม
+        for sink in sinks:
+            if sink.result:
+                remove_upload_source(sink.result)
+        raise
+
+def get_batch_or_404(batch_id):
+    batch = batch_runner.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@app.get("/batches/{batch_id}")
+def api_batch_status(batch_id: str):
+    return dict(get_batch_or_404(batch_id).to_dict(), stages=batch_runner.stats()["stages"])
 
+@app.delete("/batches/{batch_id}")
+def api_batch_cancel(batch_id: str):
+    batch = get_batch_or_404(batch_id)
+    batch.cancel()
+    return batch.to_dict()
@@ -1,9 +1,35 @@
+import os
 import subprocess
-import threading
+import sys
 import time
+import requests
+
+BACKEND_PORT = 8001
+READY_URL = f"http://localhost:{BACKEND_PORT}/readyz"
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60"))
 
 def run_backend():
-    subprocess.run(["uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8001"])
+    return subprocess.Popen(["uvicorn", "main:app", "--host", "0.0.0.0", "--port", str(BACKEND_PORT)])
+
+def wait_until_ready(backend):
+    """รอจน /readyz ตอบ 200 (หรือหมดเวลา) แทนการ sleep แบบเดาเวลา"""
+    started = time.monotonic()
+    status = None
+    while time.monotonic() - started < READY_TIMEOUT:
+        if backend.poll() is not None:
+            sys.exit(f"backend exited with code {backend.returncode}")
+        try:
+            res = requests.get(READY_URL, timeout=5)
+            if res.ok:
+                print(f"backend ready in {time.monotonic() - started:.2f}s")
+                return True
+            status = res.json().get("checks")
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    # backend รันอยู่แต่ dependency บางตัวยังไม่พร้อม เปิด frontend ต่อไปพร้อมแจ้งเตือน
+    print(f"backend not ready after {READY_TIMEOUT:.0f}s: {status}")
+    return False
 
 def run_frontend():
     # ✅ ชี้ path ถูกต้องไปยัง web/app.py
@@ -15,12 +41,10 @@ def run_frontend():
 ])
 
 
-# รัน backend ใน thread แยก
-backend_thread = threading.Thread(target=run_backend)
-backend_thread.start()
-
-# รอ backend สตาร์ทก่อน
-time.sleep(2)
-
-# รัน frontend
-run_frontend()
+backend = run_backend()
+try:
+    wait_until_ready(backend)
+    run_frontend()
+finally:
+    backend.terminate()
+    backend.wait()
@@ -0,0 +1,279 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+
+# stage ของ pipeline มีตั้งแต่ไม่กี่ ms (store) จนถึงหลายสิบนาที (download/transcribe ของคลิปยาว)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {count}")
+        lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {state['count']}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state['sum'])}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        # fn ถูกเรียกก่อน render ทุกครั้ง ใช้ set gauge ที่อ่านค่าจากที่อื่น (เช่นความยาวคิวของ job)
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram("podcast_stage_seconds", "Latency of each pipeline stage", ["stage"]))
+STAGE_IN_FLIGHT = registry.register(Gauge("podcast_stage_in_flight", "Pipeline stages currently running", ["stage"]))
+STAGE_ERRORS = registry.register(Counter("podcast_stage_errors_total", "Pipeline stages that raised", ["stage"]))
+STEP_SECONDS = registry.register(Histogram("podcast_step_seconds", "End-to-end latency of step1/step2/step3", ["step"]))
+BYTES = registry.register(Counter("podcast_bytes_total", "Bytes moved by each stage", ["stage"]))
+LINES = registry.register(Counter("podcast_lines_total", "Script lines handled by each stage", ["stage"]))
+TTS_LINE_SECONDS = registry.register(Histogram("podcast_tts_line_seconds", "Latency of one TTS request", ["status"]))
+LLM_CALLS = registry.register(Counter("podcast_llm_calls_total", "OpenAI chat completion calls", ["model", "cache"]))
+LLM_TOKENS = registry.register(Counter("podcast_llm_tokens_total", "OpenAI token usage", ["model", "kind"]))
+JOBS = registry.register(Gauge("podcast_jobs", "Background jobs by status", ["status"]))
+STORAGE_BYTES = registry.register(Gauge("podcast_storage_bytes", "Disk used by each artifact class", ["artifact"]))
+STORAGE_ARTIFACTS = registry.register(Gauge("podcast_storage_artifacts", "Artifacts kept by each class", ["artifact"]))
+STORAGE_REMOVED = registry.register(Counter(
+    "podcast_storage_removed_total", "Artifacts removed by storage GC", ["artifact", "reason"]
+))
+STORAGE_FREED_BYTES = registry.register(Counter(
+    "podcast_storage_freed_bytes_total", "Bytes freed by storage GC", ["artifact", "reason"]
+))
+
+
+# --- trace ต่อ session: บันทึกเวลาของทุก stage ที่รันใน step เดียวกัน ---
+class Trace:
+    def __init__(self, session_id, step):
+        self.session_id = session_id
+        self.step = step
+        self.started_at = time.time()
+        self.seconds = None
+        self.spans = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, **info):
+        with self._lock:
+            self.spans.append(dict(info, stage=stage, start=time.perf_counter() - self._started - seconds, seconds=seconds))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+
+    def to_dict(self):
+        with self._lock:
+            spans = [dict(span) for span in self.spans]
+        totals = {}
+        for span in spans:
+            totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["seconds"]
+        return {
+            "session_id": self.session_id,
+            "step": self.step,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "stages": totals,
+            "spans": spans,
+        }
+
+
+_current_trace = ContextVar("current_trace", default=None)
+_recent_traces = OrderedDict()
+_recent_lock = threading.Lock()
+MAX_RECENT_TRACES = 512
+
+
+@contextmanager
+def use_trace(trace):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def end_trace(current):
+    current.finish()
+    STEP_SECONDS.observe(current.seconds, step=current.step)
+    key = (current.session_id, current.step)
+    with _recent_lock:
+        _recent_traces[key] = current
+        _recent_traces.move_to_end(key)
+        while len(_recent_traces) > MAX_RECENT_TRACES:
+            _recent_traces.popitem(last=False)
+
+
+@contextmanager
+def trace(session_id, step):
+    """เปิด trace ของ step นี้ stage ที่ timed() ภายใน (thread เดียวกัน) จะถูกบันทึกลง trace"""
+    current = Trace(session_id, step)
+    try:
+        with use_trace(current):
+            yield current
+    finally:
+        end_trace(current)
+
+
+def traced(current, iterable):
+    """วนผ่าน generator โดยให้ trace มีผลระหว่างที่ generator ทำงาน (แต่ละ next อาจอยู่คนละ thread)"""
+    iterator = iter(iterable)
+    while True:
+        with use_trace(current):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def last_trace(session_id, step):
+    with _recent_lock:
+        current = _recent_traces.get((session_id, step))
+    return current.to_dict() if current else None
+
+
+@contextmanager
+def timed(stage, **info):
+    """
+    จับเวลา stage: histogram ของ latency, gauge ของจำนวนที่กำลังรัน, counter ของ error
+    และเพิ่ม span ลง trace ปัจจุบัน (info ไปอยู่ใน span เท่านั้น ไม่เป็น label)
+    """
+    current = _current_trace.get()
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    ok = True
+    try:
+        yield info
+    except GeneratorExit:
+        # ผู้เรียกหยุดอ่าน stream กลางทาง ไม่นับเป็น error
+        raise
+    except BaseException:
+        ok = False
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if current is not None:
+            current.add(stage, seconds, **(info if ok else dict(info, error=True)))
+
+
+def count_bytes(stage, chunks):
+    for data in chunks:
+        BYTES.inc(len(data), stage=stage)
+        yield data
+
+
+def record_llm_usage(model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+
+def render():
+    return registry.render()
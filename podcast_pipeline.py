@@ -1,80 +1,441 @@
 import os
+import re
 import json
-import subprocess
-import asyncio
-import aiohttp
+import uuid
+import logging
+import wave
+import hashlib
+import shutil
+import socket
+import threading
+from contextlib import contextmanager, nullcontext
 import requests
+import metrics
 from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from pydub import AudioSegment
-from openai import OpenAI
-from supabase import create_client, Client
+from tts_cache import TTSCache
+from session_store import open_session_store
+from tts_dispatcher import TTSDispatcher
+from audio_assembler import assemble_episode, iter_clip_pcm
+from audio_processing import DEFAULT_SETTINGS, output_params, process_clips
+from renditions import FORMATS as RENDITION_FORMATS, RenditionEncoder, rendition_path
+from video import DEFAULT_SETTINGS as VIDEO_DEFAULTS, render_video, speaker_turns
+from json_cache import JsonCache, make_key
+from storage import StorageManager
+from llm_cache import ChatCompletionCache
+from transcription import split_pcm_at_silence, transcribe_pcm_chunks
+from llm_tokens import batch_texts, count_tokens, split_into_windows
+from dialogue_context import format_dialogue, truncate_to_tokens, split_recent_lines, batch_lines
+from script_stream import ScriptLineParser, split_script_and_suggestions, new_line_id
+from progressive import HLSPublisher
+from ingest import stream_youtube_pcm, tee_pcm_to_wav, write_pcm_to_wav, transcode_file_to_wav
 
 # --- ENV SETUP ---
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-TRANSCRIBE_AUDIO_ENDPOINT = "http://100.76.219.70:8000/audio/transcibe_audio"
-BOTNOI_VOICE_ENDPOINT = "http://100.76.219.70:8000/script/botnoi-voice"
+TRANSCRIBE_AUDIO_ENDPOINT = os.getenv("TRANSCRIBE_AUDIO_ENDPOINT", "http://100.76.219.70:8000/audio/transcibe_audio")
+BOTNOI_VOICE_ENDPOINT = os.getenv("BOTNOI_VOICE_ENDPOINT", "http://100.76.219.70:8000/script/botnoi-voice")
 VOICE_ID_A = "543"
 VOICE_ID_B = "544"
+TRANSCRIBE_MODEL = os.getenv("TRANSCRIBE_MODEL", "default")
+SUMMARY_MODEL = "gpt-4o-mini"
+MAX_SOURCE_SECONDS = float(os.getenv("MAX_SOURCE_SECONDS", str(4 * 3600)))
+SUMMARY_SINGLE_PASS_TOKENS = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", "12000"))
+SUMMARY_WINDOW_TOKENS = int(os.getenv("SUMMARY_WINDOW_TOKENS", "8000"))
+SUMMARY_WINDOW_OVERLAP_TOKENS = int(os.getenv("SUMMARY_WINDOW_OVERLAP_TOKENS", "400"))
+SUMMARY_PARALLELISM = int(os.getenv("SUMMARY_PARALLELISM", "4"))
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "90"))
+TRANSCRIBE_MIN_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_MIN_CHUNK_SECONDS", "30"))
+TRANSCRIBE_PARALLELISM = int(os.getenv("TRANSCRIBE_PARALLELISM", "4"))
+TRANSCRIBE_RETRIES = int(os.getenv("TRANSCRIBE_RETRIES", "3"))
 
 DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "downloads")
 AUDIO_LINE_DIR = os.path.join(DOWNLOAD_DIR, "audio_lines")
+HLS_DIR = os.path.join(DOWNLOAD_DIR, "hls")
+TTS_MAX_IN_FLIGHT = int(os.getenv("TTS_MAX_IN_FLIGHT", "8"))
+TTS_LIMIT_PER_HOST = int(os.getenv("TTS_LIMIT_PER_HOST", "8"))
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "120"))
+LINE_GAP_MS = int(os.getenv("LINE_GAP_MS", "300"))  # ช่วงเงียบเมื่อเปลี่ยนผู้พูด
+SAME_SPEAKER_GAP_MS = int(os.getenv("SAME_SPEAKER_GAP_MS", "150"))
+LOUDNESS_TARGET_DBFS = float(os.getenv("LOUDNESS_TARGET_DBFS", "-20"))
+SPEAKER_LOUDNESS_DBFS = {
+    "A": float(os.getenv("LOUDNESS_A_DBFS", str(LOUDNESS_TARGET_DBFS))),
+    "B": float(os.getenv("LOUDNESS_B_DBFS", str(LOUDNESS_TARGET_DBFS))),
+}
+AUDIO_SETTINGS = dict(
+    DEFAULT_SETTINGS,
+    trim_threshold_db=float(os.getenv("TRIM_THRESHOLD_DB", str(DEFAULT_SETTINGS["trim_threshold_db"]))),
+    fade_ms=int(os.getenv("CROSSFADE_MS", str(DEFAULT_SETTINGS["fade_ms"]))),
+)
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", str(os.cpu_count() or 1)))
+# format บีบอัดที่ encode ให้ทุกตอน ตัวแรกคือตัวที่ให้ผู้ฟังใช้เป็นหลัก
+OUTPUT_FORMATS = [f.strip() for f in os.getenv("OUTPUT_FORMATS", "mp3,opus").split(",") if f.strip()]
+RENDITION_BITRATES = {fmt: os.getenv(f"{fmt.upper()}_BITRATE") for fmt in RENDITION_FORMATS}
+# MP4 ของตอน (ภาพปก + label ผู้พูด + waveform) render แบ่งช่วงเวลาพร้อมกันตามจำนวน core
+# ใช้ CPU มาก (หลายเท่าของ step3 ที่เหลือบนเครื่องเล็ก) จึงปิดไว้ก่อน สั่ง render แยกได้ที่ render_session_video
+VIDEO_ENABLED = os.getenv("VIDEO_ENABLED", "0") == "1"
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", str(os.cpu_count() or 1)))
+VIDEO_COVER = os.getenv("VIDEO_COVER")  # path ของภาพปก (ไม่ตั้ง = พื้นสีเรียบ)
+VIDEO_LABELS = {"A": os.getenv("VIDEO_LABEL_A", "A"), "B": os.getenv("VIDEO_LABEL_B", "B")}
+VIDEO_SETTINGS = dict(
+    VIDEO_DEFAULTS,
+    width=int(os.getenv("VIDEO_WIDTH", str(VIDEO_DEFAULTS["width"]))),
+    height=int(os.getenv("VIDEO_HEIGHT", str(VIDEO_DEFAULTS["height"]))),
+    fps=int(os.getenv("VIDEO_FPS", str(VIDEO_DEFAULTS["fps"]))),
+    preset=os.getenv("VIDEO_PRESET", VIDEO_DEFAULTS["preset"]),
+    crf=int(os.getenv("VIDEO_CRF", str(VIDEO_DEFAULTS["crf"]))),
+    font=os.getenv("VIDEO_FONT", VIDEO_DEFAULTS["font"]),
+)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(DOWNLOAD_DIR, "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "2048")) * 1024 * 1024
+SOURCE_CACHE_DIR = os.getenv("SOURCE_CACHE_DIR", os.path.join(DOWNLOAD_DIR, "source_cache"))
+SOURCE_CACHE_MAX_BYTES = int(os.getenv("SOURCE_CACHE_MAX_MB", "512")) * 1024 * 1024
+SOURCE_CACHE_TTL = float(os.getenv("SOURCE_CACHE_TTL_HOURS", "720")) * 3600
+SESSION_STORE = os.getenv("SESSION_STORE", "supabase")  # supabase | sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "128"))
+SCRIPT_MODEL = "gpt-4o"
+# budget ของบริบทใน step2: summary + digest ของบทสนทนาเก่า + บรรทัดล่าสุดแบบคำต่อคำ
+STEP2_CONTEXT_TOKENS = int(os.getenv("STEP2_CONTEXT_TOKENS", "6000"))
+STEP2_SUMMARY_TOKENS = int(os.getenv("STEP2_SUMMARY_TOKENS", "2500"))
+STEP2_DIGEST_TOKENS = int(os.getenv("STEP2_DIGEST_TOKENS", "600"))
+DIGEST_INPUT_TOKENS = int(os.getenv("DIGEST_INPUT_TOKENS", "8000"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(DOWNLOAD_DIR, "llm_cache"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
 GPT_TOKEN = os.getenv("GPT_TOKEN")
+# ไฟล์ใน DOWNLOAD_DIR แยกตาม class: quota (MB) และ TTL (ชั่วโมงนับจากใช้ครั้งล่าสุด, 0 = ไม่หมดอายุ)
+STORAGE_LIMITS = {
+    name: (
+        int(os.getenv(f"STORAGE_{name.upper()}_MAX_MB", str(max_mb))) * 1024 * 1024,
+        float(os.getenv(f"STORAGE_{name.upper()}_TTL_HOURS", str(ttl_hours))) * 3600 or None,
+    )
+    for name, max_mb, ttl_hours in [
+        ("source", 4096, 72),   # WAV จาก YouTube ที่เก็บไว้เป็น cache
+        ("upload", 2048, 24),   # ไฟล์ที่อัปโหลดแล้วแปลงเป็น WAV
+        ("clips", 4096, 168),   # clip ต่อบรรทัดและ manifest ของแต่ละ session
+        ("final", 8192, 720),   # ไฟล์ตอนทุก format
+        ("hls", 1024, 24),      # playlist แบบ progressive
+    ]
+}
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "300"))
+STORAGE_MIN_AGE = float(os.getenv("STORAGE_MIN_AGE_SECONDS", "600"))
+STORAGE_INDEX_PATH = os.getenv("STORAGE_INDEX_PATH", os.path.join(DOWNLOAD_DIR, "storage_index.json"))
 
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-os.makedirs(AUDIO_LINE_DIR, exist_ok=True)
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
 
-openai_client = OpenAI(api_key=GPT_TOKEN)
+# client ที่หนักถูกสร้างตอนใช้ครั้งแรก import module นี้จึงไม่มี side effect ที่ช้า
+openai_client = None
+_openai_lock = threading.Lock()
 
-# --- GLOBAL MEMORY ---
-script_lines = []
-chat_history = []
+def get_openai():
+    global openai_client
+    with _openai_lock:
+        if openai_client is None:
+            from openai import OpenAI
+            openai_client = OpenAI(api_key=GPT_TOKEN)
+        return openai_client
 
-# --- Supabase ---
-def save_script_to_supabase(session_id, script_lines, suggested_questions, audio_path=None):
-    data = {
-        "session_id": session_id,
-        "script": json.dumps(script_lines, ensure_ascii=False),
-        "suggested_questions": suggested_questions,
-        "timestamp": datetime.now().isoformat()
+def ensure_dirs():
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    os.makedirs(AUDIO_LINE_DIR, exist_ok=True)
+
+# prompt ที่ผลลัพธ์ขึ้นกับ input อย่างเดียว: job ที่ retry หรือประมวลผลซ้ำไม่ต้องเรียก OpenAI ใหม่
+llm_cache = ChatCompletionCache(
+    get_openai,
+    JsonCache(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL),
+    enabled=LLM_CACHE_ENABLED,
+)
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+session_store = open_session_store(SESSION_STORE, db_path=SESSION_DB_PATH, cache_size=SESSION_CACHE_SIZE)
+# transcript และ summary ที่เคยทำแล้ว key ด้วย hash ของเสียง
+source_cache = JsonCache(SOURCE_CACHE_DIR, SOURCE_CACHE_MAX_BYTES, ttl=SOURCE_CACHE_TTL)
+# artifact ที่ไม่มี cache ดูแลขนาดให้ GC ลบตาม quota/TTL (cache ด้านบนจำกัดขนาดของตัวเองอยู่แล้ว)
+def open_storage():
+    manager = StorageManager(STORAGE_INDEX_PATH, min_age=STORAGE_MIN_AGE, interval=STORAGE_GC_INTERVAL)
+    for name, (max_bytes, ttl) in STORAGE_LIMITS.items():
+        manager.add_class(name, max_bytes, ttl)
+    final_exts = "|".join(sorted(re.escape(ext) for ext in {".wav", ".mp4"} | {
+        spec["ext"] for spec in RENDITION_FORMATS.values()
+    }))
+    manager.add_location("source", DOWNLOAD_DIR, r"(?P<key>[0-9a-f]{32})\.wav")
+    # WAV ที่แปลงจาก video ของ step1 ที่ค้างอยู่ (ปกติถูกลบหลังถอดเสียง)
+    manager.add_location("source", DOWNLOAD_DIR, r"(?P<key>\d{8}_\d{6}_[0-9a-f]{6})\.wav")
+    manager.add_location("clips", AUDIO_LINE_DIR, r"(?P<session>[\w-]+)", dirs=True)
+    manager.add_location("final", DOWNLOAD_DIR, rf"podcast_final_(?P<session>[\w-]+)(?:{final_exts})")
+    manager.add_location("hls", HLS_DIR, r"(?P<session>[\w-]+)", dirs=True)
+    return manager
+
+storage = open_storage()
+tts_dispatcher = TTSDispatcher(
+    BOTNOI_VOICE_ENDPOINT,
+    max_in_flight=TTS_MAX_IN_FLIGHT,
+    limit_per_host=TTS_LIMIT_PER_HOST,
+    timeout=TTS_TIMEOUT,
+)
+
+# --- SESSION CONTEXT ---
+class PipelineSession:
+    """
+    state ของแต่ละ session (script, chat history, ไฟล์เสียง) แยกจากกัน
+    เพื่อให้หลาย session รันพร้อมกันใน process เดียวได้
+    """
+
+    def __init__(self, session_id, script_lines=None, suggested_questions="", line_offset=0,
+                 summary=None, digest="", digest_upto=0):
+        self.session_id = session_id
+        self.script_lines = list(script_lines or [])
+        # จำนวนบรรทัดก่อน script_lines ที่ไม่ได้โหลดมา (เมื่อโหลดแค่ท้าย script)
+        self.line_offset = line_offset
+        self.chat_history = []
+        self.suggested_questions = suggested_questions
+        # summary จาก step1 และสรุปย่อของบทสนทนาช่วงก่อนบรรทัดที่ digest_upto
+        self.summary = summary
+        self.digest = digest
+        self.digest_upto = digest_upto
+        self.audio_line_dir = os.path.join(AUDIO_LINE_DIR, session_id)
+        self.manifest_path = os.path.join(self.audio_line_dir, "manifest.json")
+        # script เก่าที่บันทึกก่อนมี line id
+        for line in self.script_lines:
+            line.setdefault("id", new_line_id())
+
+    @classmethod
+    def create(cls):
+        session_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        return cls(session_id)
+
+    def line_audio_path(self, index):
+        # ตั้งชื่อตาม line id การแทรกหรือลบบรรทัดจึงไม่ทำให้ไฟล์ของบรรทัดอื่นเปลี่ยนชื่อ
+        return os.path.join(self.audio_line_dir, f"{self.script_lines[index]['id']}.wav")
+
+    def processed_audio_path(self, index):
+        return os.path.join(self.audio_line_dir, f"{self.script_lines[index]['id']}.proc.wav")
+
+    def undigested_lines(self):
+        return self.script_lines[max(0, self.digest_upto - self.line_offset):]
+
+    def find_line(self, line_id):
+        for i, line in enumerate(self.script_lines):
+            if line["id"] == line_id:
+                return i
+        raise ValueError("Line not found")
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.audio_line_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+
+# session_id -> [lock, จำนวนผู้ถือหรือรอ] ลบออกเมื่อไม่มีใครใช้ dict จึงไม่โตตามจำนวน session ที่เคยมี
+_session_locks = {}
+_session_locks_guard = threading.Lock()
+
+@contextmanager
+def session_lock(session_id):
+    # step2/step3 ของ session เดียวกันต้องรันทีละตัว ไม่งั้นบรรทัดที่ append จะทับกัน
+    with _session_locks_guard:
+        entry = _session_locks.setdefault(session_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _session_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _session_locks[session_id]
+
+# --- Session store ---
+def save_session(session, audio_path=None, duration=None):
+    # store เขียนเฉพาะบรรทัดที่เพิ่มหรือเปลี่ยน ไม่ใช่ทั้ง script
+    session_store.save(
+        session.session_id,
+        session.script_lines,
+        session.suggested_questions,
+        audio_path=audio_path,
+        line_offset=session.line_offset,
+        duration=duration,
+        summary=session.summary,
+        digest=session.digest,
+        digest_upto=session.digest_upto,
+    )
+
+def load_session(session_id, tail=None):
+    """tail: โหลดเฉพาะ n บรรทัดท้าย"""
+    session_data = session_store.load(session_id, tail=tail)
+    if not session_data:
+        raise ValueError("Session not found")
+    return PipelineSession(
+        session_id,
+        session_data["script_lines"],
+        session_data["suggested_questions"] or "",
+        line_offset=session_data["line_offset"],
+        summary=session_data.get("summary"),
+        digest=session_data.get("digest") or "",
+        digest_upto=session_data.get("digest_upto") or 0,
+    )
+
+def load_session_for_context(session_id):
+    # โหลดเฉพาะบรรทัดที่ยังไม่ถูกย่อเข้า digest (ส่วนที่เหลือแทนด้วย digest)
+    session = load_session(session_id, tail=0)
+    session.script_lines = session_store.lines(session_id, session.digest_upto)
+    session.line_offset = session.digest_upto
+    return session
+
+def list_sessions(limit=50, cursor=None):
+    return session_store.list_sessions(limit, cursor)
+
+def _check_reachable(url):
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    with socket.create_connection((parsed.hostname, port), timeout=READY_CHECK_TIMEOUT):
+        pass
+
+def _check_download_dir():
+    ensure_dirs()
+    if not os.access(DOWNLOAD_DIR, os.W_OK):
+        raise RuntimeError(f"{DOWNLOAD_DIR} is not writable")
+
+def _check_ffmpeg():
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not found in PATH")
+
+def _check_openai():
+    if not GPT_TOKEN:
+        raise RuntimeError("GPT_TOKEN is not set")
+
+def check_dependencies():
+    """
+    ตรวจสิ่งที่ pipeline ต้องใช้ (พร้อมกันทุกตัว) คืน {ชื่อ: {"ok": bool, "detail": str|None}}
+    ไม่เรียก OpenAI จริง ตรวจแค่ว่าตั้ง key ไว้แล้ว
+    """
+    checks = {
+        "download_dir": _check_download_dir,
+        "ffmpeg": _check_ffmpeg,
+        "openai": _check_openai,
+        "session_store": session_store.ping,
+        "tts": lambda: _check_reachable(BOTNOI_VOICE_ENDPOINT),
+        "transcribe": lambda: _check_reachable(TRANSCRIBE_AUDIO_ENDPOINT),
     }
-    if audio_path:
-        data["audio_path"] = audio_path
 
-    supabase.table("podcast_scripts").upsert(data, on_conflict=["session_id"]).execute()
+    def run(check):
+        try:
+            check()
+            return {"ok": True, "detail": None}
+        except Exception as e:
+            return {"ok": False, "detail": str(e) or type(e).__name__}
 
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        results = dict(zip(checks, pool.map(run, checks.values())))
+    return results
 
-def load_session_from_supabase(session_id):
-    response = supabase.table("podcast_scripts").select("*").eq("session_id", session_id).execute()
-    if response.data:
-        data = response.data[0]
-        return {
-            "script_lines": json.loads(data["script"]),
-            "suggested_questions": data.get("suggested_questions", "")
-        }
-    return None
+def cache_stats():
+    return {
+        "tts": tts_cache.stats(),
+        "source": source_cache.stats(),
+        "llm": llm_cache.stats(),
+        "sessions": session_store.stats(),
+        "storage": storage.stats(),
+    }
 
 # --- Utilities ---
+def _report(progress, stage, fraction, **info):
+    # progress คือ callback จาก job runner (ถ้ามี) ใช้รายงานความคืบหน้าและเช็คการยกเลิก
+    if progress:
+        progress(stage, fraction, **info)
+
+def _stage(stages, name):
+    # stages คือ StageLimits จาก batch runner (ถ้ามี) ใช้จำกัดจำนวนงานต่อ stage
+    return stages.stage(name) if stages else nullcontext()
+
 def hash_url(url):
-    import hashlib
     return hashlib.md5(url.encode()).hexdigest()
 
+def hash_audio_pcm(audio_path):
+    # hash จาก PCM 16 kHz mono หลัง decode ไฟล์เดียวกันที่ container ต่างกันจะได้ key เดียวกัน
+    digest = hashlib.sha256()
+    with metrics.timed("hash_audio"):
+        for data in iter_clip_pcm(audio_path, (1, 2, 16000)):
+            digest.update(data)
+    return digest.hexdigest()
+
+def transcribe_audio_cached(audio_path, audio_hash, lang="th"):
+    key = make_key("transcript", audio_hash, lang, TRANSCRIBE_MODEL)
+    transcript = source_cache.get(key)
+    if transcript is None:
+        with metrics.timed("transcribe"):
+            transcript = transcribe_audio(audio_path, lang)
+        source_cache.set(key, transcript)
+    return transcript
+
+def summarize_for_podcast_cached(transcript_text, audio_hash, lang="th"):
+    key = make_key("summary", audio_hash, lang, TRANSCRIBE_MODEL, SUMMARY_MODEL)
+    summary = source_cache.get(key)
+    if summary is None:
+        with metrics.timed("summary"):
+            summary = summarize_for_podcast(transcript_text)
+        source_cache.set(key, summary)
+    return summary
+
+def youtube_audio_path(youtube_url):
+    return os.path.join(DOWNLOAD_DIR, f"{hash_url(youtube_url)}.wav")
+
 def download_youtube_audio(youtube_url):
-    video_id = hash_url(youtube_url)
-    output_path = os.path.join(DOWNLOAD_DIR, f"{video_id}.m4a")
-    audio_path = os.path.join(DOWNLOAD_DIR, f"{video_id}.wav")
+    audio_path = youtube_audio_path(youtube_url)
     if not os.path.exists(audio_path):
-        subprocess.run(["yt-dlp", "-f", "bestaudio[ext=m4a]", "-o", output_path, youtube_url], check=True)
-        subprocess.run(["ffmpeg", "-y", "-i", output_path, "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", audio_path], check=True)
-        os.remove(output_path)
+        with metrics.timed("download"):
+            pcm = stream_youtube_pcm(youtube_url, MAX_SOURCE_SECONDS)
+            write_pcm_to_wav(metrics.count_bytes("download", pcm), audio_path)
+        storage.notify("source", os.path.getsize(audio_path))
     return audio_path
 
+def ingest_and_transcribe_youtube(youtube_url, lang="th"):
+    """
+    ดาวน์โหลด decode และถอดเสียงไปพร้อมกัน: chunk แรกถูกส่งถอดเสียงก่อนดาวน์โหลดเสร็จ
+    คืนค่า (audio_path, audio_hash, transcript)
+    """
+    audio_path = youtube_audio_path(youtube_url)
+    digest = hashlib.sha256()
+
+    def pcm_chunks():
+        pcm = metrics.count_bytes("download", stream_youtube_pcm(youtube_url, MAX_SOURCE_SECONDS))
+        for data in tee_pcm_to_wav(pcm, audio_path):
+            digest.update(data)
+            yield data
+
+    # download กับ transcribe ซ้อนกันอยู่ จึงจับเวลารวมเป็น stage เดียว
+    with metrics.timed("download_transcribe"):
+        transcript = transcribe_pcm_stream(pcm_chunks(), lang)
+    audio_hash = digest.hexdigest()
+    storage.notify("source", os.path.getsize(audio_path))
+    source_cache.set(make_key("transcript", audio_hash, lang, TRANSCRIBE_MODEL), transcript)
+    return audio_path, audio_hash, transcript
+
+def audio_duration(audio_path):
+    try:
+        with wave.open(audio_path, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
 def transcribe_audio(audio_path, lang="th"):
+    duration = audio_duration(audio_path)
+    if duration is None or duration > TRANSCRIBE_CHUNK_SECONDS:
+        # เสียงยาว: ตัดตามช่วงเงียบแล้วถอดเสียงหลาย chunk พร้อมกัน
+        return transcribe_pcm_stream(iter_clip_pcm(audio_path, (1, 2, 16000)), lang)
     with open(audio_path, 'rb') as f:
         files = {'audios': (os.path.basename(audio_path), f, 'audio/wav')}
         data = {'language': lang}
@@ -82,7 +443,23 @@ def transcribe_audio(audio_path, lang="th"):
         response.raise_for_status()
         return response.json()
 
+def transcribe_pcm_stream(pcm_chunks, lang="th"):
+    chunks = split_pcm_at_silence(
+        pcm_chunks,
+        max_chunk_seconds=TRANSCRIBE_CHUNK_SECONDS,
+        min_chunk_seconds=TRANSCRIBE_MIN_CHUNK_SECONDS,
+    )
+    return transcribe_pcm_chunks(
+        chunks,
+        TRANSCRIBE_AUDIO_ENDPOINT,
+        lang=lang,
+        parallelism=TRANSCRIBE_PARALLELISM,
+        retries=TRANSCRIBE_RETRIES,
+    )
+
 def summarize_for_podcast(transcript_text):
+    if count_tokens(transcript_text, SUMMARY_MODEL) > SUMMARY_SINGLE_PASS_TOKENS:
+        return summarize_long_transcript(transcript_text)
     prompt = f"""
 ต่อไปนี้คือ transcript คำพูดทั้งหมดจากวิดีโอหนึ่ง ขอให้คุณทำหน้าที่เป็นนักเขียนสรุปเนื้อหา เพื่อเตรียมข้อมูลอ้างอิงสำหรับการสร้างรายการ Podcast
 
@@ -94,21 +471,125 @@ def summarize_for_podcast(transcript_text):
 {transcript_text}
 ---
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
+    return llm_cache.complete(SUMMARY_MODEL, [{"role": "user", "content": prompt}])
+
+def summarize_window(window_text, index, total):
+    prompt = f"""
+ต่อไปนี้คือ transcript ช่วงที่ {index + 1} จากทั้งหมด {total} ช่วงของวิดีโอหนึ่ง (แต่ละช่วงอาจซ้อนกันเล็กน้อย)
+
+สรุปประเด็นสำคัญของช่วงนี้เป็นข้อ ๆ และคัดคำพูดน่าสนใจ (Notable Quotes) มาแบบคำต่อคำ ไม่ต้องเกริ่นนำ
+
+---
+{window_text}
+---
+"""
+    return llm_cache.complete(SUMMARY_MODEL, [{"role": "user", "content": prompt}]).strip()
+
+def reduce_partial_summaries(partials):
+    joined = "\n\n".join(f"[ช่วงที่ {i + 1}]\n{p}" for i, p in enumerate(partials))
+    prompt = f"""
+ต่อไปนี้คือสรุปย่อยจากแต่ละช่วงของวิดีโอหนึ่ง เรียงตามลำดับเวลา ขอให้คุณทำหน้าที่เป็นนักเขียนสรุปเนื้อหา เพื่อเตรียมข้อมูลอ้างอิงสำหรับการสร้างรายการ Podcast
+
+**เป้าหมายของคุณ**:
+1. สรุปโดยรวม + แยกหัวข้อสำคัญ
+2. คำพูดน่าสนใจ (Notable Quotes)
+
+ตัดประเด็นที่ซ้ำกันระหว่างช่วงออก
+
+---
+{joined}
+---
+"""
+    return llm_cache.complete(SUMMARY_MODEL, [{"role": "user", "content": prompt}])
+
+def summarize_long_transcript(transcript_text):
+    # map: สรุปแต่ละช่วงพร้อมกัน / reduce: รวมสรุปย่อยเป็นรูปแบบเดียวกับ single-call
+    windows = split_into_windows(
+        transcript_text, SUMMARY_WINDOW_TOKENS, SUMMARY_WINDOW_OVERLAP_TOKENS, SUMMARY_MODEL
     )
-    return response.choices[0].message.content
+    with ThreadPoolExecutor(max_workers=SUMMARY_PARALLELISM) as pool:
+        partials = list(pool.map(summarize_window, windows, range(len(windows)), [len(windows)] * len(windows)))
 
-def add_summary_to_history(summary_text):
-    chat_history.clear()
+    # ถ้าสรุปย่อยรวมกันยังยาวเกิน ให้รวมเป็นชั้น ๆ จนพอดี แต่ละกลุ่มไม่เกิน budget ของ single-call
+    while len(partials) > 1 and count_tokens("\n\n".join(partials), SUMMARY_MODEL) > SUMMARY_SINGLE_PASS_TOKENS:
+        groups = list(batch_texts(partials, SUMMARY_SINGLE_PASS_TOKENS, SUMMARY_MODEL))
+        if len(groups) == len(partials):
+            # สรุปย่อยแต่ละอันยาวจนจับคู่ไม่ได้ รวมทีละคู่ไปก่อนไม่ให้วนไม่จบ
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        with ThreadPoolExecutor(max_workers=SUMMARY_PARALLELISM) as pool:
+            # กลุ่มที่มีอันเดียวส่งต่อไปชั้นถัดไปตามเดิม ไม่ต้องสรุปซ้ำ
+            partials = list(pool.map(lambda group: group[0] if len(group) == 1 else reduce_partial_summaries(group), groups))
+    return reduce_partial_summaries(partials)
+
+def add_summary_to_history(session, summary_text):
+    session.summary = summary_text
+    session.chat_history.clear()
     system_prompt = f"""
 คุณคือผู้ช่วยสร้าง Podcast สองคน A และ B ที่พูดคุยกันอย่างเป็นธรรมชาติ ใช้ภาษาง่าย ลื่นไหล น่าฟัง และมีคำถามชวนคิดต่อในตอนท้าย
 
 เนื้อหาที่ใช้สำหรับการพูดใน Podcast คือ:
-{summary_text}
+{truncate_to_tokens(summary_text, STEP2_SUMMARY_TOKENS, SCRIPT_MODEL)}
+"""
+    session.chat_history.insert(0, {"role": "system", "content": system_prompt})
+
+def recent_lines_budget(session):
+    # สิ่งที่เหลือจาก summary และ digest (คิด digest เต็ม cap เพื่อให้ขนาด prompt คงที่)
+    summary_tokens = min(count_tokens(session.summary or "", SCRIPT_MODEL), STEP2_SUMMARY_TOKENS)
+    return max(STEP2_CONTEXT_TOKENS // 4, STEP2_CONTEXT_TOKENS - summary_tokens - STEP2_DIGEST_TOKENS)
+
+def fold_into_digest(digest, lines):
+    prompt = f"""
+ต่อไปนี้คือสรุปย่อของบทสนทนา podcast ช่วงก่อนหน้า (ถ้ามี) และบทสนทนาที่ต่อจากนั้น
+
+สรุปย่อเดิม:
+{digest or '(ยังไม่มี)'}
+
+บทสนทนาต่อจากนั้น:
+{format_dialogue(lines)}
+
+รวมเป็นสรุปย่อใหม่ฉบับเดียว เป็นข้อ ๆ ว่าคุยประเด็นไหน ตอบคำถามอะไรไปแล้ว และมีข้อสรุปหรือตัวอย่างอะไรที่ยกมา ไม่เกิน {STEP2_DIGEST_TOKENS} token ไม่ต้องเกริ่นนำ
 """
-    chat_history.insert(0, {"role": "system", "content": system_prompt})
+    content = llm_cache.complete(SUMMARY_MODEL, [{"role": "user", "content": prompt}], max_tokens=STEP2_DIGEST_TOKENS)
+    return truncate_to_tokens(content.strip(), STEP2_DIGEST_TOKENS, SCRIPT_MODEL)
+
+def update_dialogue_digest(session):
+    """
+    ย่อบรรทัดที่เลย budget ของบรรทัดล่าสุดเข้า digest (ทำต่อจากของเดิม ไม่ย่อใหม่ทั้งหมด)
+    """
+    lines = session.undigested_lines()
+    older, _ = split_recent_lines(lines, recent_lines_budget(session), SCRIPT_MODEL)
+    if not older:
+        return
+    with metrics.timed("digest", lines=len(older)):
+        for batch in batch_lines(older, DIGEST_INPUT_TOKENS, SUMMARY_MODEL):
+            session.digest = fold_into_digest(session.digest, batch)
+    session.digest_upto += len(older)
+
+def build_context_history(session):
+    """summary (หรือบรรทัดเปิดรายการสำหรับ session เก่าที่ไม่มี summary) ตามด้วย digest"""
+    if session.summary:
+        add_summary_to_history(session, session.summary)
+    else:
+        opening = session_store.lines(session.session_id, 0, 6)
+        session.chat_history.append({
+            "role": "system",
+            "content": f"คุณคือผู้ช่วย Podcast\nเนื้อหาที่ผ่านมา:\n{format_dialogue(opening)}"
+        })
+    if session.digest:
+        session.chat_history.append({
+            "role": "system",
+            "content": f"สรุปบทสนทนาที่คุยไปแล้วก่อนหน้า (อย่าพูดซ้ำ):\n{session.digest}"
+        })
+
+def stream_chat_completion(model, messages, bypass_cache=False):
+    # คืนข้อความทีละ delta จาก streamed completion (ผ่าน llm_cache)
+    return llm_cache.stream(model, messages, bypass=bypass_cache)
+
+def stream_script_lines(model, messages, parser=None, bypass_cache=False):
+    parser = parser or ScriptLineParser()
+    for delta in stream_chat_completion(model, messages, bypass_cache):
+        yield from parser.feed(delta)
+    yield from parser.close()
 
 def create_opening_from_summary(summary_text):
     prompt = f"""
@@ -120,22 +601,16 @@ def create_opening_from_summary(summary_text):
 
 **รูปแบบ:** สลับพูด A: / B: 2–4 บรรทัด ใช้ภาษากระชับ ลื่นไหล
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    opening_script = response.choices[0].message.content.strip()
-    lines = []
-    for line in opening_script.splitlines():
-        if line.startswith("A:"):
-            lines.append({"speaker": "A", "text": line[2:].strip()})
-        elif line.startswith("B:"):
-            lines.append({"speaker": "B", "text": line[2:].strip()})
-    return lines
-
-def generate_podcast_script(question_input):
-    previous_context = "".join([f"{line['speaker']}: {line['text']}\n" for line in script_lines[-8:]]) if script_lines else '(ยังไม่มีบทสนทนา)'
-    chat_history.append({
+    with metrics.timed("opening"):
+        return list(stream_script_lines("gpt-4o-mini", [{"role": "user", "content": prompt}]))
+
+def stream_podcast_script(session, question_input):
+    """
+    yield ("line", line) ทันทีที่ได้แต่ละบรรทัด และ ("done", {...}) เมื่อตอบจบ
+    """
+    _, recent = split_recent_lines(session.undigested_lines(), recent_lines_budget(session), SCRIPT_MODEL)
+    previous_context = format_dialogue(recent) if recent else '(ยังไม่มีบทสนทนา)'
+    session.chat_history.append({
         "role": "user",
         "content": f"""
 หัวข้อ: {question_input}
@@ -146,57 +621,282 @@ def generate_podcast_script(question_input):
 สร้างบทพูด podcast สองคน สลับ A: / B: อย่างลื่นไหล 10–20 บรรทัด โดยเชื่อมโยงกับเนื้อหาเดิม ไม่ต้องทักทายหรือเริ่มใหม่ และให้ลงท้ายด้วย `### Suggested Follow-up Questions:` (คำถามอย่างน้อย 3 ข้อ)
 """
     })
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=chat_history
+    parser = ScriptLineParser()
+    # บทสนทนาต่อแต่ละครั้งควรได้คำตอบใหม่ ไม่ใช้ cache
+    with metrics.timed("script", lines=0) as span:
+        for line in stream_script_lines(SCRIPT_MODEL, session.chat_history, parser, bypass_cache=True):
+            session.script_lines.append(line)
+            span["lines"] += 1
+            yield "line", line
+    metrics.LINES.inc(span["lines"], stage="script")
+    result = parser.text.strip()
+    session.chat_history.append({"role": "assistant", "content": result})
+    script_part, suggestions = split_script_and_suggestions(result)
+    yield "done", {"script": script_part, "suggested_questions": suggestions}
+
+def generate_podcast_script(session, question_input):
+    result = None
+    for event, data in stream_podcast_script(session, question_input):
+        if event == "done":
+            result = data
+    return result["script"], result["suggested_questions"]
+
+def voice_for(line):
+    return VOICE_ID_A if line['speaker'] == 'A' else VOICE_ID_B
+
+def line_content_hash(line):
+    return tts_cache.key(voice_for(line), line['text'])
+
+def generate_voice_from_script_lines(session, publisher=None):
+    """publisher (ถ้ามี) จะได้รับแต่ละบรรทัดทันทีที่เสียงพร้อม เพื่อเผยแพร่แบบ progressive"""
+    os.makedirs(session.audio_line_dir, exist_ok=True)
+    rendered = {seg["line_id"]: seg["hash"] for seg in session.load_manifest().get("segments", [])}
+    pending = []
+    for i, line in enumerate(session.script_lines):
+        voice_id = voice_for(line)
+        save_path = session.line_audio_path(i)
+        # ส่งไป TTS เฉพาะบรรทัดที่ยังไม่เคย synthesize (หรือถูกแก้หลัง render ครั้งก่อน)
+        unchanged = rendered.get(line['id']) == line_content_hash(line) and os.path.exists(save_path)
+        if unchanged or tts_cache.fetch(voice_id, line['text'], save_path):
+            if publisher:
+                publisher.clip_ready(i, save_path)
+        else:
+            pending.append((i, line['text'], voice_id, save_path))
+
+    def on_line_done(stats):
+        if stats["ok"]:
+            publisher.clip_ready(stats["index"], session.line_audio_path(stats["index"]))
+        else:
+            publisher.clip_failed(stats["index"])
+
+    reused = len(session.script_lines) - len(pending)
+    with metrics.timed("tts", lines=len(pending), reused=reused) as span:
+        line_stats = tts_dispatcher.synthesize_all(pending, on_done=on_line_done if publisher else None)
+        span["bytes"] = sum(stats["bytes"] for stats in line_stats)
+    metrics.LINES.inc(len(pending), stage="tts")
+    metrics.LINES.inc(reused, stage="tts_reused")
+    metrics.BYTES.inc(span["bytes"], stage="tts")
+    storage.notify("clips", span["bytes"])
+    failed = []
+    for (i, text, voice_id, save_path), stats in zip(pending, line_stats):
+        metrics.TTS_LINE_SECONDS.observe(stats["latency"], status="ok" if stats["ok"] else "error")
+        if stats["ok"]:
+            tts_cache.put(voice_id, text, save_path)
+        else:
+            failed.append(f"line {i+1}: {stats['error']}")
+    if failed:
+        # บรรทัดที่สำเร็จถูกเก็บใน cache แล้ว ลองใหม่จะจ่ายเฉพาะบรรทัดที่พัง
+        raise RuntimeError("TTS failed for " + "; ".join(failed))
+
+    return {"cache": tts_cache.stats(), "lines": line_stats}
+
+def turn_gaps_ms(lines):
+    # ช่วงเงียบหลังแต่ละบรรทัด: ยาวกว่าเมื่อบรรทัดถัดไปเปลี่ยนผู้พูด ไม่มีหลังบรรทัดสุดท้าย
+    gaps = [
+        LINE_GAP_MS if line["speaker"] != nxt["speaker"] else SAME_SPEAKER_GAP_MS
+        for line, nxt in zip(lines, lines[1:])
+    ]
+    return gaps + [0] if lines else []
+
+def clip_processing(line, params):
+    """(processing key, loudness target) ของ clip ของบรรทัดนี้"""
+    target = SPEAKER_LOUDNESS_DBFS.get(line["speaker"], LOUDNESS_TARGET_DBFS)
+    return make_key(line_content_hash(line), params, target, AUDIO_SETTINGS), target
+
+def progressive_clip_processor(session, processed):
+    """
+    prepare ของ HLSPublisher: post-process clip แบบเดียวกับไฟล์ตอนเต็ม (params จาก clip แรก
+    เหมือน output_params) แล้วจด processing key ลง processed {line_id: key} ให้ combine ใช้ต่อไม่ต้องทำซ้ำ
+    """
+    manifest = session.load_manifest()
+    done = {}
+    if manifest.get("complete"):
+        done = {seg["line_id"]: seg.get("processing") for seg in manifest.get("segments", [])}
+    state = {}
+
+    def prepare(index, clip_path):
+        if "params" not in state:
+            state["params"] = output_params([clip_path])
+        line = session.script_lines[index]
+        key, target = clip_processing(line, state["params"])
+        processed_path = session.processed_audio_path(index)
+        if done.get(line["id"]) != key or not os.path.exists(processed_path):
+            process_clips([(clip_path, processed_path, target)], state["params"], AUDIO_SETTINGS, 1)
+        processed[line["id"]] = key
+        return processed_path
+
+    return prepare
+
+def postprocess_clips(session, indices, params, manifest, processed=None):
+    """
+    ตัดช่วงเงียบ ปรับความดังตามผู้พูด และ fade ขอบของ clip (หลาย process พร้อมกัน)
+    clip ที่เนื้อหาและค่าที่ใช้ประมวลผลเหมือนครั้งก่อน (หรือใน processed ที่ทำไปแล้วรอบนี้) ไม่ต้องทำใหม่
+    คืน processing key ของแต่ละบรรทัด
+    """
+    done = {}
+    if manifest.get("complete"):
+        done = {seg["line_id"]: seg.get("processing") for seg in manifest.get("segments", [])}
+    done.update(processed or {})
+    processing, jobs = [], []
+    for i in indices:
+        line = session.script_lines[i]
+        key, target = clip_processing(line, params)
+        processing.append(key)
+        if done.get(line["id"]) != key or not os.path.exists(session.processed_audio_path(i)):
+            jobs.append((session.line_audio_path(i), session.processed_audio_path(i), target))
+    with metrics.timed("postprocess", lines=len(jobs), reused=len(indices) - len(jobs)):
+        process_clips(jobs, params, AUDIO_SETTINGS, AUDIO_WORKERS)
+    metrics.LINES.inc(len(jobs), stage="postprocess")
+    return processing
+
+def combine_voices_in_order(session, processed=None):
+    """
+    ปรับแต่งเสียงแต่ละบรรทัด แล้วต่อเป็นไฟล์ตอนเต็ม บันทึก manifest (line id, content hash,
+    processing key, clip, offset, ความยาว) ครั้งถัดไปจะแก้เฉพาะช่วงของบรรทัดที่ถูกแก้ แทรก หรือลบ
+    processed: {line_id: processing key} ของ clip ที่ post-process ไปแล้วระหว่าง TTS (progressive)
+    """
+    indices = [i for i in range(len(session.script_lines)) if os.path.exists(session.line_audio_path(i))]
+    params = output_params([session.line_audio_path(i) for i in indices])
+    final_path = os.path.join(DOWNLOAD_DIR, f"podcast_final_{session.session_id}.wav")
+
+    manifest = session.load_manifest()
+    processing = postprocess_clips(session, indices, params, manifest, processed)
+    lines = [session.script_lines[i] for i in indices]
+    clip_paths = [session.processed_audio_path(i) for i in indices]
+    keys = [f"{line['id']}:{key}" for line, key in zip(lines, processing)]
+
+    gaps_ms = turn_gaps_ms(lines)
+
+    # manifest ที่ไม่ complete แปลว่าการ patch ครั้งก่อนค้างกลางทาง ไฟล์เดิมเชื่อไม่ได้
+    previous = manifest if manifest.get("complete") else None
+    if manifest:
+        session.save_manifest(dict(manifest, complete=False))
+
+    # encode format บีบอัดไปพร้อมกับการต่อไฟล์ ข้ามถ้าเนื้อหาทั้งตอนเหมือนครั้งก่อนและไฟล์ยังอยู่
+    renditions_key = make_key(keys, gaps_ms, params, OUTPUT_FORMATS, RENDITION_BITRATES)
+    old_renditions = (previous or {}).get("renditions") or {}
+    reuse = old_renditions.get("key") == renditions_key and all(
+        os.path.exists(rendition_path(final_path, fmt)) for fmt in OUTPUT_FORMATS
     )
-    result = response.choices[0].message.content.strip()
-    chat_history.append({"role": "assistant", "content": result})
-    parts = result.split("### Suggested Follow-up Questions:")
-    script_part = parts[0].split("### Podcast Script:")[-1].strip()
-    suggestions = parts[1].strip() if len(parts) > 1 else ""
-
-    for line in script_part.splitlines():
-        if line.startswith("A:"):
-            script_lines.append({"speaker": "A", "text": line[2:].strip()})
-        elif line.startswith("B:"):
-            script_lines.append({"speaker": "B", "text": line[2:].strip()})
-
-    return script_part, suggestions
-
-async def send_line_to_botnoi(line_text: str, voice_id: str, save_path: str):
-    async with aiohttp.ClientSession() as session:
-        data = aiohttp.FormData()
-        data.add_field('voice_id', voice_id)
-        data.add_field('script', line_text)
-        async with session.post(BOTNOI_VOICE_ENDPOINT, data=data) as resp:
-            with open(save_path, 'wb') as out_f:
-                out_f.write(await resp.read())
-
-def generate_voice_from_script_lines():
-    async def run_all_tasks():
-        tasks = []
-        for i, line in enumerate(script_lines):
-            voice_id = VOICE_ID_A if line['speaker'] == 'A' else VOICE_ID_B
-            filename = f"{line['speaker']}_{i+1}.wav"
-            save_path = os.path.join(AUDIO_LINE_DIR, filename)
-            tasks.append(send_line_to_botnoi(line['text'], voice_id, save_path))
-        await asyncio.gather(*tasks)
-    asyncio.run(run_all_tasks())
-
-def combine_voices_in_order(session_id):
-    combined = AudioSegment.empty()
-    for i, line in enumerate(script_lines):
-        filename = f"{line['speaker']}_{i+1}.wav"
-        file_path = os.path.join(AUDIO_LINE_DIR, filename)
-        if os.path.exists(file_path):
-            segment = AudioSegment.from_wav(file_path)
-            combined += segment + AudioSegment.silent(duration=300)
-    final_path = os.path.join(DOWNLOAD_DIR, f"podcast_final_{session_id}.wav")
-    combined.export(final_path, format="wav")
+    encoder = None
+    if OUTPUT_FORMATS and not reuse:
+        encoder = RenditionEncoder(final_path, OUTPUT_FORMATS, params, RENDITION_BITRATES)
+    try:
+        with metrics.timed("assemble", lines=len(clip_paths), encode=bool(encoder)) as span:
+            layout = assemble_episode(
+                clip_paths, final_path, keys=keys, previous=previous, gaps_ms=gaps_ms,
+                sink=encoder, sink_params=params,
+            )
+            span["patched"] = layout.get("patched_from") is not None
+    except BaseException:
+        if encoder:
+            encoder.abort()
+        raise
+    metrics.BYTES.inc(os.path.getsize(final_path), stage="assemble")
+    renditions = {"key": renditions_key, "formats": OUTPUT_FORMATS}
+    if encoder:
+        # ส่วนที่ encoder ยังค้างหลังต่อไฟล์เสร็จ
+        try:
+            with metrics.timed("encode", formats=",".join(OUTPUT_FORMATS)):
+                paths = encoder.close()
+        except Exception:
+            # เช่น ffmpeg ไม่มี libopus: ส่ง WAV แทน ลบ rendition ของเสียงเดิมที่ไม่ตรงแล้ว และไม่จด key
+            # step3 ครั้งถัดไปจึง encode ใหม่
+            logger.exception("rendition encoding failed for session %s", session.session_id)
+            renditions = None
+            for fmt in OUTPUT_FORMATS:
+                if os.path.exists(rendition_path(final_path, fmt)):
+                    os.remove(rendition_path(final_path, fmt))
+        else:
+            for fmt, path in paths.items():
+                metrics.BYTES.inc(os.path.getsize(path), stage=f"encode_{fmt}")
+    storage.notify("final", sum(os.path.getsize(path) for path in episode_renditions(final_path).values()))
+    for seg, line, key in zip(layout["segments"], lines, processing):
+        seg.update({
+            "line_id": line["id"],
+            "hash": line_content_hash(line),
+            "processing": key,
+            "clip": os.path.basename(clip_paths[seg["index"]]),
+            "duration": seg["frames"] / layout["sample_rate"],
+        })
+    layout["renditions"] = renditions
+    layout["video"] = manifest.get("video")
+    session.save_manifest(dict(layout, complete=True))
+
+    # ลบ clip ของบรรทัดที่ถูกลบหรือไฟล์ชื่อแบบเก่า
+    keep = {os.path.basename(session.line_audio_path(i)) for i in indices}
+    keep.update(os.path.basename(path) for path in clip_paths)
+    for name in os.listdir(session.audio_line_dir):
+        if name.endswith(".wav") and name not in keep:
+            os.remove(os.path.join(session.audio_line_dir, name))
     return final_path
 
-def add_closing():
+def episode_renditions(audio_path):
+    """คืน {format: path} ของไฟล์ตอนที่มีอยู่ เรียงตาม OUTPUT_FORMATS แล้วตามด้วย wav ต้นฉบับ"""
+    found = {}
+    for fmt in OUTPUT_FORMATS:
+        path = rendition_path(audio_path, fmt)
+        if os.path.exists(path):
+            found[fmt] = path
+    if os.path.exists(audio_path):
+        found["wav"] = audio_path
+    return found
+
+def episode_video_path(audio_path):
+    return os.path.splitext(audio_path)[0] + ".mp4"
+
+def render_episode_video(session, audio_path, enabled=None):
+    """
+    render MP4 ของตอนจาก segment ใน manifest (ตำแหน่งของแต่ละบรรทัดในไฟล์ตอน) คืน path หรือ None
+    ข้ามถ้าเสียง label และ setting เหมือนครั้งก่อนและไฟล์ยังอยู่ ถ้าไม่ render (enabled=None คือตาม
+    VIDEO_ENABLED) จะลบ video เดิมที่ไม่ตรงกับเสียงแล้วแทน
+    """
+    enabled = VIDEO_ENABLED if enabled is None else enabled
+    manifest = session.load_manifest()
+    video_path = episode_video_path(audio_path)
+    if not manifest.get("segments"):
+        return None
+    cover = None
+    if VIDEO_COVER and os.path.exists(VIDEO_COVER):
+        st = os.stat(VIDEO_COVER)
+        cover = (VIDEO_COVER, st.st_mtime_ns, st.st_size)
+    aac_path = rendition_path(audio_path, "aac") if "aac" in OUTPUT_FORMATS else None
+    key = make_key(
+        [(seg["key"], seg["gap_frames"]) for seg in manifest["segments"]],
+        VIDEO_LABELS, VIDEO_SETTINGS, cover, bool(aac_path),
+    )
+    if (manifest.get("video") or {}).get("key") == key and os.path.exists(video_path):
+        return video_path
+    if not enabled:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        return None
+
+    speakers = {line["id"]: line["speaker"] for line in session.script_lines}
+    turns = speaker_turns(manifest["segments"], manifest["sample_rate"], speakers)
+    with metrics.timed("video", workers=VIDEO_WORKERS) as span:
+        stats = render_video(
+            audio_path, turns, video_path, VIDEO_LABELS, VIDEO_SETTINGS,
+            cover=cover[0] if cover else None,
+            aac_path=aac_path if aac_path and os.path.exists(aac_path) else None,
+            workers=VIDEO_WORKERS,
+        )
+        span["parts"] = stats["parts"]
+    size = os.path.getsize(video_path)
+    metrics.BYTES.inc(size, stage="video")
+    storage.notify("final", size)
+    session.save_manifest(dict(manifest, video={"key": key}))
+    return video_path
+
+def add_closing(session):
+    # บทปิดเดิมยังใช้ได้ถ้าเนื้อหาก่อนหน้าไม่เปลี่ยน ไม่งั้นสร้างใหม่ต่อท้ายบรรทัดสุดท้าย
+    body = [line for line in session.script_lines if not line.get("closing")]
+    body_hash = make_key([(line["id"], line["speaker"], line["text"]) for line in body])
+    closing = [line for line in session.script_lines if line.get("closing")]
+    if closing and all(line.get("closing_for") == body_hash for line in closing):
+        return
+    session.script_lines[:] = body
+    script_lines = session.script_lines
     previous_context = "".join([f"{line['speaker']}: {line['text']}\n" for line in script_lines[-20:]])
     prompt = f"""
 ต่อไปนี้คือบทพูด podcast ที่ดำเนินมาจนถึงตอนท้าย:
@@ -210,29 +910,42 @@ def add_closing():
 
 รูปแบบ: สลับ A: / B: อย่างลื่นไหล 4–6 บรรทัด
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    closing_script = response.choices[0].message.content.strip()
-    for line in closing_script.splitlines():
-        if line.startswith("A:"):
-            script_lines.append({"speaker": "A", "text": line[2:].strip()})
-        elif line.startswith("B:"):
-            script_lines.append({"speaker": "B", "text": line[2:].strip()})
-            
-def step1_initialize_and_generate_opening(source: str):
+    with metrics.timed("closing"):
+        for line in stream_script_lines(SCRIPT_MODEL, [{"role": "user", "content": prompt}]):
+            line.update({"closing": True, "closing_for": body_hash})
+            script_lines.append(line)
+
+
+def step1_initialize_and_generate_opening(source: str, progress=None, stages=None):
     """
     source สามารถเป็น YouTube URL หรือ path ของ video/audio file (.mp4, .mov, .wav)
+    stages: ถ้ามี (batch) แต่ละ stage จะรอคิวของ stage นั้น และ YouTube จะดาวน์โหลดให้เสร็จก่อนถอดเสียง
+    เพื่อให้ download กับ transcribe ของคนละ item ทำงานซ้อนกันได้
+    ผลลัพธ์มี trace เวลาของแต่ละ stage ด้วย
     """
-    global script_lines, chat_history
-    session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-    script_lines.clear()
-    chat_history.clear()
+    ensure_dirs()
+    session = PipelineSession.create()
+    # GC ต้องไม่ลบไฟล์ต้นทางระหว่างที่ step1 ยังใช้อยู่
+    source_path = youtube_audio_path(source) if source.startswith(("http://", "https://")) else source
+    with metrics.trace(session.session_id, "step1") as trace, storage.pinned(session.session_id, source_path):
+        result = _generate_opening(session, source, progress, stages)
+    return dict(result, trace=trace.to_dict())
+
+def _generate_opening(session, source, progress, stages):
+    session_id = session.session_id
 
     # ตรวจว่าเป็น YouTube URL หรือ local path
+    _report(progress, "download", 0.0)
+    transcript_result = None
+    converted = False
     if source.startswith("http://") or source.startswith("https://"):
-        audio_path = download_youtube_audio(source)
+        audio_path = youtube_audio_path(source)
+        if not os.path.exists(audio_path) and stages:
+            with _stage(stages, "download"):
+                download_youtube_audio(source)
+        elif not os.path.exists(audio_path):
+            # ยังไม่เคยดาวน์โหลด: ถอดเสียงไปพร้อมกับดาวน์โหลด
+            audio_path, audio_hash, transcript_result = ingest_and_transcribe_youtube(source)
     elif os.path.exists(source):
         ext = os.path.splitext(source)[-1].lower()
         if ext == ".wav":
@@ -240,31 +953,37 @@ def step1_initialize_and_generate_opening(source: str):
             audio_path = source
         else:
             # แปลง video → wav
-            audio_path = os.path.join(DOWNLOAD_DIR, f"{session_id}.wav")
-            subprocess.run([
-                "ffmpeg", "-y",
-                "-i", source,
-                "-vn",
-                "-acodec", "pcm_s16le",
-                "-ar", "16000",
-                "-ac", "1",
-                audio_path
-            ], check=True)
+            converted = True
+            with _stage(stages, "ffmpeg"), metrics.timed("ffmpeg"):
+                audio_path = transcode_file_to_wav(source, os.path.join(DOWNLOAD_DIR, f"{session_id}.wav"))
     else:
         raise ValueError("Invalid source path or URL")
 
-    transcript = transcribe_audio(audio_path).get("transcribe_text", "")
+    _report(progress, "transcribe", 0.2)
+    if transcript_result is None:
+        with _stage(stages, "ffmpeg"):
+            audio_hash = hash_audio_pcm(audio_path)
+        with _stage(stages, "transcribe"):
+            transcript_result = transcribe_audio_cached(audio_path, audio_hash)
+    transcript = transcript_result.get("transcribe_text", "")
     
-    # ลบไฟล์เฉพาะกรณีที่เราเป็นคนแปลง
-    if not source.endswith(".wav"):
+    # ลบไฟล์เฉพาะกรณีที่เราเป็นคนแปลง (WAV จาก YouTube เก็บไว้เป็น cache)
+    if converted:
         os.remove(audio_path)
 
-    summary = summarize_for_podcast(transcript)
-    add_summary_to_history(summary)
-    opening_lines = create_opening_from_summary(summary)
-    script_lines.extend(opening_lines)
-    script_text, suggested_questions = generate_podcast_script("เริ่มต้นจากเรื่องไหนก่อนดี")
-    save_script_to_supabase(session_id, script_lines, suggested_questions)
+    _report(progress, "summarize", 0.5)
+    with _stage(stages, "llm"):
+        summary = summarize_for_podcast_cached(transcript, audio_hash)
+    add_summary_to_history(session, summary)
+    _report(progress, "opening", 0.7)
+    with _stage(stages, "llm"):
+        opening_lines = create_opening_from_summary(summary)
+    session.script_lines.extend(opening_lines)
+    with _stage(stages, "llm"):
+        script_text, suggested_questions = generate_podcast_script(session, "เริ่มต้นจากเรื่องไหนก่อนดี")
+    session.suggested_questions = suggested_questions
+    _report(progress, "save", 0.95)
+    save_session(session)
 
     return {
         "session_id": session_id,
@@ -274,40 +993,130 @@ def step1_initialize_and_generate_opening(source: str):
 
 
 
-def step2_continue_conversation(session_id, question):
-    global script_lines, chat_history
+def step2_stream_conversation(session_id, question):
+    """
+    แบบ streaming ของ step2: yield ("start", ...) หลังโหลด session, ("line", ...) ทีละบรรทัด
+    และ ("done", ...) หลังบันทึกแล้ว (มี trace เวลาของแต่ละ stage)
+    """
+    trace = metrics.Trace(session_id, "step2")
+    try:
+        for event, data in metrics.traced(trace, _continue_conversation(session_id, question)):
+            if event == "done":
+                metrics.end_trace(trace)
+                data = dict(data, trace=trace.to_dict())
+            yield event, data
+    finally:
+        if trace.seconds is None:
+            metrics.end_trace(trace)
 
-    session_data = load_session_from_supabase(session_id)
-    if not session_data:
-        raise ValueError("Session not found")
-    script_lines.clear()
-    script_lines.extend(session_data["script_lines"])
-    chat_history.clear()
-
-    summary_text = " ".join([f"{line['speaker']}: {line['text']}" for line in script_lines[:6]])
-    chat_history.append({
-        "role": "system",
-        "content": f"คุณคือผู้ช่วย Podcast\nเนื้อหาที่ผ่านมา:\n{summary_text}"
-    })
+def _continue_conversation(session_id, question):
+    with session_lock(session_id), storage.pinned(session_id):
+        session = load_session_for_context(session_id)
+        yield "start", {"session_id": session_id}
 
-    script_text, suggested_questions = generate_podcast_script(question)
-    save_script_to_supabase(session_id, script_lines, suggested_questions)
-    return script_text, suggested_questions
+        update_dialogue_digest(session)
+        build_context_history(session)
 
-def step3_finalize_and_generate_audio(session_id):
-    global script_lines
+        for event, data in stream_podcast_script(session, question):
+            if event == "done":
+                session.suggested_questions = data["suggested_questions"]
+                save_session(session)
+            yield event, data
 
-    session_data = load_session_from_supabase(session_id)
-    if not session_data:
-        raise ValueError("Session not found")
+def step2_continue_conversation(session_id, question):
+    result = None
+    for event, data in step2_stream_conversation(session_id, question):
+        if event == "done":
+            result = data
+    return result["script"], result["suggested_questions"]
 
-    script_lines.clear()
-    script_lines.extend(session_data["script_lines"])
+def step3_finalize_and_generate_audio(session_id, progress=None, progressive=False):
+    """
+    progressive=True: เผยแพร่ HLS playlist ที่ HLS_DIR/<session_id>/index.m3u8 ระหว่าง synthesize
+    (path ของ playlist ถูกรายงานผ่าน progress ทันทีที่สร้าง)
+    trace ของแต่ละ stage ดูได้จาก metrics.last_trace(session_id, "step3")
+    VIDEO_ENABLED: render MP4 ของตอนไว้ที่ episode_video_path(audio_path) ด้วย หลังบันทึก session แล้ว
+    (render พังไม่ทำให้ step3 พัง เสียงยังส่งได้ตามปกติ)
+    """
+    ensure_dirs()
+    # pin ไว้ก่อนอ่าน manifest: GC ลบ clip หรือไฟล์ตอนของ session ที่กำลังทำงานไม่ได้
+    with session_lock(session_id), storage.pinned(session_id), metrics.trace(session_id, "step3"):
+        session = load_session(session_id)
 
-    add_closing()
-    generate_voice_from_script_lines()
-    audio_path = combine_voices_in_order(session_id)
-    save_script_to_supabase(session_id, script_lines, session_data["suggested_questions"], audio_path)
+        _report(progress, "closing", 0.0)
+        add_closing(session)
+        publisher = None
+        processed = {}
+        if progressive:
+            # เผยแพร่ clip ที่ post-process แล้วและช่วงเงียบตามผู้พูดแบบเดียวกับไฟล์ตอนเต็ม
+            publisher = HLSPublisher(
+                os.path.join(HLS_DIR, session_id), len(session.script_lines),
+                gaps_ms=turn_gaps_ms(session.script_lines),
+                prepare=progressive_clip_processor(session, processed),
+            )
+            _report(progress, "tts", 0.2, playlist=os.path.relpath(publisher.playlist_path, DOWNLOAD_DIR))
+        else:
+            _report(progress, "tts", 0.2)
+        try:
+            generate_voice_from_script_lines(session, publisher)
+        finally:
+            if publisher:
+                publisher.finish()
+        _report(progress, "assemble", 0.8)
+        audio_path = combine_voices_in_order(session, processed)
+        _report(progress, "save", 0.9)
+        save_session(session, audio_path, duration=audio_duration(audio_path))
+        _report(progress, "video", 0.95)
+        try:
+            render_episode_video(session, audio_path)
+        except Exception:
+            logger.exception("video render failed for session %s", session_id)
+
+    return audio_path
 
+def render_session_video(session_id, progress=None):
+    """render MP4 ของตอนที่ step3 ทำเสร็จแล้ว แยกจาก step3 (ไม่ขึ้นกับ VIDEO_ENABLED) คืน path ของเสียง"""
+    with session_lock(session_id), storage.pinned(session_id), metrics.trace(session_id, "video"):
+        session = load_session(session_id)
+        audio_path = os.path.join(DOWNLOAD_DIR, f"podcast_final_{session_id}.wav")
+        if not os.path.exists(audio_path) or not session.load_manifest().get("complete"):
+            raise ValueError("Episode audio not found, run step3 first")
+        _report(progress, "video", 0.0)
+        render_episode_video(session, audio_path, enabled=True)
     return audio_path
 
+
+# --- แก้ script ทีละบรรทัด (step3 ครั้งถัดไป render ใหม่เฉพาะบรรทัดที่เปลี่ยน) ---
+def _edit_session(session_id, edit):
+    with session_lock(session_id):
+        session = load_session(session_id)
+        edit(session)
+        save_session(session)
+    return session.script_lines
+
+def update_script_line(session_id, line_id, speaker=None, text=None):
+    def edit(session):
+        line = session.script_lines[session.find_line(line_id)]
+        if speaker is not None:
+            line["speaker"] = speaker
+        if text is not None:
+            line["text"] = text
+    return _edit_session(session_id, edit)
+
+def insert_script_line(session_id, speaker, text, after_line_id=None):
+    """after_line_id=None คือแทรกเป็นบรรทัดแรก"""
+    def edit(session):
+        index = session.find_line(after_line_id) + 1 if after_line_id else 0
+        session.script_lines.insert(index, {"id": new_line_id(), "speaker": speaker, "text": text})
+        # ตำแหน่งที่ digest ครอบคลุมต้องเลื่อนตาม (ข้อความ digest เดิมยังใช้ได้)
+        if index < session.digest_upto:
+            session.digest_upto += 1
+    return _edit_session(session_id, edit)
+
+def delete_script_line(session_id, line_id):
+    def edit(session):
+        index = session.find_line(line_id)
+        del session.script_lines[index]
+        if index < session.digest_upto:
+            session.digest_upto -= 1
+    return _edit_session(session_id, edit)
@@ -0,0 +1,109 @@
+import os
+import csv
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+PLAYLIST_NAME = "index.m3u8"
+# segment ยาวไม่เกินนี้ (บรรทัดยาวถูกแบ่งหลาย segment) TARGETDURATION จึงคงที่ตั้งแต่สร้าง playlist
+TARGET_DURATION = 10
+
+
+class HLSPublisher:
+    """
+    เผยแพร่ตอนเป็น HLS playlist ระหว่างที่ TTS ยังทำงานอยู่ (บรรทัดละหนึ่ง segment หรือมากกว่าถ้ายาวเกิน
+    target_duration) บรรทัดเสร็จไม่เรียงลำดับได้ แต่ segment จะถูกเพิ่มเข้า playlist ตามลำดับ script เท่านั้น
+    gaps_ms: ความยาวช่วงเงียบหลังแต่ละ clip (ไม่ส่ง = gap_ms ทุก clip)
+    prepare: fn(index, clip_path) คืน path ของ clip ที่จะเผยแพร่จริง (เช่น clip ที่ post-process แล้ว)
+    ถูกเรียกใน thread ของ publisher ตามลำดับ script
+    """
+
+    def __init__(self, out_dir, clip_count, gap_ms=300, gaps_ms=None, bitrate="96k", prepare=None,
+                 target_duration=TARGET_DURATION):
+        self.out_dir = out_dir
+        self.clip_count = clip_count
+        self.gaps_ms = list(gaps_ms) if gaps_ms is not None else [gap_ms] * clip_count
+        self.bitrate = bitrate
+        self.prepare = prepare
+        self.target_duration = target_duration
+        self.playlist_path = os.path.join(out_dir, PLAYLIST_NAME)
+        self.published = 0
+        self.failed = None
+        self._ready = {}
+        self._entries = []
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+        # encode ทีละ segment ตามลำดับใน thread เดียว ไม่บล็อกผู้เรียก
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hls")
+        self._next = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self._write_playlist(ended=False)
+
+    def clip_ready(self, index, path):
+        with self._lock:
+            self._ready[index] = path
+            while self._next in self._ready:
+                self._worker.submit(self._publish, self._next, self._ready.pop(self._next))
+                self._next += 1
+
+    def clip_failed(self, index):
+        with self._lock:
+            if self.failed is None or index < self.failed:
+                self.failed = index
+
+    def _publish(self, index, clip_path):
+        if self.failed is not None and index >= self.failed:
+            return
+        list_path = os.path.join(self.out_dir, f"seg_{index:05d}.csv")
+        try:
+            if self.prepare:
+                clip_path = self.prepare(index, clip_path)
+            gap_seconds = self.gaps_ms[index] / 1000
+            # segment muxer ตัดที่ packet แรกหลังทุก target_duration วินาที ได้ segment ยาวเกินไม่ถึงหนึ่ง AAC frame
+            # segment ยังไม่อยู่ใน playlist จนกว่าจะ encode ครบ จึงเขียนลงชื่อจริงได้เลย
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-i", clip_path,
+                 "-af", f"apad=pad_dur={gap_seconds}",
+                 "-c:a", "aac", "-b:a", self.bitrate,
+                 "-f", "segment", "-segment_time", str(self.target_duration),
+                 "-initial_offset", f"{self._elapsed:.3f}", "-segment_format", "mpegts",
+                 "-segment_list", list_path, "-segment_list_type", "csv",
+                 os.path.join(self.out_dir, f"seg_{index:05d}_%03d.ts")],
+                check=True,
+            )
+            with open(list_path, newline="") as f:
+                entries = [(name, float(end) - float(start)) for name, start, end in csv.reader(f)]
+            os.remove(list_path)
+        except Exception:
+            # รวม prepare ที่พัง: หยุดเผยแพร่ต่อจากจุดนี้ (playlist ไม่ถูกปิดทับช่วงที่ขาด) ไฟล์ตอนเต็มยังสร้างตามปกติ
+            self.clip_failed(index)
+            return
+        self._elapsed += sum(duration for _, duration in entries)
+        self._entries.extend(entries)
+        self.published = index + 1
+        self._write_playlist(ended=False)
+
+    def _write_playlist(self, ended):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for name, duration in self._entries:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(name)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp_path = f"{self.playlist_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
+
+    def finish(self):
+        """รอให้ segment ที่ค้างอยู่ encode เสร็จ แล้วปิด playlist"""
+        self._worker.shutdown(wait=True)
+        if self.failed is None and self.published == self.clip_count:
+            self._write_playlist(ended=True)
+        return self.published
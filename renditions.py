@@ -0,0 +1,86 @@
+import os
+import tempfile
+import subprocess
+from audio_assembler import PCM_FORMATS
+
+# format ที่บีบอัดแล้วของไฟล์ตอน (ไฟล์ WAV ยังเก็บไว้เป็นต้นฉบับสำหรับ patch ครั้งถัดไป)
+FORMATS = {
+    "opus": {"ext": ".opus", "codec": "libopus", "container": ["-f", "ogg"], "bitrate": "48k", "mime_type": "audio/ogg"},
+    "mp3": {"ext": ".mp3", "codec": "libmp3lame", "container": ["-f", "mp3"], "bitrate": "96k", "mime_type": "audio/mpeg"},
+    # faststart ย้าย moov ไว้หน้าไฟล์ ให้เล่นได้ก่อนโหลดครบ
+    "aac": {"ext": ".m4a", "codec": "aac", "container": ["-movflags", "+faststart", "-f", "ipod"],
+            "bitrate": "96k", "mime_type": "audio/mp4"},
+}
+
+
+def rendition_path(wav_path, fmt):
+    return os.path.splitext(wav_path)[0] + FORMATS[fmt]["ext"]
+
+
+class RenditionEncoder:
+    """
+    รับ PCM ของทั้งตอนทีละก้อนผ่าน write() แล้วส่งเข้า ffmpeg หนึ่ง process ต่อ format
+    ทุก format encode ไปพร้อมกับการต่อไฟล์ ไฟล์จริงถูกแทนที่เมื่อ close() สำเร็จเท่านั้น
+    """
+
+    def __init__(self, wav_path, formats, params, bitrates=None):
+        channels, sampwidth, rate = params
+        self.paths = {fmt: rendition_path(wav_path, fmt) for fmt in formats}
+        self._procs = {}
+        try:
+            for fmt, path in self.paths.items():
+                spec = FORMATS[fmt]
+                bitrate = (bitrates or {}).get(fmt) or spec["bitrate"]
+                stderr = tempfile.TemporaryFile()
+                proc = subprocess.Popen(
+                    ["ffmpeg", "-v", "error", "-y",
+                     "-f", PCM_FORMATS[sampwidth], "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0",
+                     "-c:a", spec["codec"], "-b:a", bitrate, *spec["container"], f"{path}.part"],
+                    stdin=subprocess.PIPE,
+                    stderr=stderr,
+                )
+                self._procs[fmt] = (proc, stderr)
+        except Exception:
+            self.abort()
+            raise
+
+    def write(self, data):
+        for fmt, (proc, _) in self._procs.items():
+            try:
+                proc.stdin.write(data)
+            except BrokenPipeError:
+                # ffmpeg ตายไปแล้ว close() จะรายงาน error ของ format นี้
+                pass
+
+    def close(self):
+        """รอ encode เสร็จ คืน {format: path}"""
+        errors = []
+        for fmt, (proc, stderr) in self._procs.items():
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            if proc.wait() != 0:
+                stderr.seek(0)
+                errors.append(f"{fmt}: {stderr.read().decode(errors='replace').strip()[-200:]}")
+            stderr.close()
+        if errors:
+            self._remove_parts()
+            raise RuntimeError("encoding failed: " + "; ".join(errors))
+        for path in self.paths.values():
+            os.replace(f"{path}.part", path)
+        return dict(self.paths)
+
+    def abort(self):
+        for proc, stderr in self._procs.values():
+            proc.kill()
+            proc.wait()
+            if proc.stdin:
+                proc.stdin.close()
+            stderr.close()
+        self._remove_parts()
+
+    def _remove_parts(self):
+        for path in self.paths.values():
+            if os.path.exists(f"{path}.part"):
+                os.remove(f"{path}.part")
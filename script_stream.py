@@ -0,0 +1,60 @@
+import uuid
+
+SUGGESTIONS_MARKER = "### Suggested Follow-up Questions:"
+SCRIPT_MARKER = "### Podcast Script:"
+
+
+def new_line_id():
+    # id ประจำบรรทัด ไม่เปลี่ยนเมื่อแก้ข้อความหรือแทรก/ลบบรรทัดอื่น
+    return uuid.uuid4().hex[:12]
+
+
+def parse_script_line(line):
+    if line.startswith("A:"):
+        return {"id": new_line_id(), "speaker": "A", "text": line[2:].strip()}
+    if line.startswith("B:"):
+        return {"id": new_line_id(), "speaker": "B", "text": line[2:].strip()}
+    return None
+
+
+def split_script_and_suggestions(result):
+    parts = result.split(SUGGESTIONS_MARKER)
+    script_part = parts[0].split(SCRIPT_MARKER)[-1].strip()
+    suggestions = parts[1].strip() if len(parts) > 1 else ""
+    return script_part, suggestions
+
+
+class ScriptLineParser:
+    """
+    รับข้อความจาก streamed completion ทีละ delta
+    แล้วคืนบรรทัด A:/B: ทันทีที่เจอขึ้นบรรทัดใหม่ (ไม่ต้องรอให้ตอบจบ)
+    บรรทัดหลัง SUGGESTIONS_MARKER ไม่นับเป็นบทพูด
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pending = ""
+        self.in_suggestions = False
+
+    def feed(self, delta):
+        self.text += delta
+        self._pending += delta
+        lines = []
+        while "\n" in self._pending:
+            raw, self._pending = self._pending.split("\n", 1)
+            line = self._parse(raw)
+            if line:
+                lines.append(line)
+        return lines
+
+    def close(self):
+        raw, self._pending = self._pending, ""
+        line = self._parse(raw)
+        return [line] if line else []
+
+    def _parse(self, raw):
+        if SUGGESTIONS_MARKER in raw:
+            self.in_suggestions = True
+        if self.in_suggestions:
+            return None
+        return parse_script_line(raw.strip())
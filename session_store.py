@@ -0,0 +1,341 @@
+import copy
+import json
+import base64
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import metrics
+from script_stream import new_line_id
+
+META_COLUMNS = "session_id,suggested_questions,audio_path,timestamp,line_count,duration,summary,digest,digest_upto"
+# คอลัมน์สำหรับหน้า list (ไม่มี script และ suggested questions)
+LIST_COLUMNS = "session_id,timestamp,line_count,duration,audio_path"
+
+# ตารางฝั่ง Supabase (รันครั้งเดียวใน SQL editor)
+SUPABASE_SCHEMA = """
+alter table podcast_scripts add column if not exists line_count integer;
+alter table podcast_scripts add column if not exists duration double precision;
+alter table podcast_scripts add column if not exists summary text;
+alter table podcast_scripts add column if not exists digest text;
+alter table podcast_scripts add column if not exists digest_upto integer;
+create index if not exists podcast_scripts_timestamp on podcast_scripts (timestamp desc, session_id desc);
+create table if not exists podcast_script_lines (
+    session_id text not null,
+    position integer not null,
+    line_id text not null,
+    data jsonb not null,
+    primary key (session_id, position)
+);
+"""
+def _quote(value):
+    # ค่าใน filter ของ PostgREST: ครอบด้วย " และ escape \ กับ " ตัวคั่นอย่าง , ( ) จึงเป็นแค่ข้อความ
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def encode_cursor(timestamp, session_id):
+    return base64.urlsafe_b64encode(json.dumps([timestamp, session_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """[timestamp, session_id] จาก cursor ถ้า cursor ไม่ใช่ของ list_sessions จะ raise ValueError"""
+    after = json.loads(base64.urlsafe_b64decode(cursor))
+    if not (isinstance(after, list) and len(after) == 2 and all(isinstance(v, str) for v in after)):
+        raise ValueError("Invalid cursor")
+    return after
+
+
+ADDED_SQLITE_COLUMNS = [("duration", "real"), ("summary", "text"), ("digest", "text"), ("digest_upto", "integer")]
+
+
+class SupabaseSessionBackend:
+    """
+    metadata อยู่ใน podcast_scripts (ไม่เขียน blob script อีก) บทพูดแยกเป็นหนึ่ง row ต่อบรรทัด
+    row เก่าที่ยังเก็บ script เป็น blob จะถูกย้ายมาเป็นรายบรรทัดตอนโหลดครั้งแรก
+    """
+
+    def __init__(self, client_factory):
+        self._client_factory = client_factory
+
+    @property
+    def client(self):
+        return self._client_factory()
+
+    def ping(self):
+        self.client.table("podcast_scripts").select("session_id").limit(1).execute()
+
+    def read_meta(self, session_id):
+        response = self.client.table("podcast_scripts").select(META_COLUMNS).eq("session_id", session_id).execute()
+        if not response.data:
+            return None
+        meta = response.data[0]
+        if meta.get("line_count") is None:
+            meta = self._migrate_legacy(meta)
+        return meta
+
+    def _migrate_legacy(self, meta):
+        response = self.client.table("podcast_scripts").select("script").eq("session_id", meta["session_id"]).execute()
+        lines = json.loads(response.data[0].get("script") or "[]")
+        # script แบบ blob ที่บันทึกก่อนมี line id
+        for line in lines:
+            line.setdefault("id", new_line_id())
+        return self.write(meta["session_id"], 0, lines, {"timestamp": meta["timestamp"]})
+
+    def read_lines(self, session_id, start=0, stop=None):
+        query = self.client.table("podcast_script_lines").select("data").eq("session_id", session_id).gte("position", start)
+        if stop is not None:
+            query = query.lt("position", stop)
+        response = query.order("position").execute()
+        return [row["data"] for row in response.data]
+
+    def list(self, limit, after=None):
+        query = self.client.table("podcast_scripts").select(LIST_COLUMNS)
+        if after:
+            timestamp, session_id = after
+            timestamp, session_id = _quote(timestamp), _quote(session_id)
+            query = query.or_(
+                f"timestamp.lt.{timestamp},and(timestamp.eq.{timestamp},session_id.lt.{session_id})"
+            )
+        response = query.order("timestamp", desc=True).order("session_id", desc=True).limit(limit).execute()
+        return response.data
+
+    def write(self, session_id, start, lines, fields):
+        table = self.client.table("podcast_script_lines")
+        table.delete().eq("session_id", session_id).gte("position", start).execute()
+        if lines:
+            table.insert([
+                {"session_id": session_id, "position": start + i, "line_id": line["id"], "data": line}
+                for i, line in enumerate(lines)
+            ]).execute()
+        meta = dict({"timestamp": datetime.now().isoformat()}, **fields, session_id=session_id, line_count=start + len(lines))
+        response = self.client.table("podcast_scripts").upsert(meta, on_conflict="session_id").execute()
+        return {k: response.data[0].get(k) for k in META_COLUMNS.split(",")}
+
+
+class SQLiteSessionBackend:
+    """backend ในเครื่องสำหรับรันและ benchmark แบบ offline"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        # เปิดไฟล์และสร้างตารางตอนใช้ครั้งแรก ไม่ใช่ตอน import
+        if self._db is None:
+            with self._connect_lock:
+                if self._db is None:
+                    self._db = self._open()
+        return self._db
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(
+                "create table if not exists sessions ("
+                " session_id text primary key, suggested_questions text, audio_path text,"
+                " timestamp text, line_count integer not null default 0)"
+            )
+            # คอลัมน์ที่เพิ่มภายหลัง
+            columns = {row["name"] for row in conn.execute("pragma table_info(sessions)")}
+            for name, kind in ADDED_SQLITE_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"alter table sessions add column {name} {kind}")
+            conn.execute("create index if not exists sessions_timestamp on sessions (timestamp desc, session_id desc)")
+            conn.execute(
+                "create table if not exists script_lines ("
+                " session_id text not null, position integer not null, line_id text not null,"
+                " data text not null, primary key (session_id, position))"
+            )
+        return conn
+
+    def ping(self):
+        with self._lock:
+            self._conn.execute("select 1").fetchone()
+
+    def read_meta(self, session_id):
+        with self._lock:
+            row = self._conn.execute(f"select {META_COLUMNS} from sessions where session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def read_lines(self, session_id, start=0, stop=None):
+        stop = stop if stop is not None else -1
+        with self._lock:
+            rows = self._conn.execute(
+                "select data from script_lines where session_id = ? and position >= ? and (? < 0 or position < ?)"
+                " order by position",
+                (session_id, start, stop, stop),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def list(self, limit, after=None):
+        where, params = "", []
+        if after:
+            where, params = "where (timestamp, session_id) < (?, ?)", list(after)
+        with self._lock:
+            rows = self._conn.execute(
+                f"select {LIST_COLUMNS} from sessions {where} order by timestamp desc, session_id desc limit ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def write(self, session_id, start, lines, fields):
+        meta = dict({"timestamp": datetime.now().isoformat()}, **fields, session_id=session_id, line_count=start + len(lines))
+        columns = ", ".join(meta)
+        updates = ", ".join(f"{k} = excluded.{k}" for k in meta if k != "session_id")
+        with self._lock, self._conn:
+            self._conn.execute("delete from script_lines where session_id = ? and position >= ?", (session_id, start))
+            self._conn.executemany(
+                "insert into script_lines (session_id, position, line_id, data) values (?, ?, ?, ?)",
+                [(session_id, start + i, line["id"], json.dumps(line, ensure_ascii=False)) for i, line in enumerate(lines)],
+            )
+            self._conn.execute(
+                f"insert into sessions ({columns}) values ({', '.join('?' * len(meta))})"
+                f" on conflict(session_id) do update set {updates}",
+                list(meta.values()),
+            )
+            row = self._conn.execute(f"select {META_COLUMNS} from sessions where session_id = ?", (session_id,)).fetchone()
+        return dict(row)
+
+
+class SessionStore:
+    """
+    เก็บ session ผ่าน backend โดยเขียนเฉพาะบรรทัดตั้งแต่จุดแรกที่เปลี่ยน (ปกติคือบรรทัดที่ต่อท้าย)
+    มี write-through cache ใน process สำหรับโหลด session เดิมซ้ำ
+    cache ถือว่า process นี้เป็นผู้เขียนคนเดียว ถ้ารันหลาย worker ให้ตั้ง cache_size=0
+    """
+
+    def __init__(self, backend, cache_size=128):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, session_id):
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+            return entry
+
+    def _remember(self, session_id, meta, lines):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[session_id] = {"meta": meta, "lines": copy.deepcopy(lines)}
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def load(self, session_id, tail=None):
+        """
+        tail: โหลดเฉพาะ n บรรทัดท้าย ค่า line_offset ที่คืนไปคือจำนวนบรรทัดก่อนหน้าที่ไม่ได้โหลด
+        คืน None ถ้าไม่มี session
+        """
+        entry = self._cached(session_id)
+        if entry is not None:
+            self.hits += 1
+            meta, lines = entry["meta"], entry["lines"]
+            start = max(0, len(lines) - tail) if tail is not None else 0
+            return dict(meta, script_lines=copy.deepcopy(lines[start:]), line_offset=start)
+
+        self.misses += 1
+        with metrics.timed("store_read") as span:
+            meta = self.backend.read_meta(session_id)
+            if meta is None:
+                return None
+            start = max(0, meta["line_count"] - tail) if tail is not None else 0
+            lines = self.backend.read_lines(session_id, start)
+            span["lines"] = len(lines)
+        metrics.LINES.inc(len(lines), stage="store_read")
+        if start == 0:
+            self._remember(session_id, meta, lines)
+        return dict(meta, script_lines=lines, line_offset=start)
+
+    def lines(self, session_id, start=0, stop=None):
+        entry = self._cached(session_id)
+        if entry is not None:
+            return copy.deepcopy(entry["lines"][start:stop])
+        return self.backend.read_lines(session_id, start, stop)
+
+    def list_sessions(self, limit=50, cursor=None):
+        """
+        เรียง session ใหม่สุดก่อน แบ่งหน้าแบบ cursor (ไม่ใช้ offset จึงเร็วเท่ากันทุกหน้า)
+        คืน (rows, next_cursor) โดย next_cursor เป็น None เมื่อหมดแล้ว
+        """
+        after = decode_cursor(cursor) if cursor else None
+        rows = self.backend.list(limit + 1, after)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["session_id"])
+        return rows, next_cursor
+
+    def save(self, session_id, script_lines, suggested_questions=None, audio_path=None, line_offset=0, **fields):
+        """
+        script_lines คือบรรทัดตั้งแต่ตำแหน่ง line_offset เป็นต้นไป
+        เขียนลง backend เฉพาะตั้งแต่บรรทัดแรกที่ต่างจากที่เก็บไว้
+        fields อื่น (duration, summary, digest ฯลฯ) เขียนเฉพาะค่าที่ไม่ใช่ None
+        """
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if suggested_questions is not None:
+            fields["suggested_questions"] = suggested_questions
+        if audio_path:
+            fields["audio_path"] = audio_path
+
+        start = line_offset
+        entry = self._cached(session_id)
+        if entry is not None:
+            # ไม่เขียน field ที่ค่าเท่าเดิม (เช่น summary ที่ไม่เปลี่ยนหลัง step1)
+            fields = {k: v for k, v in fields.items() if entry["meta"].get(k) != v}
+            stored = entry["lines"][line_offset:]
+            same = 0
+            while same < min(len(stored), len(script_lines)) and stored[same] == script_lines[same]:
+                same += 1
+            start = line_offset + same
+            full_lines = entry["lines"][:line_offset] + list(script_lines)
+        else:
+            full_lines = list(script_lines) if line_offset == 0 else None
+
+        written = script_lines[start - line_offset:]
+        with metrics.timed("store_write", lines=len(written)):
+            meta = self.backend.write(session_id, start, written, fields)
+        metrics.LINES.inc(len(written), stage="store_write")
+        if full_lines is not None:
+            self._remember(session_id, meta, full_lines)
+        else:
+            with self._lock:
+                self._cache.pop(session_id, None)
+        return meta
+
+    def ping(self):
+        self.backend.ping()
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._cache)
+        total = self.hits + self.misses
+        return {
+            "cached_sessions": cached,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def open_session_store(kind, db_path="sessions.db", cache_size=128):
+    if kind == "sqlite":
+        backend = SQLiteSessionBackend(db_path)
+    elif kind == "supabase":
+        from supabase_client import get_supabase
+        backend = SupabaseSessionBackend(get_supabase)
+    else:
+        raise ValueError(f"Unknown session store: {kind}")
+    return SessionStore(backend, cache_size=cache_size)
@@ -0,0 +1,326 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+import metrics
+
+
+class ArtifactClass:
+    def __init__(self, name, max_bytes=None, ttl=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # (directory, pattern, dirs) ชื่อที่ตรง pattern คือ artifact ของ class นี้
+        self.locations = []
+
+
+class Artifact:
+    """ไฟล์หรือ directory ที่ลบพร้อมกันเป็นหน่วยเดียว (เช่นไฟล์ตอนทุก format ของ session เดียวกัน)"""
+
+    def __init__(self, cls, key, session_id=None):
+        self.cls = cls
+        self.key = key
+        self.session_id = session_id
+        self.paths = []
+        self.bytes = 0
+        self.last_access = 0.0
+
+    def names(self):
+        # ชื่อที่ใช้ pin หรือ touch artifact นี้ได้
+        return ([self.session_id] if self.session_id else []) + self.paths
+
+
+def _name(name):
+    # session id ใช้ตามเดิม ส่วน path ทำเป็น absolute ให้อ้างถึงไฟล์เดียวกันได้จากทุก cwd
+    return os.path.abspath(name) if os.sep in name else name
+
+
+def _tree_usage(path):
+    total, newest = 0, os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+
+class StorageManager:
+    """
+    ติดตามไฟล์ที่ pipeline สร้างเป็น artifact แยกตาม class แต่ละ class มี quota และ TTL ของตัวเอง
+    GC ลบ artifact ที่ไม่ถูกใช้นานเกิน TTL ก่อน แล้วลบตามลำดับ LRU จนขนาดรวมลงมาต่ำกว่า quota
+    artifact ที่ถูก pin (session ที่กำลังทำงาน) หรือถูกใช้ภายใน min_age วินาทีจะไม่ถูกลบ
+    """
+
+    def __init__(self, index_path, min_age=600, interval=300, low_watermark=0.9):
+        self.index_path = index_path
+        self.min_age = min_age
+        self.interval = interval
+        # เกิน quota แล้วลบจนเหลือสัดส่วนนี้ ไม่ให้ทุกไฟล์ใหม่ปลุก GC ซ้ำ
+        self.low_watermark = low_watermark
+        self.classes = {}
+        self.runs = 0
+        self.last_run = None
+        self.last_seconds = None
+        self.last_error = None
+        self._pins = {}
+        self._pin_sources = []
+        self._access = {}
+        self._usage = {}
+        self._pending = {}
+        self._removed = {}
+        self._lock = threading.Lock()
+        # pin กับการลบต้องไม่สลับกัน: artifact ถูกลบครบก่อน pin หรือไม่ถูกลบเลย
+        self._pin_lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        self._loaded = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_class(self, name, max_bytes=None, ttl=None):
+        self.classes[name] = ArtifactClass(name, max_bytes, ttl)
+        self._usage[name] = {"artifacts": 0, "bytes": 0, "pinned": 0}
+        self._pending[name] = 0
+        self._removed[name] = {"ttl": 0, "quota": 0, "freed_bytes": 0}
+        return self.classes[name]
+
+    def add_location(self, class_name, directory, pattern, dirs=False):
+        """pattern ต้องตรงกับชื่อทั้งชื่อ และมี group ชื่อ session (ผูกกับ session) หรือ key"""
+        self.classes[class_name].locations.append((directory, re.compile(pattern), dirs))
+
+    def add_pins(self, fn):
+        # fn คืนชื่อ (session id หรือ path) ที่ต้องเก็บไว้ ณ ตอนนี้ ถูกเรียกทุกรอบของ GC
+        self._pin_sources.append(fn)
+
+    def _ensure_loaded(self):
+        # เวลาใช้งานล่าสุดที่บันทึกไว้จากรอบก่อน (mtime ใช้แทนไม่ได้: media URL ผูกกับ mtime)
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                try:
+                    with open(self.index_path, encoding="utf-8") as f:
+                        saved = json.load(f).get("access", {})
+                except (OSError, ValueError):
+                    saved = {}
+                for name, accessed in saved.items():
+                    self._access[name] = max(accessed, self._access.get(name, 0.0))
+                self._loaded = True
+
+    def touch(self, *names):
+        now = time.time()
+        with self._lock:
+            for name in names:
+                self._access[_name(name)] = now
+
+    def pin(self, *names):
+        self.touch(*names)
+        with self._pin_lock:
+            for name in map(_name, names):
+                self._pins[name] = self._pins.get(name, 0) + 1
+
+    def unpin(self, *names):
+        self.touch(*names)
+        with self._pin_lock:
+            for name in map(_name, names):
+                count = self._pins.get(name, 0) - 1
+                if count > 0:
+                    self._pins[name] = count
+                else:
+                    self._pins.pop(name, None)
+
+    @contextmanager
+    def pinned(self, *names):
+        self.pin(*names)
+        try:
+            yield
+        finally:
+            self.unpin(*names)
+
+    def notify(self, class_name, nbytes):
+        """บอกว่ามีไฟล์ใหม่ใน class นี้ ถ้าน่าจะเกิน quota แล้วจะปลุก GC ก่อนถึงรอบ"""
+        cls = self.classes[class_name]
+        with self._lock:
+            self._pending[class_name] += nbytes
+            over = cls.max_bytes is not None and self._usage[class_name]["bytes"] + self._pending[class_name] > cls.max_bytes
+        if over:
+            self._wake.set()
+
+    def scan(self):
+        artifacts = {}
+        with self._lock:
+            access = dict(self._access)
+        for cls in self.classes.values():
+            for directory, pattern, dirs in cls.locations:
+                try:
+                    entries = list(os.scandir(directory))
+                except FileNotFoundError:
+                    continue
+                for entry in entries:
+                    match = pattern.fullmatch(entry.name)
+                    if not match:
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False) != dirs:
+                            continue
+                        if dirs:
+                            size, modified = _tree_usage(entry.path)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            size, modified = st.st_size, st.st_mtime
+                    except FileNotFoundError:
+                        continue
+                    groups = match.groupdict()
+                    session_id = groups.get("session")
+                    key = (cls.name, session_id or groups["key"])
+                    artifact = artifacts.get(key)
+                    if artifact is None:
+                        artifact = artifacts[key] = Artifact(cls, key[1], session_id)
+                    artifact.paths.append(os.path.abspath(entry.path))
+                    artifact.bytes += size
+                    artifact.last_access = max(artifact.last_access, modified)
+        for artifact in artifacts.values():
+            for name in artifact.names():
+                artifact.last_access = max(artifact.last_access, access.get(name, 0.0))
+        return list(artifacts.values())
+
+    def _remove(self, artifact, pinned):
+        with self._pin_lock:
+            if any(name in self._pins or name in pinned for name in artifact.names()):
+                return False
+            for path in artifact.paths:
+                try:
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def collect(self):
+        """GC หนึ่งรอบ คืนจำนวน artifact และ byte ที่ลบของแต่ละ class"""
+        with self._gc_lock, metrics.timed("storage_gc"):
+            started = time.perf_counter()
+            self._ensure_loaded()
+            now = time.time()
+            with self._lock:
+                pending = dict(self._pending)
+            artifacts = self.scan()
+            pinned = {_name(name) for fn in self._pin_sources for name in fn()}
+            with self._pin_lock:
+                pinned_now = pinned | set(self._pins)
+            report, kept = {}, []
+            for cls in self.classes.values():
+                items = sorted((a for a in artifacts if a.cls is cls), key=lambda a: a.last_access)
+                removed = {"ttl": 0, "quota": 0, "freed_bytes": 0}
+
+                def evict(artifact, reason):
+                    if now - artifact.last_access < self.min_age or not self._remove(artifact, pinned):
+                        return False
+                    removed[reason] += 1
+                    removed["freed_bytes"] += artifact.bytes
+                    metrics.STORAGE_REMOVED.inc(artifact=cls.name, reason=reason)
+                    metrics.STORAGE_FREED_BYTES.inc(artifact.bytes, artifact=cls.name, reason=reason)
+                    return True
+
+                survivors = [
+                    a for a in items if not (cls.ttl is not None and now - a.last_access > cls.ttl and evict(a, "ttl"))
+                ]
+                total = sum(a.bytes for a in survivors)
+                if cls.max_bytes is not None and total > cls.max_bytes:
+                    target = cls.max_bytes * self.low_watermark
+                    for artifact in list(survivors):
+                        if total <= target:
+                            break
+                        if evict(artifact, "quota"):
+                            total -= artifact.bytes
+                            survivors.remove(artifact)
+                kept.extend(survivors)
+                usage = {
+                    "artifacts": len(survivors),
+                    "bytes": total,
+                    "pinned": sum(1 for a in survivors if any(n in pinned_now for n in a.names())),
+                }
+                metrics.STORAGE_BYTES.set(total, artifact=cls.name)
+                metrics.STORAGE_ARTIFACTS.set(len(survivors), artifact=cls.name)
+                with self._lock:
+                    self._usage[cls.name] = usage
+                    self._pending[cls.name] -= pending[cls.name]
+                    for k, v in removed.items():
+                        self._removed[cls.name][k] += v
+                report[cls.name] = dict(usage, **removed)
+            self._save_index(kept)
+            with self._lock:
+                self.runs += 1
+                self.last_run = now
+                self.last_seconds = time.perf_counter() - started
+                self.last_error = None
+            return report
+
+    def _save_index(self, artifacts):
+        # เก็บเวลาใช้งานเฉพาะของ artifact ที่ยังอยู่ index จึงไม่โตตามจำนวนไฟล์ที่เคยมี
+        names = {name for a in artifacts for name in a.names()}
+        with self._lock:
+            self._access = {n: t for n, t in self._access.items() if n in names or n in self._pins}
+            access = dict(self._access)
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"access": access}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def start(self):
+        # interval <= 0 คือไม่รัน GC อัตโนมัติ (เรียก collect() เอง)
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.collect()
+            except Exception as e:
+                # GC พังรอบหนึ่ง (เช่นลบไฟล์ไม่ได้) ต้องไม่ทำให้ thread ตาย
+                with self._lock:
+                    self.last_error = f"{type(e).__name__}: {e}"
+            self._wake.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "min_age": self.min_age,
+                "runs": self.runs,
+                "last_run": self.last_run,
+                "last_seconds": self.last_seconds,
+                "last_error": self.last_error,
+                "classes": {
+                    name: dict(
+                        self._usage[name],
+                        max_bytes=cls.max_bytes,
+                        ttl=cls.ttl,
+                        pending_bytes=self._pending[name],
+                        removed=dict(self._removed[name]),
+                    )
+                    for name, cls in self.classes.items()
+                },
+            }
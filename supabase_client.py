@@ -1,7 +1,18 @@
-from supabase import create_client
 import os
+import threading
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+_client = None
+_lock = threading.Lock()
+
+
+def get_supabase():
+    # สร้าง client ตอนใช้ครั้งแรก ไม่ใช่ตอน import (backend แบบ sqlite จึงไม่ต้องมี key)
+    global _client
+    with _lock:
+        if _client is None:
+            from supabase import create_client
+            _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _client
@@ -0,0 +1,78 @@
+import os
+import atexit
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# podcast_pipeline อ่าน env และสร้าง singleton ตอน import: ตั้งให้ชี้ไป directory ชั่วคราว
+# ใช้ SQLite แทน Supabase และไม่รัน GC เบื้องหลัง
+_root = tempfile.mkdtemp(prefix="podcast-tests-")
+atexit.register(shutil.rmtree, _root, ignore_errors=True)
+os.environ.setdefault("DOWNLOAD_DIR", os.path.join(_root, "downloads"))
+os.environ.setdefault("SESSION_DB_PATH", os.path.join(_root, "sessions.db"))
+os.environ.setdefault("SESSION_STORE", "sqlite")
+os.environ.setdefault("STORAGE_GC_INTERVAL_SECONDS", "0")
+os.environ.setdefault("GPT_TOKEN", "test")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("AUDIO_WORKERS", "1")
+
+
+class FakeOpenAI:
+    """แทน OpenAI client: ตอบ reply ทุกครั้ง และเก็บ messages ของแต่ละ call ไว้ตรวจ"""
+
+    def __init__(self, reply="A: ทดสอบ\nB: ตอบกลับ\n"):
+        self.reply = reply
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, stream=False, **params):
+        self.calls.append({"model": model, "messages": messages, "stream": stream})
+        if stream:
+            delta = SimpleNamespace(content=self.reply)
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)])
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture(scope="session")
+def fake_services():
+    from bench.fakes import start_server
+    server = start_server(options={"tts_seconds_per_char": 0.01})
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def pipeline(fake_services, monkeypatch):
+    """podcast_pipeline ที่ต่อ TTS ปลอมและ OpenAI ปลอม (pipeline.openai_client)"""
+    import podcast_pipeline
+    from bench.fakes import TTS_PATH
+    monkeypatch.setattr(podcast_pipeline.tts_dispatcher, "endpoint", fake_services + TTS_PATH)
+    monkeypatch.setattr(podcast_pipeline, "openai_client", FakeOpenAI())
+    return podcast_pipeline
+
+
+@pytest.fixture
+def client(pipeline, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    # MEDIA_DIR ของ main อิง cwd: ให้ไฟล์อัปโหลดลงที่เดียวกับ DOWNLOAD_DIR
+    monkeypatch.setattr(main, "MEDIA_DIR", pipeline.DOWNLOAD_DIR)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_session(pipeline):
+    """สร้างและบันทึก session ที่มี script สลับ A/B n บรรทัด"""
+    def make(lines=6):
+        session = pipeline.PipelineSession.create()
+        session.script_lines = [
+            {"id": pipeline.new_line_id(), "speaker": "AB"[i % 2], "text": f"บรรทัดที่ {i} " * (i + 2)}
+            for i in range(lines)
+        ]
+        pipeline.save_session(session)
+        return session
+    return make
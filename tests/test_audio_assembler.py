@@ -0,0 +1,115 @@
+import wave
+
+from audio_assembler import assemble_episode
+
+
+def write_clip(path, frames, value, rate=8000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(int(value).to_bytes(2, "little", signed=True) * frames)
+    return str(path)
+
+
+def read_frames(path):
+    with wave.open(str(path), "rb") as w:
+        return w.getparams()[:3], w.readframes(w.getnframes())
+
+
+def build(tmp_path, specs, name, **kwargs):
+    clips = [write_clip(tmp_path / f"{name}_{i}.wav", frames, value) for i, (frames, value) in enumerate(specs)]
+    keys = [f"{frames}:{value}" for frames, value in specs]
+    out = tmp_path / "episode.wav"
+    return assemble_episode(clips, str(out), keys=keys, **kwargs), out
+
+
+def test_full_build_layout(tmp_path):
+    layout, out = build(tmp_path, [(800, 100), (400, 200)], "a", gap_ms=100)
+    assert layout["patched_from"] is None
+    assert [(s["offset"], s["frames"], s["gap_frames"]) for s in layout["segments"]] == [(0, 800, 800), (1600, 400, 800)]
+    params, data = read_frames(out)
+    assert params == (1, 2, 8000)
+    assert len(data) == 2800 * 2
+    # clip แล้วตามด้วยช่วงเงียบ
+    assert data[:1600] == (100).to_bytes(2, "little") * 800
+    assert data[1600:3200] == b"\x00" * 1600
+
+
+def test_mismatched_clip_is_converted(tmp_path):
+    # clip ที่ sample rate ไม่ตรงกับ clip แรกถูกแปลงผ่าน ffmpeg
+    clips = [write_clip(tmp_path / "a.wav", 800, 100), write_clip(tmp_path / "b.wav", 1600, 100, rate=16000)]
+    layout = assemble_episode(clips, str(tmp_path / "episode.wav"), gap_ms=0)
+    params, data = read_frames(tmp_path / "episode.wav")
+    assert params == (1, 2, 8000)
+    assert abs(layout["segments"][1]["frames"] - 800) <= 16
+    assert len(data) == layout["frames"] * 2
+
+
+def test_no_clips_writes_empty_wav(tmp_path):
+    layout = assemble_episode([], str(tmp_path / "episode.wav"))
+    assert layout["frames"] == 0
+    assert read_frames(tmp_path / "episode.wav")[1] == b""
+    assert not (tmp_path / "episode.wav.part").exists()
+
+
+def assert_same_as_full_build(tmp_path, layout, out, specs, **kwargs):
+    # ผลของการ patch ต้องเหมือนการเขียนใหม่ทั้งไฟล์ทุก byte
+    directory = tmp_path / f"full_{len(list(tmp_path.glob('full_*')))}"
+    directory.mkdir()
+    full_layout, full_out = build(directory, specs, "full", **kwargs)
+    assert read_frames(out) == read_frames(full_out)
+    assert [(s["key"], s["offset"], s["frames"], s["gap_frames"]) for s in layout["segments"]] == [
+        (s["key"], s["offset"], s["frames"], s["gap_frames"]) for s in full_layout["segments"]
+    ]
+    assert layout["frames"] == full_layout["frames"]
+
+
+def test_patch_same_length_matches_full_build(tmp_path):
+    first, out = build(tmp_path, [(800, 1), (800, 2), (800, 3)], "a")
+    specs = [(800, 1), (800, 9), (800, 3)]
+    layout, out = build(tmp_path, specs, "b", previous=first)
+    assert layout["patched_from"] == 1
+    assert_same_as_full_build(tmp_path, layout, out, specs)
+
+
+def test_patch_insert_and_delete_matches_full_build(tmp_path):
+    first, out = build(tmp_path, [(800, 1), (800, 2), (800, 3)], "a")
+    specs = [(800, 1), (1200, 7), (400, 8), (800, 3)]
+    layout, out = build(tmp_path, specs, "b", previous=first)
+    assert layout["patched_from"] is not None
+    assert_same_as_full_build(tmp_path, layout, out, specs)
+
+    specs = [(800, 1), (800, 3)]
+    layout, out = build(tmp_path, specs, "c", previous=layout)
+    assert_same_as_full_build(tmp_path, layout, out, specs)
+
+
+def test_previous_layout_for_other_format_is_rebuilt(tmp_path):
+    first, out = build(tmp_path, [(800, 1)], "a")
+    layout, out = build(tmp_path, [(800, 1)], "b", previous=dict(first, sample_rate=16000))
+    assert layout["patched_from"] is None
+
+
+def test_changed_gap_is_patched(tmp_path):
+    first, out = build(tmp_path, [(800, 1), (800, 2)], "a", gaps_ms=[100, 0])
+    specs = [(800, 1), (800, 2)]
+    layout, out = build(tmp_path, specs, "b", previous=first, gaps_ms=[300, 0])
+    assert layout["segments"][1]["offset"] == 800 + 2400
+    assert_same_as_full_build(tmp_path, layout, out, specs, gaps_ms=[300, 0])
+
+
+def test_sink_receives_whole_episode_when_patching(tmp_path):
+    class Sink:
+        def __init__(self):
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+    first, out = build(tmp_path, [(800, 1), (800, 2)], "a")
+    clips = [write_clip(tmp_path / f"b_{i}.wav", 800, v) for i, v in enumerate([1, 5])]
+    sink = Sink()
+    layout = assemble_episode(clips, str(out), keys=["800:1", "800:5"], previous=first, sink=sink, sink_params=(1, 2, 8000))
+    assert layout["patched_from"] is not None
+    assert sink.data == read_frames(out)[1]
@@ -0,0 +1,101 @@
+import math
+import wave
+
+import numpy as np
+
+from audio_processing import DEFAULT_SETTINGS, output_params, process_clip, process_clips
+
+RATE = 16000
+
+
+def write_wav(path, samples, rate=RATE, channels=1):
+    data = np.clip(np.round(np.asarray(samples) * 32767), -32768, 32767).astype("<i2")
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(data.tobytes())
+    return str(path)
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as w:
+        return np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").astype(np.float32) / 32768
+
+
+def tone(seconds, amplitude):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return amplitude * np.sin(2 * np.pi * 220 * t)
+
+
+def dbfs(samples):
+    return 20 * math.log10(float(np.sqrt(np.mean(np.square(samples)))))
+
+
+def test_trims_silence_and_normalizes_loudness(tmp_path):
+    src = write_wav(tmp_path / "src.wav", np.concatenate([np.zeros(RATE), tone(1, 0.05), np.zeros(RATE)]))
+    stats = process_clip(src, str(tmp_path / "out.wav"), (1, 2, RATE), -20)
+    out = read_wav(tmp_path / "out.wav")
+    pad = 2 * RATE * DEFAULT_SETTINGS["trim_pad_ms"] / 1000
+    assert RATE <= len(out) <= RATE + pad + RATE * DEFAULT_SETTINGS["window_ms"] / 1000 * 2
+    assert stats["frames"] == len(out)
+    assert stats["trimmed_frames"] == 3 * RATE - len(out)
+    voiced = out[int(pad):-int(pad)]
+    assert abs(dbfs(voiced) - -20) < 1
+    # fade: ขอบ clip เริ่มและจบที่ศูนย์
+    assert abs(out[0]) < 1e-3 and abs(out[-1]) < 1e-3
+
+
+def test_gain_is_capped(tmp_path):
+    # clip เบามาก: ขยายได้ไม่เกิน max_gain_db
+    src = write_wav(tmp_path / "src.wav", tone(1, 0.01))
+    stats = process_clip(src, str(tmp_path / "out.wav"), (1, 2, RATE), -20)
+    assert math.isclose(stats["gain_db"], DEFAULT_SETTINGS["max_gain_db"], abs_tol=0.01)
+
+
+def test_peak_is_limited(tmp_path):
+    src = write_wav(tmp_path / "src.wav", tone(1, 0.9))
+    process_clip(src, str(tmp_path / "out.wav"), (1, 2, RATE), 0)
+    peak = float(np.abs(read_wav(tmp_path / "out.wav")).max())
+    assert 20 * math.log10(peak) <= DEFAULT_SETTINGS["peak_dbfs"] + 0.01
+
+
+def test_silent_clip_becomes_empty(tmp_path):
+    src = write_wav(tmp_path / "src.wav", np.zeros(RATE))
+    stats = process_clip(src, str(tmp_path / "out.wav"), (1, 2, RATE), -20)
+    assert stats["frames"] == 0
+    assert len(read_wav(tmp_path / "out.wav")) == 0
+
+
+def test_output_params_follow_first_readable_clip(tmp_path):
+    broken = tmp_path / "broken.wav"
+    broken.write_bytes(b"not a wav")
+    clip = write_wav(tmp_path / "a.wav", np.zeros(10), rate=22050)
+    assert output_params([str(broken), clip]) == (1, 2, 22050)
+
+
+def test_process_clips_in_worker_processes(tmp_path):
+    jobs = [
+        (write_wav(tmp_path / f"src{i}.wav", tone(0.5, 0.1 * (i + 1))), str(tmp_path / f"out{i}.wav"), -20)
+        for i in range(3)
+    ]
+    stats = process_clips(jobs, (1, 2, RATE), workers=2)
+    assert [s["frames"] for s in stats] == [len(read_wav(dst)) for _, dst, _ in jobs]
+    assert all(abs(dbfs(read_wav(dst)) - -20) < 1.5 for _, dst, _ in jobs)
+
+
+def test_turn_gaps_and_processed_clips_in_step3(pipeline, make_session):
+    lines = [{"speaker": s} for s in "AABA"]
+    assert pipeline.turn_gaps_ms(lines) == [
+        pipeline.SAME_SPEAKER_GAP_MS, pipeline.LINE_GAP_MS, pipeline.LINE_GAP_MS, 0,
+    ]
+    session = make_session(3)
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    loaded = pipeline.load_session(session.session_id)
+    manifest = loaded.load_manifest()
+    assert [seg["clip"] for seg in manifest["segments"]] == [
+        f"{line['id']}.proc.wav" for line in loaded.script_lines
+    ]
+    rate = manifest["sample_rate"]
+    expected = [int(rate * ms / 1000) for ms in pipeline.turn_gaps_ms(loaded.script_lines)]
+    assert [seg["gap_frames"] for seg in manifest["segments"]] == expected
@@ -0,0 +1,90 @@
+import time
+import threading
+
+from batch import BatchRunner, StageLimits
+
+
+def wait_done(batch, timeout=5):
+    deadline = time.time() + timeout
+    while batch.finished_at is None and time.time() < deadline:
+        time.sleep(0.01)
+    return batch.to_dict()
+
+
+def test_stage_limits_cap_concurrency():
+    limits = StageLimits({"ffmpeg": 2})
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with limits.stage("ffmpeg"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    stats = limits.stats()["ffmpeg"]
+    assert (stats["runs"], stats["active"], stats["limit"]) == (6, 0, 2)
+
+
+def test_batch_runs_every_source_and_cleans_up():
+    cleaned = []
+
+    def step1(source, progress=None, stages=None):
+        with stages.stage("llm"):
+            if source == "bad":
+                raise ValueError("Invalid source path or URL")
+            return {"session_id": source}
+
+    runner = BatchRunner(step1, {"llm": 2}, max_in_flight=4)
+    status = wait_done(runner.submit(["a", "bad", "b"], cleanup=cleaned.append))
+    assert status["done"]
+    assert status["counts"] == {"succeeded": 2, "failed": 1}
+    assert [item["result"] for item in status["items"]] == [{"session_id": "a"}, None, {"session_id": "b"}]
+    assert status["items"][1]["error"] == "Invalid source path or URL"
+    assert sorted(cleaned) == ["a", "b", "bad"]
+    assert runner.stats()["stages"]["llm"]["runs"] == 3
+
+
+def test_cancel_stops_items_at_next_report():
+    release = threading.Event()
+
+    def step1(source, progress=None, stages=None):
+        release.wait(5)
+        progress("transcribe", 0.2)
+        return source
+
+    runner = BatchRunner(step1, {}, max_in_flight=2)
+    batch = runner.submit(["a", "b"])
+    batch.cancel()
+    release.set()
+    assert wait_done(batch)["counts"] == {"cancelled": 2}
+
+
+def test_finished_batches_are_pruned_after_retention():
+    runner = BatchRunner(lambda source, progress=None, stages=None: source, {}, retention=0)
+    batch = runner.submit(["a"])
+    wait_done(batch)
+    assert runner.get(batch.id) is batch
+    time.sleep(0.01)
+    runner.submit([])
+    assert runner.get(batch.id) is None
+
+
+def test_batch_endpoints(client, monkeypatch):
+    import main
+    monkeypatch.setattr(main.batch_runner, "fn", lambda source, progress=None, stages=None: {"source": source})
+    assert client.post("/batches", json={"youtube_urls": []}).status_code == 400
+    batch_id = client.post("/batches", json={"youtube_urls": ["https://youtu.be/a"]}).json()["batch_id"]
+    wait_done(main.batch_runner.get(batch_id))
+    status = client.get(f"/batches/{batch_id}").json()
+    assert status["counts"] == {"succeeded": 1}
+    assert "llm" in status["stages"]
+    assert client.get("/batches/missing").status_code == 404
@@ -0,0 +1,64 @@
+from dialogue_context import batch_lines, format_dialogue, split_recent_lines, truncate_to_tokens
+from llm_tokens import count_tokens
+
+
+def lines(n):
+    return [{"speaker": "AB"[i % 2], "text": f"บรรทัดที่ {i} " * 5} for i in range(n)]
+
+
+def test_split_recent_lines_respects_budget_and_minimum():
+    dialogue = lines(20)
+    budget = sum(count_tokens(format_dialogue([line])) for line in dialogue[-4:])
+    older, recent = split_recent_lines(dialogue, budget)
+    assert older + recent == dialogue
+    assert recent == dialogue[-4:]
+    older, recent = split_recent_lines(dialogue, 0, min_lines=2)
+    assert recent == dialogue[-2:]
+
+
+def test_batch_lines_and_truncate():
+    dialogue = lines(10)
+    budget = sum(count_tokens(format_dialogue([line])) for line in dialogue[:3])
+    batches = list(batch_lines(dialogue, budget))
+    assert sum(batches, []) == dialogue
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    text = format_dialogue(dialogue)
+    assert truncate_to_tokens(text, 10_000) == text
+    assert count_tokens(truncate_to_tokens(text, 20)) <= 22
+
+
+def prompt_tokens(call):
+    return sum(count_tokens(m["content"]) for m in call["messages"])
+
+
+def step2_prompt(pipeline, session_id):
+    pipeline.openai_client.calls.clear()
+    pipeline.step2_continue_conversation(session_id, "คำถามต่อ")
+    return [call for call in pipeline.openai_client.calls if call["stream"]][-1]
+
+
+def test_step2_prompt_stays_within_context_budget(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "STEP2_CONTEXT_TOKENS", 600)
+    monkeypatch.setattr(pipeline, "STEP2_SUMMARY_TOKENS", 200)
+    monkeypatch.setattr(pipeline, "STEP2_DIGEST_TOKENS", 50)
+    # baseline: template ของ prompt เมื่อ summary สั้นและยังไม่มีบทสนทนา
+    empty = pipeline.PipelineSession.create()
+    empty.summary = "สรุป"
+    pipeline.save_session(empty)
+    overhead = prompt_tokens(step2_prompt(pipeline, empty.session_id))
+
+    session = pipeline.PipelineSession(
+        pipeline.PipelineSession.create().session_id, lines(80), summary="เนื้อหาสรุปยาวมาก " * 500,
+    )
+    pipeline.save_session(session)
+    first = step2_prompt(pipeline, session.session_id)
+    assert prompt_tokens(first) <= overhead + 600
+    loaded = pipeline.load_session(session.session_id)
+    assert loaded.digest and loaded.digest_upto > 0
+    # บรรทัดที่ย่อเข้า digest แล้วไม่อยู่ใน prompt
+    assert "บรรทัดที่ 0 " not in first["messages"][-1]["content"]
+
+    # บทสนทนายาวขึ้นเรื่อย ๆ แต่ prompt ไม่โตตาม
+    for _ in range(3):
+        later = step2_prompt(pipeline, session.session_id)
+        assert prompt_tokens(later) <= overhead + 600
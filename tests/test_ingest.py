@@ -0,0 +1,71 @@
+import os
+import wave
+import hashlib
+import subprocess
+
+import pytest
+
+from ingest import SAMPLE_RATE, UploadTooLarge, tee_pcm_to_wav, transcode_stream_to_wav, write_pcm_to_wav
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as w:
+        return (w.getnchannels(), w.getsampwidth(), w.getframerate()), w.readframes(w.getnframes())
+
+
+def test_write_pcm_to_wav(tmp_path):
+    pcm = [b"\x01\x00" * 100, b"\x02\x00" * 50]
+    path = write_pcm_to_wav(iter(pcm), str(tmp_path / "a.wav"))
+    assert read_wav(path) == ((1, 2, SAMPLE_RATE), b"".join(pcm))
+    assert os.listdir(tmp_path) == ["a.wav"]
+
+
+def test_concurrent_tees_to_same_path_do_not_mix(tmp_path):
+    # step1 ของ URL เดียวกันสองตัวพร้อมกัน: ไฟล์สุดท้ายต้องเป็นของตัวใดตัวหนึ่งครบทั้งไฟล์
+    path = str(tmp_path / "same.wav")
+    first = tee_pcm_to_wav(iter([b"\x01\x00" * 100] * 3), path)
+    second = tee_pcm_to_wav(iter([b"\x02\x00" * 100] * 3), path)
+    for a, b in zip(first, second):
+        pass
+    for gen in (first, second):
+        for _ in gen:
+            pass
+    _, data = read_wav(path)
+    assert data in (b"\x01\x00" * 300, b"\x02\x00" * 300)
+    assert os.listdir(tmp_path) == ["same.wav"]
+
+
+def test_failed_stream_leaves_no_file(tmp_path):
+    def chunks():
+        yield b"\x01\x00" * 10
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        write_pcm_to_wav(chunks(), str(tmp_path / "a.wav"))
+    assert os.listdir(tmp_path) == []
+
+
+def make_source(tmp_path):
+    path = tmp_path / "source.wav"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=1",
+                    "-ar", "44100", str(path)], check=True)
+    return path.read_bytes()
+
+
+def test_transcode_stream_returns_digest(tmp_path):
+    source = make_source(tmp_path)
+    out = tmp_path / "out.wav"
+    digest = transcode_stream_to_wav((source[i:i + 4096] for i in range(0, len(source), 4096)), str(out))
+    assert digest == hashlib.sha256(source).hexdigest()
+    params, data = read_wav(out)
+    assert params == (1, 2, SAMPLE_RATE)
+    assert abs(len(data) / 2 - SAMPLE_RATE) < SAMPLE_RATE * 0.05
+
+
+def test_transcode_stream_enforces_size_limit(tmp_path):
+    source = make_source(tmp_path)
+    out = tmp_path / "out.wav"
+    with pytest.raises(UploadTooLarge):
+        transcode_stream_to_wav((source[i:i + 4096] for i in range(0, len(source), 4096)), str(out), max_bytes=8192)
+    assert not out.exists()
+    assert sorted(os.listdir(tmp_path)) == ["source.wav"]
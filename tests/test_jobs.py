@@ -0,0 +1,114 @@
+import time
+import threading
+
+import pytest
+
+from jobs import JobManager, QueueFull
+
+
+def wait(job, timeout=5):
+    job._future.result(timeout=timeout)
+    return job
+
+
+def test_job_reports_progress_and_result():
+    manager = JobManager(max_workers=1)
+
+    def work(x, progress):
+        progress("half", 0.5, note="hi")
+        return x * 2
+
+    job = wait(manager.submit("demo", work, 21))
+    assert (job.status, job.result, job.progress, job.stage) == ("succeeded", 42, 1.0, "half")
+    assert job.info == {"note": "hi"}
+    assert manager.get(job.id) is job
+
+
+def test_job_failure_is_recorded():
+    manager = JobManager(max_workers=1)
+
+    def work(progress):
+        raise ValueError("bad input")
+
+    job = wait(manager.submit("demo", work))
+    assert (job.status, job.error) == ("failed", "bad input")
+
+
+def test_cancel_running_job_stops_at_next_report():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def work(progress):
+        started.set()
+        release.wait(5)
+        progress("next")
+        return "not reached"
+
+    job = manager.submit("demo", work)
+    started.wait(5)
+    manager.cancel(job.id)
+    release.set()
+    assert wait(job).status == "cancelled"
+
+
+def test_queue_limit_and_cancel_queued():
+    manager = JobManager(max_workers=1, max_queued=1)
+    started, release = threading.Event(), threading.Event()
+    running = manager.submit("demo", lambda progress: started.set() or release.wait(5))
+    started.wait(5)
+    queued = manager.submit("demo", lambda progress: None)
+    with pytest.raises(QueueFull):
+        manager.submit("demo", lambda progress: None)
+    assert manager.cancel(queued.id).status == "cancelled"
+    release.set()
+    wait(running)
+    assert manager.stats()["jobs"] == {"succeeded": 1, "cancelled": 1}
+
+
+def poll(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("succeeded", "failed", "cancelled"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_step3_job_endpoints(client, make_session):
+    session = make_session(3)
+    response = client.post("/jobs/step3", json={"session_id": session.session_id})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert poll(client, job_id)["status"] == "succeeded"
+    result = client.get(f"/jobs/{job_id}/result").json()
+    assert result["session_id"] == session.session_id
+    assert client.get(result["audio_path"]).status_code == 200
+
+
+def test_failed_job_result_is_500(client):
+    job_id = client.post("/jobs/step3", json={"session_id": "missing"}).json()["job_id"]
+    status = poll(client, job_id)
+    assert (status["status"], status["error"]) == ("failed", "Session not found")
+    response = client.get(f"/jobs/{job_id}/result")
+    assert (response.status_code, response.json()["detail"]) == (500, "Session not found")
+
+
+def test_unfinished_and_unknown_jobs(client, monkeypatch):
+    import main
+    started, release = threading.Event(), threading.Event()
+
+    def slow(session_id, progressive=False, progress=None):
+        started.set()
+        release.wait(5)
+        progress("tts")
+
+    monkeypatch.setattr(main, "run_step3_job", slow)
+    job_id = client.post("/jobs/step3", json={"session_id": "x"}).json()["job_id"]
+    started.wait(5)
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+    assert client.delete(f"/jobs/{job_id}").status_code == 200
+    release.set()
+    assert poll(client, job_id)["status"] == "cancelled"
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.delete("/jobs/nope").status_code == 404
@@ -0,0 +1,63 @@
+import os
+import time
+
+from json_cache import JsonCache, make_key
+
+
+def test_make_key_is_stable():
+    assert make_key("a", {"x": 1, "y": 2}) == make_key("a", {"y": 2, "x": 1})
+    assert make_key("a", 1) != make_key("a", "1")
+
+
+def test_roundtrip_and_stats(tmp_path):
+    cache = JsonCache(str(tmp_path), max_bytes=10_000)
+    assert cache.get("k1") is None
+    cache.set("k1", {"text": "สวัสดี"})
+    assert cache.get("k1") == {"text": "สวัสดี"}
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["bytes"] == os.path.getsize(cache.path_for("k1"))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = JsonCache(str(tmp_path), max_bytes=10_000)
+    cache.set("a1", "x" * 100)
+    # จุได้สองรายการ (ขนาดต่างกันได้ไม่กี่ byte ตามความยาวของ created_at) แต่ไม่ถึงสาม
+    cache.max_bytes = cache.stats()["bytes"] * 2 + 20
+    cache.set("b1", "x" * 100)
+    cache.get("a1")
+    cache.set("c1", "x" * 100)
+    assert cache.get("b1") is None
+    assert cache.get("a1") == "x" * 100
+    assert cache.get("c1") == "x" * 100
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expires(tmp_path, monkeypatch):
+    cache = JsonCache(str(tmp_path), max_bytes=10_000, ttl=60)
+    cache.set("k1", 1)
+    now = time.time()
+    monkeypatch.setattr("json_cache.time.time", lambda: now + 61)
+    assert cache.get("k1") is None
+    assert cache.stats()["expirations"] == 1
+    assert not os.path.exists(cache.path_for("k1"))
+
+
+def test_drops_corrupt_entry(tmp_path):
+    cache = JsonCache(str(tmp_path), max_bytes=10_000)
+    cache.set("k1", 1)
+    with open(cache.path_for("k1"), "w") as f:
+        f.write("{not json")
+    assert cache.get("k1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_index_survives_restart(tmp_path):
+    cache = JsonCache(str(tmp_path), max_bytes=10_000)
+    cache.set("k1", 1)
+    cache.set("k2", 2)
+    reopened = JsonCache(str(tmp_path), max_bytes=10_000)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get("k2") == 2
+
+
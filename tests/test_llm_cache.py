@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from json_cache import JsonCache
+from llm_cache import ChatCompletionCache
+
+
+class FakeCompletions:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.calls = 0
+
+    def create(self, model, messages, stream=False, **params):
+        self.calls += 1
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))], usage=None)
+                         for d in self.deltas])
+        message = SimpleNamespace(content="".join(self.deltas))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_cache(tmp_path, deltas=("A: หนึ่ง\n", "B: สอง\n"), **kwargs):
+    completions = FakeCompletions(list(deltas))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return ChatCompletionCache(lambda: client, JsonCache(str(tmp_path), 100_000), **kwargs), completions
+
+
+MESSAGES = [{"role": "user", "content": "สรุป"}]
+
+
+def test_complete_is_cached_by_model_messages_and_params(tmp_path):
+    cache, completions = make_cache(tmp_path)
+    assert cache.complete("m", MESSAGES, max_tokens=10) == "A: หนึ่ง\nB: สอง\n"
+    assert cache.complete("m", MESSAGES, max_tokens=10) == "A: หนึ่ง\nB: สอง\n"
+    assert completions.calls == 1
+    cache.complete("m", MESSAGES, max_tokens=20)
+    cache.complete("other", MESSAGES, max_tokens=10)
+    assert completions.calls == 3
+
+
+def test_bypass_and_disabled_do_not_touch_cache(tmp_path):
+    cache, completions = make_cache(tmp_path)
+    cache.complete("m", MESSAGES, bypass=True)
+    cache.complete("m", MESSAGES)
+    assert completions.calls == 2
+    disabled, completions = make_cache(tmp_path / "off", enabled=False)
+    disabled.complete("m", MESSAGES)
+    disabled.complete("m", MESSAGES)
+    assert completions.calls == 2
+    assert disabled.stats()["bypassed"] == 2
+    assert disabled.stats()["entries"] == 0
+
+
+def test_stream_hit_returns_whole_reply_in_one_delta(tmp_path):
+    cache, completions = make_cache(tmp_path)
+    assert list(cache.stream("m", MESSAGES)) == ["A: หนึ่ง\n", "B: สอง\n"]
+    assert list(cache.stream("m", MESSAGES)) == ["A: หนึ่ง\nB: สอง\n"]
+    assert completions.calls == 1
+
+
+def test_stream_stopped_midway_is_not_cached(tmp_path):
+    cache, completions = make_cache(tmp_path)
+    stream = cache.stream("m", MESSAGES)
+    next(stream)
+    stream.close()
+    assert list(cache.stream("m", MESSAGES)) == ["A: หนึ่ง\n", "B: สอง\n"]
+    assert completions.calls == 2
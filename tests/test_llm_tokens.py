@@ -0,0 +1,37 @@
+from llm_tokens import batch_texts, count_tokens, split_into_windows
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("สวัสดีครับ") > 0
+    assert count_tokens("a b c " * 100) > count_tokens("a b c")
+
+
+def test_short_text_is_one_window():
+    assert split_into_windows("สั้น ๆ", 100) == ["สั้น ๆ"]
+
+
+def test_windows_fit_budget_and_cover_text():
+    words = [f"word{i}" for i in range(2000)]
+    text = " ".join(words)
+    windows = split_into_windows(text, 200, overlap_tokens=20)
+    assert len(windows) > 1
+    assert all(count_tokens(w) <= 200 * 1.1 for w in windows)
+    # ไม่ตัดกลางคำ และไม่มีคำหาย
+    covered = set(" ".join(windows).split())
+    assert covered == set(words)
+    # ช่วงติดกันซ้อนกัน
+    assert windows[0].split()[-1] in windows[1].split()
+
+
+def test_batch_texts_packs_to_budget():
+    texts = ["ก " * 50] * 7
+    cost = count_tokens(texts[0] + "\n\n")
+    batches = list(batch_texts(texts, cost * 3))
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert sum(batches, []) == texts
+
+
+def test_batch_texts_keeps_oversized_text_alone():
+    texts = ["short", "long " * 500, "short"]
+    assert [len(b) for b in batch_texts(texts, 50)] == [1, 1, 1]
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    counter = registry.register(Counter("c_total", "help", ["stage"]))
+    gauge = registry.register(Gauge("g", "help", ["status"]))
+    counter.inc(stage="tts")
+    counter.inc(2, stage='a"b')
+    gauge.set(5, status="queued")
+    gauge.dec(status="queued")
+    lines = registry.render().splitlines()
+    assert "# TYPE c_total counter" in lines
+    assert 'c_total{stage="tts"} 1' in lines
+    assert 'c_total{stage="a\\"b"} 2' in lines
+    assert 'g{status="queued"} 4' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h_seconds", "help", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    lines = histogram.render()
+    assert 'h_seconds_bucket{le="0.1"} 1' in lines
+    assert 'h_seconds_bucket{le="1"} 2' in lines
+    assert 'h_seconds_bucket{le="+Inf"} 3' in lines
+    assert "h_seconds_count 3" in lines
+    assert "h_seconds_sum 5.55" in lines
+
+
+def test_collectors_run_before_render():
+    registry = Registry()
+    gauge = registry.register(Gauge("jobs", "help"))
+    registry.add_collector(lambda: gauge.set(7))
+    assert "jobs 7" in registry.render().splitlines()
+
+
+def test_timed_records_spans_in_current_trace():
+    with metrics.trace("s-metrics", "step3") as current:
+        with metrics.timed("tts", lines=2) as span:
+            span["bytes"] = 10
+        with pytest.raises(ValueError):
+            with metrics.timed("assemble"):
+                raise ValueError("boom")
+    result = metrics.last_trace("s-metrics", "step3")
+    assert result["seconds"] is not None and current.seconds == result["seconds"]
+    tts, assemble = result["spans"]
+    assert (tts["stage"], tts["lines"], tts["bytes"]) == ("tts", 2, 10)
+    assert assemble["error"] is True
+    assert set(result["stages"]) == {"tts", "assemble"}
+
+
+def worker_stage():
+    with metrics.timed("worker"):
+        pass
+
+
+def test_trace_is_not_shared_with_other_threads():
+    with metrics.trace("s-threads", "step1"):
+        thread = threading.Thread(target=worker_stage)
+        thread.start()
+        thread.join()
+    assert metrics.last_trace("s-threads", "step1")["spans"] == []
+
+
+def test_traced_generator_keeps_trace_across_next_calls():
+    current = metrics.Trace("s-gen", "step2")
+
+    def lines():
+        with metrics.timed("script"):
+            yield 1
+            yield 2
+
+    assert list(metrics.traced(current, lines())) == [1, 2]
+    assert [span["stage"] for span in current.spans] == ["script"]
+
+
+def test_metrics_endpoint(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE podcast_stage_seconds histogram" in response.text
+    assert "podcast_jobs" in response.text
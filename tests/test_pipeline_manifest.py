@@ -0,0 +1,49 @@
+import os
+import uuid
+
+
+def record_tts(pipeline, monkeypatch):
+    sent = []
+    synthesize_all = pipeline.tts_dispatcher.synthesize_all
+
+    def recording(items, on_done=None):
+        sent.extend(text for _, text, _, _ in items)
+        return synthesize_all(items, on_done)
+
+    monkeypatch.setattr(pipeline.tts_dispatcher, "synthesize_all", recording)
+    return sent
+
+
+def test_step3_only_synthesizes_changed_lines(pipeline, make_session, monkeypatch):
+    session = make_session(4)
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    sent = record_tts(pipeline, monkeypatch)
+
+    # ไม่มีอะไรเปลี่ยน: ไม่ส่ง TTS เลย และไฟล์ตอนไม่ต้องต่อใหม่
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    assert sent == []
+    manifest = pipeline.load_session(session.session_id).load_manifest()
+    assert manifest["complete"]
+    assert manifest["patched_from"] == len(manifest["segments"])
+
+    line_id = session.script_lines[1]["id"]
+    text = f"แก้แล้ว {uuid.uuid4().hex}"
+    pipeline.update_script_line(session.session_id, line_id, text=text)
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    assert sent == [text]
+    loaded = pipeline.load_session(session.session_id)
+    manifest = loaded.load_manifest()
+    assert manifest["patched_from"] == 1
+    segment = manifest["segments"][1]
+    assert (segment["line_id"], segment["hash"]) == (line_id, pipeline.line_content_hash(loaded.script_lines[1]))
+
+
+def test_deleted_line_clip_is_removed(pipeline, make_session):
+    session = make_session(3)
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    removed = session.script_lines[0]["id"]
+    pipeline.delete_script_line(session.session_id, removed)
+    pipeline.step3_finalize_and_generate_audio(session.session_id)
+    loaded = pipeline.load_session(session.session_id)
+    assert removed not in [seg["line_id"] for seg in loaded.load_manifest()["segments"]]
+    assert not any(name.startswith(removed) for name in os.listdir(loaded.audio_line_dir))
@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_parallel_sessions_do_not_mix(pipeline, make_session):
+    # step2 ของสอง session พร้อมกันต้องต่อบรรทัดเข้าแต่ละ session ของตัวเองเท่านั้น
+    sessions = [make_session(2), make_session(2)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(
+            lambda args: pipeline.step2_continue_conversation(*args),
+            [(s.session_id, f"คำถาม {i}") for i in range(3) for s in sessions],
+        ))
+    for session in sessions:
+        loaded = pipeline.load_session(session.session_id)
+        assert len(loaded.script_lines) == 2 + 3 * 2
+        assert [line["id"] for line in loaded.script_lines[:2]] == [line["id"] for line in session.script_lines]
+    ids = [{line["id"] for line in pipeline.load_session(s.session_id).script_lines} for s in sessions]
+    assert not ids[0] & ids[1]
+
+
+def test_step3_keeps_clips_per_session(pipeline, make_session):
+    first, second = make_session(2), make_session(3)
+    with ThreadPoolExecutor(2) as pool:
+        paths = list(pool.map(pipeline.step3_finalize_and_generate_audio, [first.session_id, second.session_id]))
+    assert paths[0] != paths[1]
+    for session in (first, second):
+        loaded = pipeline.load_session(session.session_id)
+        segments = loaded.load_manifest()["segments"]
+        assert [seg["line_id"] for seg in segments] == [line["id"] for line in loaded.script_lines]
+
+
+def test_session_lock_is_dropped_after_use(pipeline):
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pipeline.session_lock("s1"):
+            started.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    started.wait()
+    assert "s1" in pipeline._session_locks
+    release.set()
+    thread.join()
+    assert "s1" not in pipeline._session_locks
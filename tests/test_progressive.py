@@ -0,0 +1,113 @@
+import math
+import shutil
+import wave
+
+import pytest
+
+from progressive import HLSPublisher
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+def write_clip(path, seconds, rate=8000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x10\x00" * int(seconds * rate))
+    return str(path)
+
+
+def playlist(publisher):
+    with open(publisher.playlist_path) as f:
+        lines = f.read().splitlines()
+    durations = [float(line[8:-1]) for line in lines if line.startswith("#EXTINF:")]
+    target = int(next(line for line in lines if line.startswith("#EXT-X-TARGETDURATION:")).split(":")[1])
+    return lines, durations, target
+
+
+def test_segments_never_exceed_fixed_target_duration(tmp_path):
+    clips = [write_clip(tmp_path / f"c{i}.wav", s) for i, s in enumerate([2, 23, 1])]
+    publisher = HLSPublisher(str(tmp_path / "hls"), len(clips), gaps_ms=[500, 200, 0], target_duration=10)
+    assert playlist(publisher)[2] == 10
+    # เสร็จไม่เรียงลำดับ แต่เผยแพร่ตามลำดับ script
+    for index in [2, 0, 1]:
+        publisher.clip_ready(index, clips[index])
+    assert publisher.finish() == 3
+    lines, durations, target = playlist(publisher)
+    assert target == 10
+    assert lines[-1] == "#EXT-X-ENDLIST"
+    assert all(round(d) <= target for d in durations)
+    assert len(durations) == 5
+    # ความยาวรวมเท่ากับเสียงบวกช่วงเงียบ (เผื่อ priming และ frame สุดท้ายที่ไม่เต็มของ AAC ต่อ clip)
+    assert math.isclose(sum(durations), 2 + 0.5 + 23 + 0.2 + 1, abs_tol=0.3 * len(clips))
+
+
+def test_prepare_is_applied_in_order(tmp_path):
+    raw = [write_clip(tmp_path / f"raw{i}.wav", 1) for i in range(2)]
+    processed = [write_clip(tmp_path / f"processed{i}.wav", 3) for i in range(2)]
+    calls = []
+
+    def prepare(index, path):
+        calls.append((index, path))
+        return processed[index]
+
+    publisher = HLSPublisher(str(tmp_path / "hls"), 2, gap_ms=0, prepare=prepare)
+    publisher.clip_ready(1, raw[1])
+    publisher.clip_ready(0, raw[0])
+    publisher.finish()
+    assert calls == [(0, raw[0]), (1, raw[1])]
+    assert math.isclose(sum(playlist(publisher)[1]), 6, abs_tol=0.6)
+
+
+def test_failed_clip_stops_publishing(tmp_path):
+    clips = [write_clip(tmp_path / f"c{i}.wav", 1) for i in range(3)]
+    publisher = HLSPublisher(str(tmp_path / "hls"), 3, gap_ms=0)
+    publisher.clip_ready(0, clips[0])
+    publisher.clip_failed(1)
+    publisher.clip_ready(2, clips[2])
+    assert publisher.finish() == 1
+    lines, durations, _ = playlist(publisher)
+    assert len(durations) == 1
+    assert "#EXT-X-ENDLIST" not in lines
+
+
+def test_failed_prepare_stops_publishing(tmp_path):
+    clips = [write_clip(tmp_path / f"c{i}.wav", 1) for i in range(3)]
+
+    def prepare(index, path):
+        if index == 1:
+            raise RuntimeError("ffmpeg failed to decode")
+        return path
+
+    publisher = HLSPublisher(str(tmp_path / "hls"), 3, gap_ms=0, prepare=prepare)
+    for index, clip in enumerate(clips):
+        publisher.clip_ready(index, clip)
+    assert publisher.finish() == 1
+    assert publisher.failed == 1
+    lines, durations, _ = playlist(publisher)
+    assert len(durations) == 1
+    assert "#EXT-X-ENDLIST" not in lines
+
+
+def test_progressive_step3_job_publishes_playlist(client, make_session):
+    import time
+    session = make_session(3)
+    job_id = client.post("/jobs/step3", json={"session_id": session.session_id, "progressive": True}).json()["job_id"]
+    for _ in range(600):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "succeeded"
+    playlist_response = client.get(status["playlist_url"])
+    assert playlist_response.status_code == 200
+    assert playlist_response.text.rstrip().endswith("#EXT-X-ENDLIST")
+
+
+def test_sync_step3_rejects_progressive(client, make_session):
+    session = make_session(1)
+    response = client.post("/step3", json={"session_id": session.session_id, "progressive": True})
+    assert response.status_code == 422
+    response = client.post("/jobs/video", json={"session_id": session.session_id, "progressive": True})
+    assert response.status_code == 422
@@ -0,0 +1,95 @@
+import os
+import wave
+
+import pytest
+
+import renditions
+from renditions import RenditionEncoder, rendition_path
+
+
+def pcm(seconds, rate=16000):
+    return b"\x10\x00" * int(seconds * rate)
+
+
+def test_encoder_writes_every_format(tmp_path):
+    wav_path = str(tmp_path / "episode.wav")
+    encoder = RenditionEncoder(wav_path, ["mp3", "opus", "aac"], (1, 2, 16000))
+    for _ in range(4):
+        encoder.write(pcm(0.25))
+    paths = encoder.close()
+    assert paths == {fmt: rendition_path(wav_path, fmt) for fmt in ("mp3", "opus", "aac")}
+    assert all(os.path.getsize(path) > 0 for path in paths.values())
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_failed_format_raises_and_leaves_no_parts(tmp_path, monkeypatch):
+    monkeypatch.setitem(renditions.FORMATS["opus"], "codec", "libdoesnotexist")
+    encoder = RenditionEncoder(str(tmp_path / "episode.wav"), ["mp3", "opus"], (1, 2, 16000))
+    encoder.write(pcm(0.5))
+    with pytest.raises(RuntimeError, match="opus"):
+        encoder.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_abort_removes_parts(tmp_path):
+    encoder = RenditionEncoder(str(tmp_path / "episode.wav"), ["mp3"], (1, 2, 16000))
+    encoder.write(pcm(0.5))
+    encoder.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_step3_serves_wav_when_encoding_fails(client, pipeline, make_session, monkeypatch):
+    session = make_session(2)
+    first = client.post("/step3", json={"session_id": session.session_id}).json()
+    assert set(first["renditions"]) == set(pipeline.OUTPUT_FORMATS) | {"wav"}
+
+    # เช่น ffmpeg ที่ไม่มี libopus: step3 ยังสำเร็จ ส่ง WAV และไม่เหลือ rendition ของเสียงเดิม
+    monkeypatch.setitem(renditions.FORMATS["opus"], "codec", "libdoesnotexist")
+    pipeline.update_script_line(session.session_id, session.script_lines[0]["id"], text="แก้บรรทัดแรก")
+    response = client.post("/step3", json={"session_id": session.session_id})
+    assert response.status_code == 200
+    body = response.json()
+    assert list(body["renditions"]) == ["wav"]
+    assert body["audio_path"].startswith(f"/media/podcast_final_{session.session_id}.wav?v=")
+    manifest = pipeline.load_session(session.session_id).load_manifest()
+    assert manifest["complete"] and manifest["renditions"] is None
+
+    # encode ได้อีกครั้ง: step3 ถัดไป encode ใหม่แม้เสียงไม่เปลี่ยน
+    monkeypatch.undo()
+    body = client.post("/step3", json={"session_id": session.session_id}).json()
+    assert set(body["renditions"]) == set(pipeline.OUTPUT_FORMATS) | {"wav"}
+
+
+def media_path(client, pipeline, make_session):
+    session = make_session(1)
+    body = client.post("/step3", json={"session_id": session.session_id}).json()
+    return body["renditions"]["wav"]["url"]
+
+
+def test_media_range_etag_and_cache_control(client, pipeline, make_session):
+    url = media_path(client, pipeline, make_session)
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.headers["cache-control"].endswith("immutable")
+    with wave.open(os.path.join(pipeline.DOWNLOAD_DIR, url.split("?")[0][len("/media/"):]), "rb") as w:
+        assert w.getnframes() > 0
+
+    partial = client.get(url, headers={"Range": "bytes=0-43"})
+    assert partial.status_code == 206
+    assert partial.content == full.content[:44]
+    assert partial.headers["content-range"] == f"bytes 0-43/{len(full.content)}"
+
+    etag = full.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": full.headers["last-modified"]}).status_code == 304
+
+    # ไม่มี v หรือ v เก่า: ถูก cache ได้แต่ต้องถามใหม่ทุกครั้ง
+    stale = client.get(url.split("?")[0] + "?v=old")
+    assert stale.headers["cache-control"] == "no-cache"
+
+
+def test_media_rejects_paths_outside_download_dir(client):
+    assert client.get("/media/../sessions.db").status_code == 404
+    assert client.get("/media/%2e%2e/sessions.db").status_code == 404
+    assert client.get("/media/missing.wav").status_code == 404
+    assert client.get("/media/storage_index.json").status_code == 404
@@ -0,0 +1,52 @@
+from script_stream import (
+    SCRIPT_MARKER,
+    SUGGESTIONS_MARKER,
+    ScriptLineParser,
+    parse_script_line,
+    split_script_and_suggestions,
+)
+
+
+def test_parse_script_line():
+    line = parse_script_line("A:  สวัสดีครับ ")
+    assert (line["speaker"], line["text"]) == ("A", "สวัสดีครับ")
+    assert len(line["id"]) == 12
+    assert parse_script_line("B:ค่ะ")["speaker"] == "B"
+    assert parse_script_line("C: ไม่ใช่บทพูด") is None
+    assert parse_script_line("") is None
+
+
+def test_lines_are_emitted_as_soon_as_they_end():
+    parser = ScriptLineParser()
+    assert parser.feed("A: สวัส") == []
+    lines = parser.feed("ดีครับ\nB: หวัด")
+    assert [(l["speaker"], l["text"]) for l in lines] == [("A", "สวัสดีครับ")]
+    assert parser.feed("ดีค่ะ") == []
+    assert [(l["speaker"], l["text"]) for l in parser.close()] == [("B", "หวัดดีค่ะ")]
+    assert parser.text == "A: สวัสดีครับ\nB: หวัดดีค่ะ"
+
+
+def test_delta_split_inside_newline_run():
+    parser = ScriptLineParser()
+    lines = []
+    for ch in "A: หนึ่ง\n\nB: สอง\n":
+        lines += parser.feed(ch)
+    lines += parser.close()
+    assert [l["text"] for l in lines] == ["หนึ่ง", "สอง"]
+
+
+def test_lines_after_suggestions_marker_are_ignored():
+    parser = ScriptLineParser()
+    lines = parser.feed(f"{SCRIPT_MARKER}\nA: บทพูด\n{SUGGESTIONS_MARKER}\nA: คำถามที่ 1\n")
+    lines += parser.close()
+    assert [l["text"] for l in lines] == ["บทพูด"]
+    assert parser.in_suggestions
+
+
+def test_split_script_and_suggestions():
+    script, suggestions = split_script_and_suggestions(
+        f"intro\n{SCRIPT_MARKER}\nA: x\nB: y\n{SUGGESTIONS_MARKER}\n1. q"
+    )
+    assert script == "A: x\nB: y"
+    assert suggestions == "1. q"
+    assert split_script_and_suggestions("A: x") == ("A: x", "")
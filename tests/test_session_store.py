@@ -0,0 +1,200 @@
+import json
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+from session_store import (
+    SQLiteSessionBackend,
+    SessionStore,
+    SupabaseSessionBackend,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def line(i, text=None):
+    return {"id": f"line{i:04d}", "speaker": "AB"[i % 2], "text": text or f"บรรทัด {i}"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+
+
+def test_save_and_load(store):
+    store.save("s1", [line(0), line(1)], suggested_questions="q", summary="sum")
+    loaded = SessionStore(store.backend).load("s1")
+    assert loaded["script_lines"] == [line(0), line(1)]
+    assert loaded["suggested_questions"] == "q"
+    assert loaded["summary"] == "sum"
+    assert loaded["line_count"] == 2
+    assert store.load("missing") is None
+
+
+def test_save_writes_only_changed_tail(store):
+    store.save("s1", [line(0), line(1)])
+    writes = []
+    write = store.backend.write
+    store.backend.write = lambda session_id, start, lines, fields: writes.append((start, len(lines))) or write(
+        session_id, start, lines, fields
+    )
+    store.save("s1", [line(0), line(1), line(2)])
+    store.save("s1", [line(0), line(1, "แก้"), line(2)])
+    assert writes == [(2, 1), (1, 2)]
+    assert SessionStore(store.backend).load("s1")["script_lines"][1]["text"] == "แก้"
+
+
+def test_load_tail(store):
+    store.save("s1", [line(i) for i in range(5)])
+    loaded = SessionStore(store.backend, cache_size=0).load("s1", tail=2)
+    assert loaded["line_offset"] == 3
+    assert [l["id"] for l in loaded["script_lines"]] == ["line0003", "line0004"]
+
+
+class FakeSupabase:
+    """client ของ Supabase แบบ in-memory เฉพาะ query ที่ SupabaseSessionBackend ใช้"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return FakeTable(self.tables.setdefault(name, []))
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.action = ("select", None)
+
+    def select(self, columns):
+        self.action = ("select", columns.split(","))
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) < value)
+        return self
+
+    def order(self, column, desc=False):
+        self.rows.sort(key=lambda row: row[column], reverse=desc)
+        return self
+
+    def delete(self):
+        self.action = ("delete", None)
+        return self
+
+    def insert(self, rows):
+        self.action = ("insert", rows)
+        return self
+
+    def upsert(self, row, on_conflict):
+        self.action = ("upsert", (row, on_conflict))
+        return self
+
+    def execute(self):
+        kind, arg = self.action
+        matched = [row for row in self.rows if all(f(row) for f in self.filters)]
+        if kind == "delete":
+            self.rows[:] = [row for row in self.rows if row not in matched]
+            data = matched
+        elif kind == "insert":
+            self.rows.extend(arg)
+            data = arg
+        elif kind == "upsert":
+            row, key = arg
+            existing = next((r for r in self.rows if r[key] == row[key]), None)
+            if existing is None:
+                self.rows.append(dict(row))
+            else:
+                existing.update(row)
+            data = [dict(existing or row)]
+        else:
+            data = [{k: row.get(k) for k in arg} for row in matched]
+        return SimpleNamespace(data=data)
+
+
+def test_supabase_legacy_blob_is_migrated_with_line_ids():
+    # row ก่อนมี podcast_script_lines: script เป็น blob และบรรทัดไม่มี id
+    legacy = [{"speaker": "A", "text": "สวัสดี"}, {"speaker": "B", "text": "ครับ", "id": "kept"}]
+    tables = {"podcast_scripts": [{
+        "session_id": "s1", "timestamp": "2025-01-01T00:00:00", "suggested_questions": "q",
+        "script": json.dumps(legacy, ensure_ascii=False), "line_count": None,
+    }]}
+    store = SessionStore(SupabaseSessionBackend(lambda: FakeSupabase(tables)))
+    loaded = store.load("s1")
+    assert [(l["speaker"], l["text"]) for l in loaded["script_lines"]] == [("A", "สวัสดี"), ("B", "ครับ")]
+    assert loaded["script_lines"][0]["id"]
+    assert loaded["script_lines"][1]["id"] == "kept"
+    assert loaded["line_count"] == 2
+    assert [row["line_id"] for row in tables["podcast_script_lines"]] == [l["id"] for l in loaded["script_lines"]]
+    # ครั้งถัดไปไม่ต้อง migrate ซ้ำ
+    assert SessionStore(store.backend).load("s1")["script_lines"] == loaded["script_lines"]
+
+
+def test_list_sessions_pages_without_gaps_or_duplicates(store):
+    for i in range(7):
+        # timestamp ซ้ำกันได้ ลำดับต้องใช้ session_id ตัดสิน
+        store.save(f"s{i}", [line(0)], timestamp=f"2026-01-0{1 + i // 2}T00:00:00")
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.list_sessions(limit=3, cursor=cursor)
+        seen += [row["session_id"] for row in rows]
+        if cursor is None:
+            break
+    assert seen == ["s6", "s5", "s4", "s3", "s2", "s1", "s0"]
+
+
+def test_list_sessions_last_page_has_no_cursor(store):
+    store.save("s1", [line(0)])
+    rows, cursor = store.list_sessions(limit=1)
+    assert [row["session_id"] for row in rows] == ["s1"] and cursor is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "MQ==",  # base64 ของ JSON 1
+    base64.urlsafe_b64encode(b"null").decode(),
+    base64.urlsafe_b64encode(json.dumps(["only-one"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([1, "s1"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"a": 1}).encode()).decode(),
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_invalid_cursor_raises_value_error(store, cursor):
+    with pytest.raises(ValueError):
+        store.list_sessions(cursor=cursor)
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor("2026-01-01T00:00:00", "s1")) == ["2026-01-01T00:00:00", "s1"]
+
+
+class FakeQuery:
+    def __init__(self, calls):
+        self.calls = calls
+        self.data = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return call
+
+
+def test_supabase_cursor_values_are_quoted():
+    calls = []
+    client = FakeQuery(calls)
+    SupabaseSessionBackend(lambda: client).list(10, ["2026-01-01", 'x",id.neq.(1)\\'])
+    (_, (expression,)), = [c for c in calls if c[0] == "or_"]
+    # ตัวคั่นของ PostgREST ใน cursor ต้องอยู่ใน "..." ทั้งหมด ไม่กลายเป็นเงื่อนไขเพิ่ม
+    assert expression == (
+        'timestamp.lt."2026-01-01",and(timestamp.eq."2026-01-01",session_id.lt."x\\",id.neq.(1)\\\\")'
+    )
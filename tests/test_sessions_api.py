@@ -0,0 +1,43 @@
+def all_sessions(client, limit=2):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/sessions", params=params).json()
+        seen += page["sessions"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_sessions_pages_and_urls(client, pipeline, make_session):
+    done, draft = make_session(2), make_session(1)
+    pipeline.step3_finalize_and_generate_audio(done.session_id)
+    sessions = all_sessions(client)
+    ids = [row["session_id"] for row in sessions]
+    assert len(ids) == len(set(ids))
+    rows = {row["session_id"]: row for row in sessions}
+    assert rows[draft.session_id]["audio_url"] is None
+    assert rows[draft.session_id]["video_url"] is None
+    row = rows[done.session_id]
+    assert row["line_count"] == len(pipeline.load_session(done.session_id).script_lines)
+    assert client.get(row["audio_url"]).status_code == 200
+    assert row["video_url"] is None
+
+    # video ที่ render แล้วถูกแสดงใน list
+    audio_path = pipeline.load_session(done.session_id).load_manifest()["path"]
+    with open(pipeline.episode_video_path(audio_path), "wb") as f:
+        f.write(b"\x00" * 16)
+    row = next(r for r in all_sessions(client, limit=50) if r["session_id"] == done.session_id)
+    assert row["video_url"].startswith(f"/media/podcast_final_{done.session_id}.mp4?v=")
+
+
+def test_invalid_cursor_is_400(client):
+    response = client.get("/sessions", params={"cursor": "not a cursor"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Invalid cursor")
+
+
+def test_session_script(client, make_session):
+    session = make_session(2)
+    body = client.get(f"/sessions/{session.session_id}/script").json()
+    assert [line["id"] for line in body["script_lines"]] == [line["id"] for line in session.script_lines]
+    assert client.get("/sessions/missing/script").status_code == 404
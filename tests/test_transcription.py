@@ -0,0 +1,77 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import transcription
+from transcription import SAMPLE_RATE, split_pcm_at_silence, transcribe_pcm_chunks
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype("<i2").tobytes()
+
+
+def silence(seconds):
+    return b"\x00\x00" * int(seconds * SAMPLE_RATE)
+
+
+def test_split_pcm_cuts_at_silence():
+    pcm = tone(4) + silence(0.5) + tone(4) + silence(0.5) + tone(4)
+    pieces = list(split_pcm_at_silence(iter([pcm[i:i + 4096] for i in range(0, len(pcm), 4096)]),
+                                       max_chunk_seconds=6, min_chunk_seconds=3))
+    assert b"".join(p for _, p in pieces) == pcm
+    offsets = [offset for offset, _ in pieces]
+    assert offsets[0] == 0
+    for (offset, data), next_offset in zip(pieces, offsets[1:] + [len(pcm) // 2]):
+        assert offset + len(data) // 2 == next_offset
+        assert len(data) // 2 <= 6 * SAMPLE_RATE
+    # จุดตัดอยู่ในช่วงเงียบ
+    assert all(4 * SAMPLE_RATE <= o <= 4.5 * SAMPLE_RATE or 8.5 * SAMPLE_RATE <= o <= 9 * SAMPLE_RATE for o in offsets[1:])
+
+
+def chunks(count, seconds=1):
+    for i in range(count):
+        yield i * seconds * SAMPLE_RATE, silence(seconds)
+
+
+def test_results_are_joined_in_order(monkeypatch):
+    def post_chunk(endpoint, wav, name, lang, retries):
+        # chunk หลัง ๆ เสร็จก่อน
+        time.sleep(0.05 * (5 - int(name[6:10])))
+        return {"transcribe_text": f"t{int(name[6:10])}"}
+
+    monkeypatch.setattr(transcription, "post_chunk", post_chunk)
+    result = transcribe_pcm_chunks(chunks(5), "http://stt", parallelism=3)
+    assert result["transcribe_text"] == "t0 t1 t2 t3 t4"
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [(i, i + 1) for i in range(5)]
+
+
+def test_first_failure_cancels_pending_chunks(monkeypatch):
+    started = []
+    lock = threading.Lock()
+
+    def post_chunk(endpoint, wav, name, lang, retries):
+        with lock:
+            started.append(name)
+        if name == "chunk_0000.wav":
+            raise RuntimeError("stt down")
+        time.sleep(0.2)
+        return {"transcribe_text": "ok"}
+
+    closed = []
+
+    def producer():
+        try:
+            yield from chunks(50)
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(transcription, "post_chunk", post_chunk)
+    begin = time.perf_counter()
+    with pytest.raises(RuntimeError, match="stt down"):
+        transcribe_pcm_chunks(producer(), "http://stt", parallelism=2)
+    assert time.perf_counter() - begin < 2
+    assert len(started) < 10
+    assert closed == [True]
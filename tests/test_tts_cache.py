@@ -0,0 +1,62 @@
+import os
+import wave
+
+from tts_cache import TTSCache, normalize_text
+
+
+def write_wav(path, frames=100):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\x01\x00" * frames)
+    return str(path)
+
+
+def test_key_uses_normalized_text():
+    cache = TTSCache("unused", max_bytes=0)
+    assert normalize_text("  สวัสดี \n ครับ ") == "สวัสดี ครับ"
+    assert cache.key("v1", "สวัสดี  ครับ") == cache.key("v1", " สวัสดี ครับ")
+    assert cache.key("v1", "x") != cache.key("v2", "x")
+
+
+def test_fetch_and_put(tmp_path):
+    cache = TTSCache(str(tmp_path / "cache"), max_bytes=100_000)
+    dest = str(tmp_path / "out.wav")
+    assert not cache.fetch("v1", "hello", dest)
+    assert cache.put("v1", "hello", write_wav(tmp_path / "src.wav"))
+    assert cache.fetch("v1", "hello ", dest)
+    with open(dest, "rb") as f, open(tmp_path / "src.wav", "rb") as src:
+        assert f.read() == src.read()
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_rejects_non_wav(tmp_path):
+    cache = TTSCache(str(tmp_path / "cache"), max_bytes=100_000)
+    bad = tmp_path / "error.json"
+    bad.write_text('{"error": "quota"}')
+    assert not cache.put("v1", "hello", str(bad))
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    src = write_wav(tmp_path / "src.wav")
+    cache = TTSCache(str(tmp_path / "cache"), max_bytes=os.path.getsize(src) * 2)
+    for text in ["one", "two"]:
+        cache.put("v1", text, src)
+    assert cache.fetch("v1", "one", str(tmp_path / "out.wav"))
+    cache.put("v1", "three", src)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    assert not cache.fetch("v1", "two", str(tmp_path / "out.wav"))
+    assert cache.fetch("v1", "one", str(tmp_path / "out.wav"))
+
+
+def test_index_survives_restart(tmp_path):
+    src = write_wav(tmp_path / "src.wav")
+    cache = TTSCache(str(tmp_path / "cache"), max_bytes=100_000)
+    cache.put("v1", "one", src)
+    reopened = TTSCache(str(tmp_path / "cache"), max_bytes=100_000)
+    assert reopened.stats()["entries"] == 1
+    assert reopened.stats()["bytes"] == os.path.getsize(src)
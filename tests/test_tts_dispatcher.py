@@ -0,0 +1,70 @@
+import os
+import wave
+
+import pytest
+
+from bench.fakes import FakeProfile, TTS_PATH, start_server
+from tts_dispatcher import TTSDispatcher
+
+
+@pytest.fixture
+def fake_tts():
+    servers = []
+
+    def make(**profile):
+        server = start_server(profiles={"tts": FakeProfile(**profile)}, options={"tts_seconds_per_char": 0.01})
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}{TTS_PATH}"
+    yield make
+    for server in servers:
+        server.shutdown()
+
+
+def test_synthesize_all_writes_wavs_in_order(fake_tts, tmp_path):
+    dispatcher = TTSDispatcher(fake_tts(), max_in_flight=2)
+    done = []
+    items = [(i, f"บรรทัด {i}", "1", str(tmp_path / f"{i}.wav")) for i in range(5)]
+    try:
+        results = dispatcher.synthesize_all(items, on_done=done.append)
+    finally:
+        dispatcher.close()
+    assert [r["index"] for r in results] == list(range(5))
+    assert all(r["ok"] and r["status"] == 200 for r in results)
+    assert sorted(r["index"] for r in done) == list(range(5))
+    for _, _, _, path in items:
+        with wave.open(path, "rb") as w:
+            assert w.getnframes() > 0
+    # ไม่มีไฟล์ .part ค้าง
+    assert sorted(os.listdir(tmp_path)) == [f"{i}.wav" for i in range(5)]
+
+
+def test_http_error_is_recorded_without_file(fake_tts, tmp_path):
+    dispatcher = TTSDispatcher(fake_tts(error_rate=1.0))
+    save_path = str(tmp_path / "0.wav")
+    try:
+        [result] = dispatcher.synthesize_all([(0, "x", "1", save_path)])
+    finally:
+        dispatcher.close()
+    assert not result["ok"]
+    assert result["status"] == 500
+    assert "HTTP 500" in result["error"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_os_error_is_recorded_as_failed_line(fake_tts, tmp_path):
+    # เขียนไฟล์ไม่ได้ (เช่น directory หาย) ต้องได้ stats ที่ ok=False ไม่ใช่ exception ทั้ง batch
+    dispatcher = TTSDispatcher(fake_tts())
+    items = [
+        (0, "x", "1", str(tmp_path / "missing" / "0.wav")),
+        (1, "y", "1", str(tmp_path / "1.wav")),
+    ]
+    try:
+        failed, ok = dispatcher.synthesize_all(items)
+    finally:
+        dispatcher.close()
+    assert not failed["ok"] and failed["error"]
+    assert ok["ok"]
+
+
+def test_synthesize_all_empty():
+    assert TTSDispatcher("http://127.0.0.1:1/unused").synthesize_all([]) == []
@@ -0,0 +1,110 @@
+import os
+import hashlib
+import subprocess
+
+import pytest
+
+
+def make_media(tmp_path, name, *args):
+    path = tmp_path / name
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=1", *args, str(path)],
+                   check=True)
+    return path.read_bytes()
+
+
+def multipart(parts, boundary="testboundary"):
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode(), {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+
+def chunked(body, size=1000):
+    # ส่งเป็น generator: ไม่มี Content-Length ขนาดต้องถูกเช็คระหว่างรับ
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+@pytest.fixture
+def upload_client(client, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "step1_initialize_and_generate_opening", lambda source: {"source": source})
+    return client
+
+
+def upload_files(pipeline):
+    return {name for name in os.listdir(pipeline.DOWNLOAD_DIR) if name.startswith(("upload_", "batch_src_", "tmp"))}
+
+
+def test_step1_upload_transcodes_while_streaming(upload_client, pipeline, tmp_path):
+    source = make_media(tmp_path, "a.wav", "-ar", "44100")
+    body, headers = multipart([("file", "a.wav", source)])
+    response = upload_client.post("/step1/upload", content=chunked(body), headers=headers)
+    assert response.status_code == 200
+    wav_path = response.json()["source"]
+    assert os.path.basename(wav_path) == f"upload_{hashlib.sha256(source).hexdigest()}.wav"
+    assert os.path.getsize(wav_path) > 16000
+    assert upload_files(pipeline) == {os.path.basename(wav_path)}
+
+
+def test_unseekable_container_falls_back_to_spool(upload_client, pipeline, tmp_path):
+    # mp4 ที่ moov อยู่ท้ายไฟล์ อ่านจาก pipe ไม่ได้
+    source = make_media(tmp_path, "a.mp4", "-c:a", "aac")
+    before = upload_files(pipeline)
+    response = upload_client.post("/step1/upload", files={"file": ("a.mp4", source)})
+    assert response.status_code == 200
+    wav_path = response.json()["source"]
+    assert os.path.basename(wav_path) == f"upload_{hashlib.sha256(source).hexdigest()}.wav"
+    assert upload_files(pipeline) - before == {os.path.basename(wav_path)}
+
+
+def test_corrupt_upload_leaves_no_partial_wav(upload_client, pipeline):
+    before = upload_files(pipeline)
+    response = upload_client.post("/step1/upload", files={"file": ("a.mp4", b"not media" * 1000)})
+    assert response.status_code == 400
+    assert upload_files(pipeline) == before
+
+
+def test_oversize_upload_is_rejected_while_streaming(upload_client, pipeline, tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 20_000)
+    before = upload_files(pipeline)
+    body, headers = multipart([("file", "a.wav", make_media(tmp_path, "a.wav"))])
+    response = upload_client.post("/step1/upload", content=chunked(body), headers=headers)
+    assert response.status_code == 413
+    assert upload_files(pipeline) == before
+
+
+def test_missing_file_field(upload_client):
+    body, headers = multipart([("other", None, b"x")])
+    assert upload_client.post("/step1/upload", content=body, headers=headers).status_code == 400
+    assert upload_client.post("/step1/upload", json={}).status_code == 400
+
+
+def test_batch_upload_streams_files_and_fields(upload_client, pipeline, monkeypatch):
+    import main
+    submitted = []
+    monkeypatch.setattr(main, "submit_batch", lambda sources: submitted.extend(sources) or {"batch_id": "b"})
+    body, headers = multipart([
+        ("files", "one.mp4", b"1" * 5000),
+        ("youtube_urls", None, "https://youtu.be/x".encode()),
+        ("files", "two.wav", b"2" * 10),
+    ])
+    response = upload_client.post("/batches/upload", content=chunked(body, 333), headers=headers)
+    assert response.status_code == 202
+    one, two, url = submitted
+    assert (one.endswith(".mp4"), two.endswith(".wav"), url) == (True, True, "https://youtu.be/x")
+    with open(one, "rb") as f:
+        assert f.read() == b"1" * 5000
+    for path in (one, two):
+        main.remove_upload_source(path)
+
+
+def test_batch_upload_over_item_limit_removes_saved_files(upload_client, pipeline, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "MAX_BATCH_ITEMS", 1)
+    before = upload_files(pipeline)
+    body, headers = multipart([("files", "one.mp4", b"1" * 10), ("files", "two.mp4", b"2" * 10)])
+    assert upload_client.post("/batches/upload", content=body, headers=headers).status_code == 413
+    assert upload_files(pipeline) == before
@@ -0,0 +1,35 @@
+from video import DEFAULT_SETTINGS, plan_parts, speaker_turns, write_labels
+
+
+def test_plan_parts_splits_evenly_on_frames():
+    parts = plan_parts(total_frames=1500, fps=15, workers=4, min_part_seconds=10)
+    assert parts == [(0, 375), (375, 750), (750, 1125), (1125, 1500)]
+
+
+def test_plan_parts_limited_by_min_length():
+    assert plan_parts(total_frames=300, fps=15, workers=8, min_part_seconds=10) == [(0, 150), (150, 300)]
+    assert plan_parts(total_frames=10, fps=15, workers=8) == [(0, 10)]
+
+
+def test_speaker_turns_merge_consecutive_lines():
+    segments = [
+        {"line_id": "l1", "offset": 0, "frames": 100, "gap_frames": 10},
+        {"line_id": "l2", "offset": 110, "frames": 100, "gap_frames": 20},
+        {"line_id": "l3", "offset": 230, "frames": 50, "gap_frames": 0},
+    ]
+    turns = speaker_turns(segments, 10, {"l1": "A", "l2": "A", "l3": "B"})
+    assert turns == [(0.0, 23.0, "A"), (23.0, 28.0, "B")]
+
+
+def test_write_labels_clips_turns_to_part(tmp_path):
+    path = tmp_path / "part.ass"
+    turns = [(0.0, 5.0, "A"), (5.0, 12.0, "B"), (12.0, 20.0, "A")]
+    write_labels(str(path), turns, 4.0, 13.0, {"A": "พิธีกร A", "B": "พิธีกร B"}, DEFAULT_SETTINGS)
+    text = path.read_text(encoding="utf-8")
+    events = [line for line in text.splitlines() if line.startswith("Dialogue:")]
+    assert events == [
+        "Dialogue: 0,0:00:00.00,0:00:01.00,A,,0,0,0,,พิธีกร A",
+        "Dialogue: 0,0:00:01.00,0:00:08.00,B,,0,0,0,,พิธีกร B",
+        "Dialogue: 0,0:00:08.00,0:00:09.00,A,,0,0,0,,พิธีกร A",
+    ]
+    assert "Style: A,DejaVu Sans" in text
@@ -0,0 +1,116 @@
+import io
+import time
+import wave
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+def _find_silence_cut(pcm, min_frames, window_frames):
+    """หาตำแหน่งที่เงียบที่สุดในช่วงหลัง min_frames คืนค่าเป็นจำนวน frame"""
+    import numpy as np
+    samples = np.frombuffer(pcm, dtype="<i2")[min_frames:]
+    windows = len(samples) // window_frames
+    if windows == 0:
+        return len(pcm) // SAMPLE_WIDTH
+    energy = np.square(samples[:windows * window_frames].astype(np.float32))
+    energy = energy.reshape(windows, window_frames).mean(axis=1)
+    quietest = int(np.argmin(energy))
+    return min_frames + quietest * window_frames + window_frames // 2
+
+
+def split_pcm_at_silence(pcm_chunks, max_chunk_seconds=90, min_chunk_seconds=30, window_ms=30):
+    """
+    รับ PCM 16 kHz mono s16le เป็นก้อน ๆ (iterator) แล้ว yield (offset_frames, pcm) ทีละ chunk
+    ตัดตรงช่วงที่เงียบที่สุดระหว่าง min_chunk_seconds ถึง max_chunk_seconds
+    """
+    max_bytes = int(max_chunk_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+    min_frames = int(min_chunk_seconds * SAMPLE_RATE)
+    window_frames = max(1, int(SAMPLE_RATE * window_ms / 1000))
+    buffer = bytearray()
+    offset = 0
+    for data in pcm_chunks:
+        buffer += data
+        while len(buffer) >= max_bytes:
+            cut = _find_silence_cut(bytes(buffer[:max_bytes]), min_frames, window_frames)
+            yield offset, bytes(buffer[:cut * SAMPLE_WIDTH])
+            del buffer[:cut * SAMPLE_WIDTH]
+            offset += cut
+    if buffer:
+        yield offset, bytes(buffer)
+
+
+def pcm_to_wav_bytes(pcm):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(SAMPLE_WIDTH)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def post_chunk(endpoint, wav_bytes, filename, lang, retries=3, backoff=1.0, timeout=600):
+    for attempt in range(retries + 1):
+        try:
+            files = {'audios': (filename, wav_bytes, 'audio/wav')}
+            response = requests.post(endpoint, files=files, data={'language': lang}, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def transcribe_pcm_chunks(chunks, endpoint, lang="th", parallelism=4, retries=3):
+    """
+    ส่ง chunk (offset_frames, pcm) ไปถอดเสียงพร้อมกันไม่เกิน parallelism
+    เริ่มส่งทันทีที่ได้ chunk แรก แล้วต่อข้อความกลับตามลำดับเวลา
+    chunk แรกที่พัง (หลัง retry) หยุดการอ่าน chunk ใหม่ ยกเลิกที่ยังไม่เริ่ม แล้ว raise ทันที
+    """
+    # จำกัดจำนวน chunk ที่ค้างใน memory ไม่ให้ producer วิ่งนำ worker ไปไกล
+    slots = threading.BoundedSemaphore(parallelism * 2)
+    failed = threading.Event()
+
+    def run(index, pcm):
+        try:
+            return post_chunk(endpoint, pcm_to_wav_bytes(pcm), f"chunk_{index:04d}.wav", lang, retries=retries)
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            slots.release()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="transcribe") as pool:
+        try:
+            for index, (offset, pcm) in enumerate(chunks):
+                slots.acquire()
+                if failed.is_set():
+                    break
+                duration = len(pcm) / SAMPLE_WIDTH / SAMPLE_RATE
+                futures.append((offset / SAMPLE_RATE, duration, pool.submit(run, index, pcm)))
+            for future in as_completed([future for _, _, future in futures]):
+                future.result()
+        except BaseException:
+            # ที่กำลังส่งอยู่รอให้จบ (ตอน pool ปิด) ที่ยังไม่เริ่มไม่ต้องส่ง
+            for _, _, future in futures:
+                future.cancel()
+            close = getattr(chunks, "close", None)
+            if close:
+                # ปิด producer (เช่น ffmpeg ที่ decode อยู่) ไม่ต้องอ่านต่อ
+                close()
+            raise
+
+    segments = []
+    for start, duration, future in futures:
+        text = future.result().get("transcribe_text", "").strip()
+        segments.append({"start": start, "end": start + duration, "text": text})
+    return {
+        "transcribe_text": " ".join(seg["text"] for seg in segments if seg["text"]),
+        "segments": segments,
+    }
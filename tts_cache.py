@@ -0,0 +1,71 @@
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import unicodedata
+from disk_cache import DiskLRUCache
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_wav_file(path):
+    try:
+        with open(path, "rb") as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return len(header) == 12 and header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+
+def atomic_copy(src_path, dest_path):
+    # เขียนลงไฟล์ชั่วคราวใน directory เดียวกันก่อน แล้วค่อย rename ทับ
+    dest_dir = os.path.dirname(dest_path) or "."
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out_f, open(src_path, "rb") as in_f:
+            shutil.copyfileobj(in_f, out_f)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class TTSCache(DiskLRUCache):
+    """
+    cache ไฟล์เสียงที่ synthesize แล้ว โดยใช้ key จาก (voice_id, ข้อความที่ normalize แล้ว)
+    จำกัดขนาดรวมด้วย LRU eviction
+    """
+
+    suffix = ".wav"
+
+    def key(self, voice_id, text):
+        raw = f"{voice_id}\n{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def fetch(self, voice_id, text, dest_path):
+        """คัดลอกเสียงจาก cache ไปที่ dest_path ถ้ามี คืนค่า True เมื่อ hit"""
+        self._ensure_index()
+        key = self.key(voice_id, text)
+        try:
+            atomic_copy(self.path_for(key), dest_path)
+        except FileNotFoundError:
+            # ยังไม่เคยมี หรือ process อื่นลบไปแล้ว
+            self._record_miss(key)
+            return False
+        self._record_hit(key)
+        return True
+
+    def put(self, voice_id, text, src_path):
+        self._ensure_index()
+        if not is_wav_file(src_path):
+            return False
+        key = self.key(voice_id, text)
+        atomic_copy(src_path, self.path_for(key))
+        self._record_write(key)
+        return True
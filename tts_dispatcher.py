@@ -0,0 +1,123 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+
+
+class TTSError(RuntimeError):
+    pass
+
+
+class TTSDispatcher:
+    """
+    ส่งบรรทัดไป TTS ผ่าน aiohttp session เดียวต่อ process
+    จำกัดจำนวน request ที่กำลังทำงานพร้อมกัน และตรวจ response ก่อนเขียนไฟล์จริง
+    """
+
+    def __init__(self, endpoint, max_in_flight=8, limit_per_host=8, timeout=120, chunk_size=64 * 1024):
+        self.endpoint = endpoint
+        self.max_in_flight = max_in_flight
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+
+    def _ensure_started(self):
+        # event loop ของ dispatcher รันใน thread แยก ทำให้ session ใช้ร่วมกันได้ทุก request
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="tts-dispatcher", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+            self._loop = loop
+            self._thread = thread
+            atexit.register(self.close)
+
+    async def _open_session(self):
+        # import ตอนใช้ครั้งแรก ไม่ให้ aiohttp ถ่วงเวลา start ของ API
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.limit_per_host)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def _synthesize(self, index, text, voice_id, save_path):
+        import aiohttp
+        stats = {"index": index, "ok": False, "status": None, "bytes": 0, "queued": 0.0, "latency": 0.0, "error": None}
+        enqueued = time.perf_counter()
+        tmp_path = f"{save_path}.part"
+        async with self._semaphore:
+            started = time.perf_counter()
+            stats["queued"] = started - enqueued
+            data = aiohttp.FormData()
+            data.add_field('voice_id', voice_id)
+            data.add_field('script', text)
+            try:
+                async with self._session.post(self.endpoint, data=data) as resp:
+                    stats["status"] = resp.status
+                    if resp.status != 200:
+                        body = await resp.text(errors="replace")
+                        raise TTSError(f"HTTP {resp.status}: {body[:200]}")
+                    header = b""
+                    with open(tmp_path, "wb") as out_f:
+                        async for chunk in resp.content.iter_chunked(self.chunk_size):
+                            if len(header) < 12:
+                                header += chunk[:12 - len(header)]
+                                if len(header) == 12 and (header[:4] != b"RIFF" or header[8:12] != b"WAVE"):
+                                    raise TTSError("response is not a WAV file")
+                            out_f.write(chunk)
+                            stats["bytes"] += len(chunk)
+                    if len(header) < 12:
+                        raise TTSError("response is too short to be a WAV file")
+                os.replace(tmp_path, save_path)
+                stats["ok"] = True
+            except (aiohttp.ClientError, asyncio.TimeoutError, TTSError, OSError) as e:
+                stats["error"] = str(e) or type(e).__name__
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                stats["latency"] = time.perf_counter() - started
+        return stats
+
+    def synthesize_all(self, items, on_done=None):
+        """
+        items: list ของ (index, text, voice_id, save_path)
+        on_done: ถ้ามี จะถูกเรียกด้วย stats ทันทีที่แต่ละบรรทัดเสร็จ (ลำดับไม่แน่นอน)
+        คืนค่า stats ของแต่ละบรรทัดเรียงตามลำดับที่ส่งเข้ามา
+        """
+        if not items:
+            return []
+        self._ensure_started()
+
+        def notify(future):
+            if not future.cancelled() and future.exception() is None:
+                on_done(future.result())
+
+        futures = []
+        for item in items:
+            future = asyncio.run_coroutine_threadsafe(self._synthesize(*item), self._loop)
+            if on_done:
+                future.add_done_callback(notify)
+            futures.append(future)
+        return [f.result() for f in futures]
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._session = None
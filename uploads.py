@@ -0,0 +1,153 @@
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from ingest import UploadTooLarge
+
+QUEUE_CHUNKS = 16
+
+
+class UploadAborted(Exception):
+    pass
+
+
+class PartSink:
+    """
+    ส่งข้อมูลของไฟล์หนึ่ง part ให้ consume(chunks) ที่รันใน thread ของตัวเอง (ffmpeg หรือ disk จึงไม่ block event loop)
+    queue มีขนาดจำกัด ถ้า consume ช้ากว่า client การอ่าน body จะรอตาม ผลของ consume อยู่ใน result หลัง finish()
+    """
+
+    _END = object()
+
+    def __init__(self, consume):
+        self.result = None
+        self._queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._aborted = False
+        self._done = Future()
+        threading.Thread(target=self._run, args=(consume,), name="upload-part", daemon=True).start()
+
+    def _run(self, consume):
+        try:
+            self._done.set_result(consume(self._chunks()))
+        except BaseException as e:
+            self._done.set_exception(e)
+
+    def _chunks(self):
+        while True:
+            item = self._queue.get()
+            if self._aborted:
+                raise UploadAborted("upload was aborted")
+            if item is self._END:
+                return
+            yield item
+
+    def _put(self, item):
+        # consume จบไปแล้ว (เช่นพัง) ข้อมูลที่เหลือทิ้งได้
+        while not self._done.done():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    async def write(self, data):
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            await run_in_threadpool(self._put, data)
+
+    async def finish(self):
+        await self.write(self._END)
+        self.result = await asyncio.wrap_future(self._done)
+        return self.result
+
+    async def abort(self):
+        # consume ได้ UploadAborted แทนข้อมูลถัดไป รอให้ cleanup ของมันเสร็จ
+        self._aborted = True
+        try:
+            self._queue.put_nowait(self._END)
+        except queue.Full:
+            pass
+        await asyncio.wait([asyncio.wrap_future(self._done)])
+
+
+async def receive_multipart(request, open_part, max_bytes=None):
+    """
+    parse body แบบ multipart/form-data ทีละก้อนจาก request.stream() แทน UploadFile ที่ spool body ทั้งก้อนก่อน
+    open_part(name, filename) คืน PartSink ของไฟล์นั้น (None = ข้าม part) ข้อมูลถูกส่งต่อทันทีที่มาถึง
+    คืน {name: [value]} ของ field ที่ไม่ใช่ไฟล์ หลังทุก sink เสร็จแล้ว
+    body เกิน max_bytes: UploadTooLarge ทันทีที่รับเกิน และ sink ที่ยังไม่เสร็จถูก abort
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("expected a multipart/form-data body")
+
+    events = []
+    header = {"field": b"", "value": b"", "headers": {}}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("begin", header["headers"]))
+        header["headers"] = {}
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+    fields = {}
+    sink, name, value = None, None, None
+    total = 0
+    try:
+        async for chunk in request.stream():
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+            parser.write(chunk)
+            for event, data in events:
+                if event == "begin":
+                    _, disposition = parse_options_header(data.get(b"content-disposition", b""))
+                    name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                    filename = disposition.get(b"filename")
+                    if filename is None:
+                        value = []
+                    else:
+                        sink = open_part(name, filename.decode("utf-8", "replace"))
+                elif event == "data":
+                    if sink is not None:
+                        await sink.write(data)
+                    elif value is not None:
+                        value.append(data)
+                else:
+                    if sink is not None:
+                        await sink.finish()
+                    elif value is not None:
+                        fields.setdefault(name, []).append(b"".join(value).decode("utf-8", "replace"))
+                    sink, name, value = None, None, None
+            events.clear()
+        parser.finalize()
+        if name is not None:
+            raise ValueError("multipart body ended in the middle of a part")
+    except BaseException:
+        if sink is not None:
+            await sink.abort()
+        raise
+    return fields
@@ -0,0 +1,178 @@
+import os
+import wave
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SETTINGS = {
+    "width": 1280,
+    "height": 720,
+    "fps": 15,                  # ภาพนิ่งกับ waveform ไม่ต้องใช้ frame rate สูง (sample rate ที่ใช้ทั่วไปหาร 15 ลงตัว)
+    "crf": 28,
+    "preset": "veryfast",
+    "background": "0x1e1e2e",   # สีพื้นเมื่อไม่มีภาพปก
+    "wave_height": 240,
+    "wave_color": "0xcdd6f4",
+    "label_colors": {"A": "0x89b4fa", "B": "0xf38ba8"},
+    "font": "DejaVu Sans",       # ชื่อ font ตาม fontconfig (label ภาษาไทยต้องใช้ font ที่มีอักษรไทย)
+    "font_size": 48,
+    "audio_bitrate": "128k",
+}
+# part สั้นกว่านี้ไม่คุ้มค่าเปิด ffmpeg เพิ่ม
+MIN_PART_SECONDS = 10.0
+
+
+def speaker_turns(segments, sample_rate, speakers):
+    """
+    segments: ของ layout ที่ต่อไฟล์ตอน (offset/frames เป็น sample) speakers: {line_id: speaker}
+    คืน [(start, end, speaker)] บรรทัดติดกันของผู้พูดคนเดียวกันรวมเป็น turn เดียว
+    label ของ turn ค้างไว้ตลอดช่วงเงียบจนถึง turn ถัดไป
+    """
+    turns = []
+    for seg in segments:
+        speaker = speakers.get(seg.get("line_id"))
+        start = seg["offset"] / sample_rate
+        end = (seg["offset"] + seg["frames"] + seg.get("gap_frames", 0)) / sample_rate
+        if turns and turns[-1][2] == speaker:
+            turns[-1] = (turns[-1][0], end, speaker)
+        else:
+            turns.append((start, end, speaker))
+    return turns
+
+
+def plan_parts(total_frames, fps, workers, min_part_seconds=MIN_PART_SECONDS):
+    # แบ่งเป็นช่วงยาวเท่า ๆ กันตาม frame ของ video รอยต่อจึงตรง frame พอดีและทุก part เริ่มด้วย keyframe
+    by_length = int(total_frames / (fps * min_part_seconds)) or 1
+    count = max(1, min(workers, by_length))
+    bounds = [total_frames * i // count for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i + 1] > bounds[i]]
+
+
+def _ass_time(seconds):
+    cs = max(0, int(round(seconds * 100)))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def _ass_color(hex_color):
+    # 0xRRGGBB → &H00BBGGRR
+    rgb = hex_color[2:] if hex_color.startswith("0x") else hex_color.lstrip("#")
+    return f"&H00{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".upper()
+
+
+def write_labels(path, turns, start, end, labels, settings):
+    """ไฟล์ ASS ของ label ผู้พูดในช่วง [start, end) เวลาเริ่มที่ 0 ของ part นั้น"""
+    width, height = settings["width"], settings["height"]
+    styles, events = [], []
+    for i, (speaker, text) in enumerate(sorted(labels.items())):
+        color = _ass_color(settings["label_colors"].get(speaker, "0x585b70"))
+        # ผู้พูดคนแรกอยู่มุมซ้ายบน คนถัดไปมุมขวาบน พื้นกล่องเป็นสีของผู้พูด
+        alignment = 7 if i % 2 == 0 else 9
+        styles.append(
+            f"Style: {speaker},{settings['font']},{settings['font_size']},&H00FFFFFF,&H00FFFFFF,{color},{color},"
+            f"1,0,0,0,100,100,0,0,3,12,0,{alignment},60,60,50,1"
+        )
+    for turn_start, turn_end, speaker in turns:
+        if speaker not in labels or turn_end <= start or turn_start >= end:
+            continue
+        events.append(
+            f"Dialogue: 0,{_ass_time(max(turn_start, start) - start)},{_ass_time(min(turn_end, end) - start)},"
+            f"{speaker},,0,0,0,,{labels[speaker]}"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "[Script Info]\nScriptType: v4.00+\n"
+            f"PlayResX: {width}\nPlayResY: {height}\n\n"
+            "[V4+ Styles]\n"
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+            + "\n".join(styles) + "\n\n"
+            "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+            + "\n".join(events) + "\n"
+        )
+
+
+def _filter_path(path):
+    # path ใน filtergraph: escape ตัวคั่นของ filter
+    return path.replace("\\", "\\\\").replace(":", "\\:").replace("'", "\\'")
+
+
+def render_part(audio_path, cover, ass_path, first_frame, frames, out_path, settings, threads=1):
+    """render ภาพอย่างเดียว (ไม่มีเสียง) ของ frame [first_frame, first_frame + frames)"""
+    width, height, fps = settings["width"], settings["height"], settings["fps"]
+    wave_height = settings["wave_height"]
+    if cover:
+        background = ["-loop", "1", "-framerate", str(fps), "-i", cover]
+        fit = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1,"
+    else:
+        background = ["-f", "lavfi", "-i", f"color=c={settings['background']}:s={width}x{height}:r={fps}"]
+        fit = ""
+    graph = (
+        f"[1:a]aformat=channel_layouts=mono,"
+        f"showwaves=s={width}x{wave_height}:mode=cline:draw=full:rate={fps}:colors={settings['wave_color']}[wave];"
+        f"[0:v]{fit}format=yuv420p[bg];"
+        f"[bg][wave]overlay=0:{(height - wave_height) // 2}:shortest=1,"
+        # waveform ของ part สุดท้ายอาจสั้นกว่า frame ที่ต้องการเล็กน้อย ต่อด้วย frame สุดท้ายให้ครบ
+        f"tpad=stop_mode=clone:stop_duration=1,"
+        f"subtitles=filename='{_filter_path(ass_path)}',format=yuv420p[v]"
+    )
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", *background,
+         "-ss", f"{first_frame / fps:.6f}", "-t", f"{frames / fps + 1:.6f}", "-i", audio_path,
+         "-filter_complex", graph, "-map", "[v]", "-frames:v", str(frames), "-an",
+         "-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"]),
+         "-pix_fmt", "yuv420p", "-r", str(fps), "-g", str(fps * 10), "-threads", str(threads),
+         "-f", "mp4", out_path],
+        check=True,
+    )
+    return out_path
+
+
+def render_video(audio_path, turns, output_path, labels, settings=DEFAULT_SETTINGS, cover=None,
+                 aac_path=None, workers=1, min_part_seconds=MIN_PART_SECONDS):
+    """
+    สร้าง MP4 ของทั้งตอน: แบ่งเป็นช่วงเวลาเท่า ๆ กัน render ภาพแต่ละช่วงพร้อมกัน (ffmpeg หนึ่ง process
+    ต่อช่วง) แล้วต่อด้วย concat แบบ stream copy ไม่ encode ภาพซ้ำ เสียงถูก mux ครั้งเดียวตอนต่อ
+    (copy จาก aac_path ถ้ามี ไม่งั้น encode AAC จาก audio_path)
+    คืน {"parts", "seconds"}
+    """
+    with wave.open(audio_path, "rb") as w:
+        duration = w.getnframes() / w.getframerate()
+    fps = settings["fps"]
+    total_frames = max(1, int(round(duration * fps)))
+    parts = plan_parts(total_frames, fps, workers, min_part_seconds)
+    # core ที่เหลือจากจำนวน part ให้ x264 ใช้ (ตอนสั้น ๆ ที่มี part เดียว)
+    threads = max(1, (os.cpu_count() or 1) // len(parts))
+
+    work_dir = tempfile.mkdtemp(prefix=".video-", dir=os.path.dirname(output_path) or ".")
+    try:
+        jobs = []
+        for i, (first, last) in enumerate(parts):
+            ass_path = os.path.join(work_dir, f"part_{i:03d}.ass")
+            write_labels(ass_path, turns, first / fps, last / fps, labels, settings)
+            jobs.append((audio_path, cover, ass_path, first, last - first,
+                         os.path.join(work_dir, f"part_{i:03d}.mp4"), settings, threads))
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            part_paths = list(pool.map(lambda job: render_part(*job), jobs))
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.writelines(f"file '{os.path.basename(path)}'\n" for path in part_paths)
+        if aac_path:
+            audio_input, audio_codec = ["-i", aac_path], ["-c:a", "copy"]
+        else:
+            audio_input, audio_codec = ["-i", audio_path], ["-c:a", "aac", "-b:a", settings["audio_bitrate"]]
+        tmp_path = f"{output_path}.part"
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path, *audio_input,
+             "-map", "0:v", "-map", "1:a", "-c:v", "copy", *audio_codec,
+             "-movflags", "+faststart", "-f", "mp4", tmp_path],
+            check=True,
+        )
+        os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(f"{output_path}.part"):
+            os.remove(f"{output_path}.part")
+    return {"parts": len(parts), "seconds": duration}
@@ -8,35 +8,68 @@ from dotenv import load_dotenv
 load_dotenv()
 
 API_BASE = os.getenv("API_BASE") 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 st.set_page_config(page_title="Podcast Generator", layout="wide")
 
 st.title("🎙️ AI Podcast Workspace")
 st.markdown("---")
 
-# --- Load session list ---
+def stream_step2(session_id, question, on_line):
+    """เรียก /step2/stream แล้วเรียก on_line ทุกครั้งที่ได้บรรทัดใหม่ คืนค่า event done"""
+    res = requests.post(f"{API_BASE}/step2/stream", json={
+        "session_id": session_id,
+        "question": question
+    }, stream=True)
+    res.raise_for_status()
+    event = None
+    for raw in res.iter_lines(decode_unicode=True):
+        if raw.startswith("event:"):
+            event = raw[len("event:"):].strip()
+        elif raw.startswith("data:"):
+            data = json.loads(raw[len("data:"):].strip())
+            if event == "line":
+                on_line(data)
+            elif event == "done":
+                return data
+            elif event == "error":
+                raise RuntimeError(data["detail"])
+    raise RuntimeError("stream ended before completion")
+
+# --- Load session list (ทีละหน้า เฉพาะคอลัมน์เบา ๆ) ---
 @st.cache_data
-def load_sessions():
-    url = f"{SUPABASE_URL}/rest/v1/podcast_scripts"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}"
-    }
-    res = requests.get(url, headers=headers)
-    return res.json() if res.ok else []
+def load_sessions_page(cursor=None):
+    res = requests.get(f"{API_BASE}/sessions", params={"limit": 50, "cursor": cursor})
+    return res.json() if res.ok else {"sessions": [], "next_cursor": None}
 
-sessions = load_sessions()
+@st.cache_data
+def load_script(session_id):
+    res = requests.get(f"{API_BASE}/sessions/{session_id}/script")
+    return res.json()["script_lines"] if res.ok else []
+
+if "session_pages" not in st.session_state:
+    st.session_state.session_pages = 1
+
+sessions = []
+cursor = None
+for _ in range(st.session_state.session_pages):
+    page = load_sessions_page(cursor)
+    sessions.extend(page["sessions"])
+    cursor = page["next_cursor"]
+    if not cursor:
+        break
 
 # --- Sidebar Workspace ---
 st.sidebar.title("📂 Podcast Sessions")
 if st.sidebar.button("🔄 Refresh Sessions"):
     st.cache_data.clear()
+    st.session_state.session_pages = 1
     st.rerun()
 
 
 selected = st.sidebar.radio("Select Session", options=[s['session_id'] for s in sessions] + ["➕ New Session"])
+if cursor and st.sidebar.button("⬇️ โหลดเพิ่ม"):
+    st.session_state.session_pages += 1
+    st.rerun()
 
 # --- Show Selected Session ---
 if selected != "➕ New Session":
@@ -46,14 +79,13 @@ if selected != "➕ New Session":
         st.subheader(f"🧾 Session ID: {session['session_id']}")
         st.markdown(f"⏱️ Timestamp: `{session['timestamp']}`")
         st.markdown("### 💬 Script")
-        script = json.loads(session["script"])
-        for line in script:
+        # โหลด script เฉพาะ session ที่เลือก
+        for line in load_script(session["session_id"]):
             st.write(f"**{line['speaker']}**: {line['text']}")
 
-        if session.get("audio_path"):
+        if session.get("audio_url"):
             st.markdown("### 🔊 Audio Preview")
-            audio_file = session["audio_path"]
-            st.audio(audio_file)
+            st.audio(f"{API_BASE}{session['audio_url']}")
 
 # --- Create new session ---
 # --- Create new session ---
@@ -149,11 +181,13 @@ else:
             if not question:
                 st.warning("กรุณาพิมพ์คำถามก่อนส่ง")
             else:
-                with st.spinner("📚 กำลังสร้าง Script..."):
-                    res2 = requests.post(f"{API_BASE}/step2", json={
-                        "session_id": st.session_state.session_id,
-                        "question": question
-                    }).json()
+                # แสดงบทพูดทีละบรรทัดระหว่างที่ LLM กำลังสร้าง
+                live = st.empty()
+                streamed = []
+                def show_line(line):
+                    streamed.append(f"{line['speaker']}: {line['text']}")
+                    live.code("\n".join(streamed))
+                res2 = stream_step2(st.session_state.session_id, question, show_line)
 
                 st.session_state.script_blocks.append({
                     "question": question,
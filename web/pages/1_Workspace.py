@@ -1,48 +1,63 @@
 import streamlit as st
 import requests
 import os
-import json
 from dotenv import load_dotenv
 
 load_dotenv()
 st.set_page_config(page_title="🎧 Workspace", layout="wide")
 st.title("📁 Podcast Workspace")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+PAGE_SIZE = 50
 
 @st.cache_data(show_spinner=False)
-def load_sessions():
-    url = f"{SUPABASE_URL}/rest/v1/podcast_scripts?select=*"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}"
-    }
-    res = requests.get(url, headers=headers)
-    return res.json() if res.ok else []
+def load_sessions_page(cursor=None):
+    # ได้เฉพาะ id, timestamp, จำนวนบรรทัด, ความยาว, audio_url และ video_url ไม่มี script
+    res = requests.get(f"{API_BASE}/sessions", params={"limit": PAGE_SIZE, "cursor": cursor})
+    return res.json() if res.ok else {"sessions": [], "next_cursor": None}
 
-sessions = load_sessions()
+@st.cache_data(show_spinner=False)
+def load_script(session_id):
+    res = requests.get(f"{API_BASE}/sessions/{session_id}/script")
+    return res.json() if res.ok else {"script_lines": [], "suggested_questions": ""}
+
+if "workspace_cursors" not in st.session_state:
+    st.session_state.workspace_cursors = [None]
+
+cursors = st.session_state.workspace_cursors
+page = load_sessions_page(cursors[-1])
+sessions = page["sessions"]
 
 if sessions:
-    for session in sessions[::-1]:
-        with st.expander(f"🗂️ Session: {session['session_id']} — {session['timestamp']}"):
-            st.markdown("### 🧠 Summary")
-            st.code(session.get("suggested_questions", ""), language="markdown")
-
-            st.markdown("### 💬 Script")
-            script = json.loads(session.get("script", "[]"))
-            for line in script:
-                st.write(f"**{line['speaker']}**: {line['text']}")
-
-            if session.get("audio_path"):
-                audio_url = f"{API_BASE}{session['audio_path']}"
+    for session in sessions:
+        duration = f" — {session['duration'] / 60:.1f} นาที" if session.get("duration") else ""
+        with st.expander(f"🗂️ Session: {session['session_id']} — {session['timestamp']} — {session['line_count']} บรรทัด{duration}"):
+            if session.get("audio_url"):
                 st.markdown("### 🔊 Audio")
-                st.audio(audio_url)
+                st.audio(f"{API_BASE}{session['audio_url']}")
 
-            if session.get("video_path"):
-                video_url = f"{API_BASE}{session['video_path']}"
+            if session.get("video_url"):
                 st.markdown("### 🎞️ Video")
-                st.video(video_url)
+                st.video(f"{API_BASE}{session['video_url']}")
+
+            # โค้ดใน expander รันทุกครั้งแม้ยังไม่เปิด จึงดึง script เมื่อผู้ใช้สั่งเท่านั้น
+            if st.toggle("💬 แสดง Script", key=f"show_{session['session_id']}"):
+                detail = load_script(session["session_id"])
+                st.markdown("### 🧠 Summary")
+                st.code(detail.get("suggested_questions", ""), language="markdown")
+
+                st.markdown("### 💬 Script")
+                for line in detail["script_lines"]:
+                    st.write(f"**{line['speaker']}**: {line['text']}")
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("⬅️ ใหม่กว่า"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if page["next_cursor"] and st.button("เก่ากว่า ➡️"):
+            cursors.append(page["next_cursor"])
+            st.rerun()
 else:
     st.info("ยังไม่มี session ใด ๆ")